@@ -0,0 +1,165 @@
+from django import forms
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import AutoField, BigAutoField, Max
+from django.utils.functional import cached_property
+
+
+def estimate_count(model, using):
+    """Примерное число строк таблицы без COUNT(*) или None.
+
+    На PostgreSQL берется оценка планировщика из pg_class, на
+    остальных СУБД — наибольший id, который читается из индекса.
+    """
+    if connections[using].vendor == 'postgresql':
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE relname = %s',
+                [model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        return int(row[0]) if row and row[0] > 0 else None
+    if isinstance(model._meta.pk, (AutoField, BigAutoField)):
+        return model._default_manager.using(using).aggregate(
+            last=Max('pk')
+        )['last']
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Паджинатор, не считающий все строки большой таблицы.
+
+    Строки считаются до ADMIN_COUNT_LIMIT, и на маленьких выборках число
+    точное. Если строк больше, для выборки без фильтров используется
+    estimate_count(), а для отфильтрованной число ограничивается
+    ADMIN_COUNT_LIMIT: до дальних страниц удобнее дойти фильтром.
+    """
+
+    @cached_property
+    def count(self):
+        """Точное число строк до ADMIN_COUNT_LIMIT или оценка."""
+        limit = settings.ADMIN_COUNT_LIMIT
+        queryset = self.object_list
+        count = queryset[:limit].count()
+        if count < limit or queryset.query.has_filters():
+            return count
+        estimate = estimate_count(queryset.model, queryset.db)
+        return max(count, estimate or 0)
+
+
+class AutocompleteFilter(admin.FieldListFilter):
+    """Фильтр по внешнему ключу с полем автодополнения.
+
+    Стандартный фильтр выводит в боковую панель все объекты связанной
+    модели, а этот — поле поиска, варианты для которого подгружает
+    autocomplete-view админки связанной модели. У ее ModelAdmin
+    должны быть заданы search_fields.
+    """
+
+    template = 'core/admin/autocomplete_filter.html'
+
+    def __init__(self, field, request, params, model, model_admin,
+                 field_path):
+        """Готовит виджет автодополнения для связанной модели."""
+        self.lookup_kwarg = f'{field_path}__{field.target_field.name}__exact'
+        self.lookup_val = params.get(self.lookup_kwarg)
+        super().__init__(
+            field, request, params, model, model_admin, field_path
+        )
+        self.form_field = forms.ModelChoiceField(
+            queryset=field.remote_field.model._default_manager.all(),
+            required=False,
+            widget=AutocompleteSelect(
+                field.remote_field, model_admin.admin_site,
+                attrs={'style': 'width: 100%'},
+            ),
+        )
+
+    def expected_parameters(self):
+        """Параметр запроса с id выбранного объекта."""
+        return [self.lookup_kwarg]
+
+    def has_output(self):
+        """Фильтр выводится всегда: варианты подгружаются по запросу."""
+        return True
+
+    def choices(self, changelist):
+        """Поле выбора и адрес списка без этого фильтра."""
+        yield {
+            'widget': self.form_field.widget.render(
+                self.lookup_kwarg, self.lookup_val
+            ),
+            'lookup_kwarg': self.lookup_kwarg,
+            'query_string': changelist.get_query_string(
+                remove=[self.lookup_kwarg]
+            ),
+        }
+
+
+class PreloadedAutocompleteSelect(AutocompleteSelect):
+    """Поле автодополнения, которому выбранный объект передан готовым.
+
+    AutocompleteSelect читает выбранный объект отдельным запросом, и в
+    list_editable это по запросу на строку. Здесь объект берется из
+    атрибута preloaded, если он задан и совпадает со значением поля.
+    """
+
+    preloaded = None
+
+    def optgroups(self, name, value, attr=None):
+        """Варианты выбора без запроса к БД для preloaded."""
+        obj = self.preloaded
+        if obj is None or [str(obj.pk)] != [str(v) for v in value]:
+            return super().optgroups(name, value, attr)
+        options = []
+        if not self.is_required:
+            options.append(self.create_option(name, '', '', False, 0))
+        options.append(self.create_option(
+            name, obj.pk, self.choices.field.label_from_instance(obj),
+            True, len(options),
+        ))
+        return [(None, options, 0)]
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Список объектов, который быстро открывается на больших таблицах.
+
+    Общее число строк не считается, число строк выборки оценивается
+    EstimatedCountPaginator. Наследники задают list_select_related и
+    для внешних ключей — AutocompleteFilter и autocomplete_fields.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        """Поля автодополнения принимают заранее выбранный объект."""
+        if db_field.name in self.get_autocomplete_fields(request):
+            kwargs.setdefault('widget', PreloadedAutocompleteSelect(
+                db_field.remote_field, self.admin_site,
+                using=kwargs.get('using'),
+            ))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_changelist_form(self, request, **kwargs):
+        """Форма строки, отдающая полям объекты из list_select_related."""
+        form = super().get_changelist_form(request, **kwargs)
+
+        class ChangeListForm(form):
+            def __init__(self, *args, **kwargs):
+                """Передает виджетам связанные объекты строки."""
+                super().__init__(*args, **kwargs)
+                for name, field in self.fields.items():
+                    widget = getattr(field.widget, 'widget', field.widget)
+                    if isinstance(widget, PreloadedAutocompleteSelect):
+                        widget.preloaded = getattr(self.instance, name)
+
+        return ChangeListForm
+
+    @property
+    def media(self):
+        """Скрипты автодополнения для фильтров списка."""
+        return super().media + AutocompleteSelect(None, self.admin_site).media
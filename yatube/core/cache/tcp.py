@@ -0,0 +1,221 @@
+import pickle
+import socket
+import socketserver
+import struct
+import threading
+import uuid
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+
+# длина сообщения передается 4 байтами перед его телом
+HEADER = struct.Struct('>I')
+
+# операции, которые сервер выполняет по запросу клиента
+COMMANDS = frozenset((
+    'add', 'get', 'set', 'touch', 'delete', 'get_many', 'set_many',
+    'delete_many', 'has_key', 'incr', 'clear',
+))
+
+
+def _send(sock, message):
+    """Отправляет объект одним сообщением."""
+    data = pickle.dumps(message, pickle.HIGHEST_PROTOCOL)
+    sock.sendall(HEADER.pack(len(data)) + data)
+
+
+def _receive_exactly(sock, size):
+    """Читает из сокета ровно size байт."""
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 65536))
+        if not chunk:
+            raise ConnectionError('соединение закрыто')
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def _receive(sock):
+    """Читает одно сообщение."""
+    size, = HEADER.unpack(_receive_exactly(sock, HEADER.size))
+    return pickle.loads(_receive_exactly(sock, size))
+
+
+def _identity_key(key, key_prefix, version):
+    """Ключ без изменений: префикс и версию добавляет клиент."""
+    return key
+
+
+class CacheRequestHandler(socketserver.BaseRequestHandler):
+    """Выполняет команды одного клиента до закрытия соединения."""
+
+    def handle(self):
+        """Читает команды и отправляет результаты или исключения."""
+        while True:
+            try:
+                command, args = _receive(self.request)
+            except ConnectionError:
+                return
+            try:
+                if command not in COMMANDS:
+                    raise ValueError(f'неизвестная команда {command}')
+                result = (True, getattr(self.server.cache, command)(*args))
+            except Exception as error:
+                result = (False, error)
+            _send(self.request, result)
+
+
+class CacheServer(socketserver.ThreadingTCPServer):
+    """Сервер кэша, хранящий данные в LocMemCache.
+
+    Это замена memcached для разработки и тестов, не требующая внешних
+    сервисов. Данные передаются pickle'ом, поэтому сервер должен быть
+    доступен только доверенным воркерам: по умолчанию он слушает
+    127.0.0.1.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address=('127.0.0.1', 0), max_entries=10000):
+        """Создает хранилище и начинает слушать address."""
+        super().__init__(address, CacheRequestHandler)
+        self.cache = LocMemCache(f'cache-server-{uuid.uuid4().hex}', {
+            'TIMEOUT': None,
+            'KEY_FUNCTION': _identity_key,
+            'OPTIONS': {'MAX_ENTRIES': max_entries},
+        })
+
+    @property
+    def location(self):
+        """Адрес сервера в формате LOCATION для SocketCache."""
+        host, port = self.server_address[:2]
+        return f'{host}:{port}'
+
+
+def serve_in_thread(address=('127.0.0.1', 0)):
+    """Запускает CacheServer в фоновом потоке и возвращает его.
+
+    Остановить сервер: server.shutdown(); server.server_close().
+    """
+    server = CacheServer(address)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class SocketCache(BaseCache):
+    """Клиент CacheServer: общий кэш всех воркеров через TCP.
+
+    LOCATION — адрес сервера в формате host:port. У каждого потока
+    свое соединение; при обрыве оно переоткрывается, и команда
+    повторяется один раз.
+    """
+
+    def __init__(self, location, params):
+        """Запоминает адрес сервера, соединения открываются лениво."""
+        super().__init__(params)
+        host, port = location.rsplit(':', 1)
+        self._address = (host, int(port))
+        self._timeout = params.get('OPTIONS', {}).get('SOCKET_TIMEOUT', 5)
+        self._local = threading.local()
+
+    def _socket(self):
+        """Соединение текущего потока с сервером."""
+        sock = getattr(self._local, 'socket', None)
+        if sock is None:
+            sock = socket.create_connection(self._address, self._timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._local.socket = sock
+        return sock
+
+    def _call(self, command, *args):
+        """Выполняет команду на сервере и возвращает ее результат."""
+        for attempt in range(2):
+            try:
+                sock = self._socket()
+                _send(sock, (command, args))
+                ok, result = _receive(sock)
+                break
+            except OSError:
+                self._disconnect()
+                if attempt:
+                    raise
+        if not ok:
+            raise result
+        return result
+
+    def _key(self, key, version):
+        """Полный ключ с префиксом и версией."""
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _timeout_for(self, timeout):
+        """Срок жизни в секундах для сервера."""
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        """Записывает значение, если ключа еще нет."""
+        return self._call(
+            'add', self._key(key, version), value, self._timeout_for(timeout)
+        )
+
+    def get(self, key, default=None, version=None):
+        """Возвращает значение или default."""
+        return self._call('get', self._key(key, version), default)
+
+    def get_many(self, keys, version=None):
+        """Читает несколько ключей за одно обращение к серверу."""
+        keys = {self._key(key, version): key for key in keys}
+        found = self._call('get_many', list(keys))
+        return {keys[key]: value for key, value in found.items()}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        """Записывает значение."""
+        self._call(
+            'set', self._key(key, version), value, self._timeout_for(timeout)
+        )
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        """Записывает несколько значений за одно обращение к серверу."""
+        data = {self._key(key, version): value for key, value in data.items()}
+        self._call('set_many', data, self._timeout_for(timeout))
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        """Продлевает срок жизни ключа."""
+        return self._call(
+            'touch', self._key(key, version), self._timeout_for(timeout)
+        )
+
+    def incr(self, key, delta=1, version=None):
+        """Атомарно увеличивает числовое значение на сервере."""
+        return self._call('incr', self._key(key, version), delta)
+
+    def delete(self, key, version=None):
+        """Удаляет ключ."""
+        return self._call('delete', self._key(key, version))
+
+    def delete_many(self, keys, version=None):
+        """Удаляет несколько ключей за одно обращение к серверу."""
+        self._call('delete_many', [self._key(key, version) for key in keys])
+
+    def has_key(self, key, version=None):
+        """Проверяет наличие ключа."""
+        return self._call('has_key', self._key(key, version))
+
+    def clear(self):
+        """Удаляет все ключи."""
+        self._call('clear')
+
+    def _disconnect(self):
+        """Закрывает соединение текущего потока.
+
+        close() не переопределен: Django вызывает его в конце каждого
+        запроса, а соединение выгоднее держать открытым между запросами.
+        """
+        sock = getattr(self._local, 'socket', None)
+        if sock is not None:
+            self._local.socket = None
+            sock.close()
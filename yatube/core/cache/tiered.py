@@ -0,0 +1,238 @@
+import threading
+import time
+import uuid
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+
+# служебные ключи потока инвалидации в общем кэше
+SEQUENCE_KEY = 'tiered:sequence'
+MESSAGE_KEY = 'tiered:message:{}'
+
+# ключ сообщения, означающий очистку всего кэша
+CLEAR_ALL = '*'
+
+# при большем отставании L1 проще очистить целиком, чем догонять
+MAX_BACKLOG = 1000
+
+_MISSING = object()
+
+# состояние L1 общее для всех потоков процесса: caches[...] создает
+# отдельный экземпляр бэкенда на каждый поток
+_states = {}
+_states_lock = threading.Lock()
+
+
+def _identity_key(key, key_prefix, version):
+    """Ключ без изменений: префикс и версию добавляет TieredCache."""
+    return key
+
+
+class _State:
+    """Позиция процесса в потоке инвалидации."""
+
+    def __init__(self):
+        """Новый процесс еще не читал поток."""
+        self.origin = uuid.uuid4().hex
+        self.seen = None
+        self.synced_at = float('-inf')
+        self.lock = threading.Lock()
+
+
+class TieredCache(BaseCache):
+    """Двухуровневый кэш: LRU в памяти процесса поверх общего кэша.
+
+    L1 — LocMemCache с коротким сроком жизни, L2 — общий для воркеров
+    кэш из CACHES (file, sqlite, socket). Чтения обслуживаются из L1, а
+    промахи — из L2 с сохранением в L1. Каждая запись и удаление
+    публикуются в поток инвалидации в L2: счетчик SEQUENCE_KEY и
+    сообщения с измененными ключами. Перед обращением к L1 процесс
+    не чаще раза в SYNC_INTERVAL секунд дочитывает поток и удаляет
+    из L1 ключи, измененные другими процессами.
+
+    LOCATION — имя L1, OPTIONS:
+        SHARED — алиас L2 в CACHES;
+        L1_TIMEOUT, L1_MAX_ENTRIES — срок жизни и размер L1;
+        SYNC_INTERVAL — как долго L1 может отставать от L2;
+        MESSAGE_TIMEOUT — сколько хранятся сообщения инвалидации.
+    """
+
+    def __init__(self, location, params):
+        """Создает L1 и находит общее состояние процесса."""
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = options.get('SHARED', 'shared')
+        self._l1_timeout = options.get('L1_TIMEOUT', 60)
+        self._sync_interval = options.get('SYNC_INTERVAL', 1)
+        self._message_timeout = options.get('MESSAGE_TIMEOUT', 300)
+        self.local = LocMemCache(f'tiered-{location}', {
+            'TIMEOUT': self._l1_timeout,
+            'KEY_FUNCTION': _identity_key,
+            'OPTIONS': {
+                'MAX_ENTRIES': options.get('L1_MAX_ENTRIES', 1000),
+            },
+        })
+        with _states_lock:
+            self._state = _states.setdefault(location, _State())
+
+    @property
+    def shared(self):
+        """Общий кэш L2."""
+        return caches[self._shared_alias]
+
+    def _key(self, key, version):
+        """Полный ключ с префиксом и версией."""
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _timeouts(self, timeout):
+        """Сроки жизни ключа в L2 и в L1."""
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return None, self._l1_timeout
+        return timeout, min(timeout, self._l1_timeout)
+
+    def _publish(self, keys):
+        """Сообщает другим процессам об изменении ключей."""
+        try:
+            sequence = self.shared.incr(SEQUENCE_KEY)
+        except ValueError:
+            self.shared.add(SEQUENCE_KEY, 0, None)
+            sequence = self.shared.incr(SEQUENCE_KEY)
+        self.shared.set(
+            MESSAGE_KEY.format(sequence),
+            (self._state.origin, list(keys)),
+            self._message_timeout,
+        )
+
+    def _sync(self):
+        """Удаляет из L1 ключи, измененные другими процессами."""
+        state = self._state
+        now = time.monotonic()
+        if now - state.synced_at < self._sync_interval:
+            return
+        with state.lock:
+            state.synced_at = now
+            sequence = self.shared.get(SEQUENCE_KEY, 0)
+            seen, state.seen = state.seen, sequence
+            if seen is None or sequence == seen:
+                return
+            if not seen < sequence <= seen + MAX_BACKLOG:
+                self.local.clear()
+                return
+            keys = [
+                MESSAGE_KEY.format(number)
+                for number in range(seen + 1, sequence + 1)
+            ]
+            messages = self.shared.get_many(keys)
+            if len(messages) < len(keys):
+                # часть сообщений истекла, и неизвестно, что в них было
+                self.local.clear()
+                return
+            self._apply(messages.values())
+
+    def _apply(self, messages):
+        """Удаляет из L1 ключи из чужих сообщений."""
+        stale = set()
+        for origin, keys in messages:
+            if origin != self._state.origin:
+                stale.update(keys)
+        if CLEAR_ALL in stale:
+            self.local.clear()
+        elif stale:
+            self.local.delete_many(stale)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        """Записывает значение, если его нет в L2."""
+        key = self._key(key, version)
+        shared_timeout, local_timeout = self._timeouts(timeout)
+        if not self.shared.add(key, value, shared_timeout):
+            return False
+        self.local.set(key, value, local_timeout)
+        self._publish([key])
+        return True
+
+    def get(self, key, default=None, version=None):
+        """Читает значение из L1, а при промахе — из L2."""
+        key = self._key(key, version)
+        self._sync()
+        value = self.local.get(key, _MISSING)
+        if value is _MISSING:
+            # метка промаха не передается в L2: сетевой бэкенд вернул бы
+            # ее копию, а не сам объект
+            found = self.shared.get_many([key])
+            if key not in found:
+                return default
+            value = found[key]
+            self.local.set(key, value)
+        return value
+
+    def get_many(self, keys, version=None):
+        """Читает ключи из L1, недостающие — одним запросом к L2."""
+        keys = {self._key(key, version): key for key in keys}
+        self._sync()
+        found = self.local.get_many(keys)
+        missing = [key for key in keys if key not in found]
+        if missing:
+            shared = self.shared.get_many(missing)
+            self.local.set_many(shared)
+            found.update(shared)
+        return {keys[key]: value for key, value in found.items()}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        """Записывает значение в оба уровня."""
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        """Записывает значения в оба уровня одним сообщением."""
+        data = {self._key(key, version): value for key, value in data.items()}
+        shared_timeout, local_timeout = self._timeouts(timeout)
+        failed = self.shared.set_many(data, shared_timeout)
+        self.local.set_many(data, local_timeout)
+        self._publish(data)
+        return failed
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        """Продлевает срок жизни ключа в L2."""
+        shared_timeout, _ = self._timeouts(timeout)
+        return self.shared.touch(self._key(key, version), shared_timeout)
+
+    def incr(self, key, delta=1, version=None):
+        """Увеличивает значение в L2 и сообщает об этом."""
+        key = self._key(key, version)
+        value = self.shared.incr(key, delta)
+        self.local.set(key, value)
+        self._publish([key])
+        return value
+
+    def delete(self, key, version=None):
+        """Удаляет ключ с обоих уровней."""
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        """Удаляет ключи с обоих уровней одним сообщением."""
+        keys = [self._key(key, version) for key in keys]
+        self.shared.delete_many(keys)
+        self.local.delete_many(keys)
+        self._publish(keys)
+
+    def has_key(self, key, version=None):
+        """Проверяет наличие ключа в L1 или L2."""
+        key = self._key(key, version)
+        self._sync()
+        return key in self.local or key in self.shared
+
+    def clear(self):
+        """Очищает оба уровня и L1 остальных процессов.
+
+        Счетчик потока переживает очистку, иначе процессы, уже прочитавшие
+        сообщения с теми же номерами, пропустили бы сообщение об очистке.
+        """
+        sequence = self.shared.get(SEQUENCE_KEY, 0)
+        self.shared.clear()
+        self.shared.add(SEQUENCE_KEY, sequence, None)
+        self.local.clear()
+        self._publish([CLEAR_ALL])
@@ -0,0 +1,58 @@
+import sqlite3
+import time
+
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+@receiver(connection_created)
+def apply_pragmas(sender, connection, **kwargs):
+    """Выполняет PRAGMA профиля на новом подключении к SQLite.
+
+    PRAGMA выполняются напрямую драйвером, мимо оберток Django, и не
+    попадают в замеры числа запросов.
+    """
+    pragmas = connection.settings_dict.get('PRAGMAS')
+    if connection.vendor != 'sqlite' or not pragmas:
+        return
+    for name, value in pragmas.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
+
+
+@receiver(request_started)
+def check_connections(**kwargs):
+    """Закрывает в начале запроса постоянные подключения, переставшие работать.
+
+    Подключение с CONN_MAX_AGE переживает запросы, и после перезапуска
+    сервера БД первый же запрос получил бы ошибку. Проверка идет не
+    чаще HEALTH_CHECK_INTERVAL секунд на подключение; закрытое
+    подключение Django откроет заново при первом запросе к БД.
+    """
+    now = time.monotonic()
+    for connection in connections.all():
+        interval = connection.settings_dict.get('HEALTH_CHECK_INTERVAL')
+        if interval is None or connection.connection is None:
+            continue
+        checked = getattr(connection, 'health_checked_at', None)
+        if checked is not None and now - checked < interval:
+            continue
+        connection.health_checked_at = now
+        if not connection.is_usable():
+            connection.close()
+
+
+def copy_sqlite(source, target):
+    """Копирует БД SQLite из файла source в target онлайн-бэкапом.
+
+    Копия согласована, даже если в source в это время пишут; файл
+    target заменяется целиком.
+    """
+    origin = sqlite3.connect(source)
+    copy = sqlite3.connect(target)
+    try:
+        origin.backup(copy)
+    finally:
+        copy.close()
+        origin.close()
@@ -0,0 +1,10 @@
+def sessionless(view):
+    """Отмечает view, которому не нужна сессия при анонимном чтении.
+
+    Такой view только читает общие данные и не обращается к
+    request.session и сообщениям; для безопасных запросов без cookie
+    сессии core.middleware пропускает загрузку сессии, пользователя
+    и хранилища сообщений.
+    """
+    view.sessionless = True
+    return view
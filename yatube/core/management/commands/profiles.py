@@ -0,0 +1,91 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import profiling
+
+
+class Command(BaseCommand):
+    """Просмотр профилей медленных запросов из PROFILE_DIR."""
+
+    help = (
+        'Выводит список записей ProfilingMiddleware, сводку по ним '
+        '(самые дорогие кадры стека и SQL) или одну запись целиком'
+    )
+
+    def add_arguments(self, parser):
+        """Фильтры и режим вывода."""
+        parser.add_argument('--dir', help='директория записей')
+        parser.add_argument('--view', help='только записи этого view')
+        parser.add_argument(
+            '--last', type=int, default=20,
+            help='сколько последних записей выводить в списке',
+        )
+        parser.add_argument(
+            '--summary', action='store_true',
+            help='сводка по всем выбранным записям',
+        )
+        parser.add_argument('--show', help='вывести запись с этим именем')
+        parser.add_argument('--top', type=int, default=10)
+
+    def handle(self, *args, **options):
+        """Выводит список, сводку или запись."""
+        directory = options['dir']
+        if options['show']:
+            self.show(options['show'], directory, options['top'])
+            return
+        names = []
+        for name in profiling.captures(directory):
+            meta, _ = profiling.load(name, directory)
+            if options['view'] in (None, meta.get('view')):
+                names.append((name, meta))
+        if not names:
+            self.stdout.write('Записей нет')
+            return
+        if options['summary']:
+            self.summary([name for name, _ in names], directory, options)
+            return
+        for name, meta in names[-options['last']:]:
+            self.stdout.write(
+                f'{name}  {meta["method"]} {meta["path"]} '
+                f'{meta["status"]} {meta["duration_ms"]:.0f}ms '
+                f'{meta["reason"]} samples={meta["samples"]} '
+                f'queries={len(meta["queries"])}'
+            )
+
+    def summary(self, names, directory, options):
+        """Выводит сводку по записям."""
+        summary = profiling.summarize(names, directory, options['top'])
+        self.stdout.write('По view:')
+        for view, stats in sorted(summary['views'].items()):
+            self.stdout.write(
+                f'  {view:32} captures={stats["captures"]} '
+                f'mean={stats["mean_ms"]:.0f}ms max={stats["max_ms"]:.0f}ms'
+            )
+        samples = summary['samples'] or 1
+        for title, key in (
+            ('Собственное время', 'own'), ('Время с вызовами', 'total')
+        ):
+            self.stdout.write(f'{title}:')
+            for frame, count in summary[key]:
+                self.stdout.write(f'  {count / samples:6.1%}  {frame}')
+        self.stdout.write('SQL:')
+        for sql, ms, executed in summary['sql']:
+            self.stdout.write(f'  {ms:9.1f}ms  x{executed:<5} {sql[:150]}')
+
+    def show(self, name, directory, top):
+        """Выводит одну запись: стеки и SQL."""
+        try:
+            meta, stacks = profiling.load(name, directory)
+        except FileNotFoundError:
+            raise CommandError(f'Записи {name} нет')
+        self.stdout.write(
+            f'{meta["view"]} {meta["method"]} {meta["path"]} '
+            f'{meta["duration_ms"]:.0f}ms, сэмплов {meta["samples"]} '
+            f'по {meta["interval_ms"]}ms'
+        )
+        for stack, count in stacks.most_common(top):
+            self.stdout.write(f'{count:5}  {stack.split(";")[-1]}')
+        for query in meta['queries']:
+            self.stdout.write(
+                f'  +{query["at_ms"]:.1f}ms {query["ms"]:.1f}ms '
+                f'{query["sql"][:150]}'
+            )
@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.cache.tcp import CacheServer
+
+
+class Command(BaseCommand):
+    """Запуск сервера общего кэша для профиля CACHE_BACKEND=socket."""
+
+    help = 'Запускает сервер кэша, общий для всех воркеров'
+
+    def add_arguments(self, parser):
+        """Адрес сервера и размер кэша."""
+        parser.add_argument(
+            'address', nargs='?', default=settings.CACHE_SERVER,
+            help='адрес в формате host:port',
+        )
+        parser.add_argument(
+            '--max-entries', type=int, default=10000,
+            help='сколько ключей хранить до вытеснения',
+        )
+
+    def handle(self, *args, **options):
+        """Слушает адрес до остановки по Ctrl+C."""
+        host, port = options['address'].rsplit(':', 1)
+        server = CacheServer((host, int(port)), options['max_entries'])
+        self.stdout.write(f'Сервер кэша слушает {server.location}')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,52 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from core.db import copy_sqlite
+from core.routers import replicas_synced
+
+
+class Command(BaseCommand):
+    """Обновление реплик SQLite копией основной БД."""
+
+    help = (
+        'Копирует основную БД SQLite в файлы реплик DATABASE_REPLICAS; '
+        'с --interval повторяет копирование, изображая отстающую '
+        'репликацию'
+    )
+
+    def add_arguments(self, parser):
+        """Период повторения."""
+        parser.add_argument(
+            '--interval', type=float,
+            help='Копировать каждые столько секунд до остановки по Ctrl+C',
+        )
+
+    def handle(self, *args, **options):
+        """Копирует основную БД в реплики один раз или периодически."""
+        primary = settings.DATABASES[DEFAULT_DB_ALIAS]
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('Реплик нет: задайте DB_REPLICAS')
+        if primary['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError(
+                'Копировать можно только SQLite, реплики PostgreSQL '
+                'обновляет потоковая репликация'
+            )
+        try:
+            while True:
+                for alias in settings.DATABASE_REPLICAS:
+                    copy_sqlite(
+                        primary['NAME'], settings.DATABASES[alias]['NAME']
+                    )
+                replicas_synced()
+                self.stdout.write(
+                    'Реплики обновлены: '
+                    + ', '.join(settings.DATABASE_REPLICAS)
+                )
+                if not options['interval']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
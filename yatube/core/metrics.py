@@ -0,0 +1,300 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.cache.backends.base import BaseCache
+from django.db import connections
+from django.template.backends.django import Template
+from django.utils.module_loading import import_string
+
+# границы корзин гистограмм; последняя корзина +Inf добавляется сама
+SECONDS_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+QUERIES_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+BYTES_BUCKETS = (
+    1024, 4096, 16384, 65536, 262144, 1048576, 4194304,
+)
+
+_local = threading.local()
+
+
+class RequestStats:
+    """Стоимость обработки одного запроса."""
+
+    __slots__ = (
+        'queries', 'db_time', 'cache_hits', 'cache_misses', 'template_time',
+    )
+
+    def __init__(self):
+        """Нулевые счетчики."""
+        self.queries = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.template_time = 0.0
+
+
+def _active():
+    """Счетчики всех вложенных замеров текущего потока."""
+    return getattr(_local, 'active', ())
+
+
+@contextmanager
+def _outermost(flag):
+    """Отмечает, внешнее ли это из вложенных обращений вида flag."""
+    nested = getattr(_local, flag, False)
+    setattr(_local, flag, True)
+    try:
+        yield not nested
+    finally:
+        setattr(_local, flag, nested)
+
+
+class _QueryTimer:
+    """Обертка выполнения SQL, считающая запросы и их время."""
+
+    def __init__(self, stats):
+        """Обертка, пишущая в stats."""
+        self.stats = stats
+
+    def __call__(self, execute, sql, params, many, context):
+        """Выполняет запрос и учитывает его."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.stats.queries += 1
+            self.stats.db_time += time.perf_counter() - start
+
+
+@contextmanager
+def collect():
+    """Считает стоимость кода внутри блока и возвращает RequestStats.
+
+    SQL-запросы считаются обертками подключений текущего потока ко
+    всем БД (основной и репликам), обращения к кэшу и отрисовка
+    шаблонов — обертками из install(). Замеры могут быть вложенными,
+    каждый получает все, что произошло внутри него.
+    """
+    stats = RequestStats()
+    active = _active()
+    _local.active = active + (stats,)
+    try:
+        with ExitStack() as stack:
+            timer = _QueryTimer(stats)
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            yield stats
+    finally:
+        _local.active = active
+
+
+def _counted_get(method):
+    """Обертка get бэкенда кэша, считающая попадания и промахи.
+
+    Бэкенду передается default=None, как в самом Django: своя метка
+    промаха по сети вернулась бы копией и считалась бы попаданием.
+    """
+    def get(self, key, default=None, version=None):
+        with _outermost('in_cache') as outermost:
+            value = method(self, key, version=version)
+        if outermost:
+            for stats in _active():
+                if value is not None:
+                    stats.cache_hits += 1
+                else:
+                    stats.cache_misses += 1
+        return default if value is None else value
+    get.metrics_original = method
+    return get
+
+
+def _counted_get_many(method):
+    """Обертка get_many бэкенда кэша, считающая попадания и промахи."""
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        with _outermost('in_cache') as outermost:
+            found = method(self, keys, version=version)
+        if outermost:
+            for stats in _active():
+                stats.cache_hits += len(found)
+                stats.cache_misses += len(keys) - len(found)
+        return found
+    get_many.metrics_original = method
+    return get_many
+
+
+def _timed_render(method):
+    """Обертка отрисовки шаблона, считающая ее время."""
+    def render(self, context=None, request=None):
+        with _outermost('in_template') as outermost:
+            if not outermost:
+                return method(self, context, request)
+            start = time.perf_counter()
+            try:
+                return method(self, context, request)
+            finally:
+                elapsed = time.perf_counter() - start
+                for stats in _active():
+                    stats.template_time += elapsed
+    render.metrics_original = method
+    return render
+
+
+def install():
+    """Подключает счетчики к бэкендам кэша из CACHES и к шаблонам.
+
+    Обертки подменяют методы классов один раз на процесс и вне
+    замеров стоят одного обращения к threading.local. get_many,
+    унаследованный от BaseCache, вызывает get и не оборачивается.
+    """
+    for options in settings.CACHES.values():
+        backend = import_string(options['BACKEND'])
+        if not hasattr(backend.get, 'metrics_original'):
+            backend.get = _counted_get(backend.get)
+        if backend.get_many is not BaseCache.get_many and not hasattr(
+            backend.get_many, 'metrics_original'
+        ):
+            backend.get_many = _counted_get_many(backend.get_many)
+    if not hasattr(Template.render, 'metrics_original'):
+        Template.render = _timed_render(Template.render)
+
+
+class Histogram:
+    """Гистограмма в формате Prometheus: счетчики корзин, сумма, число."""
+
+    def __init__(self, buckets):
+        """Пустая гистограмма с верхними границами корзин buckets."""
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        """Учитывает значение; вызывается под блокировкой реестра."""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """Пары (граница, число значений не больше нее)."""
+        total = 0
+        for bound, count in zip(
+            [*map(_number, self.buckets), '+Inf'], self.counts
+        ):
+            total += count
+            yield bound, total
+
+
+def _number(value):
+    """Число в записи Prometheus."""
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _labels(labels):
+    """Метки в записи Prometheus."""
+    return ','.join(
+        '{}="{}"'.format(
+            name,
+            str(value).replace('\\', r'\\').replace('"', r'\"')
+            .replace('\n', r'\n'),
+        )
+        for name, value in labels
+    )
+
+
+class Registry:
+    """Метрики процесса по именам view.
+
+    Каждый процесс сервера копит свои метрики, Prometheus собирает и
+    суммирует их по всем процессам.
+    """
+
+    # имя, тип, описание и корзины (для гистограмм)
+    METRICS = (
+        ('request_duration_seconds', 'histogram',
+         'Время обработки запроса', SECONDS_BUCKETS),
+        ('db_queries', 'histogram',
+         'Число SQL-запросов на запрос', QUERIES_BUCKETS),
+        ('db_duration_seconds', 'histogram',
+         'Время SQL-запросов на запрос', SECONDS_BUCKETS),
+        ('template_duration_seconds', 'histogram',
+         'Время отрисовки шаблонов на запрос', SECONDS_BUCKETS),
+        ('response_size_bytes', 'histogram',
+         'Размер тела ответа', BYTES_BUCKETS),
+        ('cache_hits_total', 'counter', 'Попадания в кэш', None),
+        ('cache_misses_total', 'counter', 'Промахи кэша', None),
+        ('responses_total', 'counter', 'Ответы по кодам статуса', None),
+    )
+
+    def __init__(self, prefix='yatube'):
+        """Пустой реестр метрик с префиксом имен prefix."""
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Сбрасывает все метрики."""
+        with self.lock:
+            self.values = {name: {} for name, *_ in self.METRICS}
+
+    def record(self, view, status, duration, stats, size=None):
+        """Учитывает обработанный запрос к view."""
+        key = (('view', view),)
+        with self.lock:
+            for name, value in (
+                ('request_duration_seconds', duration),
+                ('db_queries', stats.queries),
+                ('db_duration_seconds', stats.db_time),
+                ('template_duration_seconds', stats.template_time),
+                ('response_size_bytes', size),
+            ):
+                if value is None:
+                    continue
+                histograms = self.values[name]
+                if key not in histograms:
+                    histograms[key] = Histogram(self.buckets(name))
+                histograms[key].observe(value)
+            for name, value in (
+                ('cache_hits_total', stats.cache_hits),
+                ('cache_misses_total', stats.cache_misses),
+            ):
+                self.values[name][key] = self.values[name].get(key, 0) + value
+            status_key = key + (('status', status),)
+            responses = self.values['responses_total']
+            responses[status_key] = responses.get(status_key, 0) + 1
+
+    def buckets(self, name):
+        """Корзины гистограммы name."""
+        return next(
+            buckets for metric, _, _, buckets in self.METRICS
+            if metric == name
+        )
+
+    def export(self):
+        """Метрики в текстовом формате Prometheus."""
+        lines = []
+        with self.lock:
+            for name, kind, description, _ in self.METRICS:
+                full = f'{self.prefix}_{name}'
+                lines.append(f'# HELP {full} {description}')
+                lines.append(f'# TYPE {full} {kind}')
+                for key, value in sorted(self.values[name].items()):
+                    if kind == 'counter':
+                        lines.append(f'{full}{{{_labels(key)}}} {value}')
+                        continue
+                    for bound, total in value.cumulative():
+                        labels = _labels(key + (('le', bound),))
+                        lines.append(f'{full}_bucket{{{labels}}} {total}')
+                    lines.append(
+                        f'{full}_sum{{{_labels(key)}}} {_number(value.sum)}'
+                    )
+                    lines.append(f'{full}_count{{{_labels(key)}}} '
+                                 f'{value.count}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
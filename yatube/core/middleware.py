@@ -0,0 +1,245 @@
+import time
+from itertools import count
+
+from django.conf import settings
+from django.contrib.auth import middleware as auth_middleware
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.messages import middleware as messages_middleware
+from django.contrib.sessions import middleware as sessions_middleware
+from django.core.cache import cache
+from django.urls import Resolver404, resolve
+from django.utils.cache import patch_vary_headers
+
+from . import metrics, pagecache, profiling, routers
+
+
+def _match(request):
+    """Найденный для запроса view или None; ищется один раз."""
+    if not hasattr(request, 'early_match'):
+        try:
+            request.early_match = resolve(request.path_info)
+        except Resolver404:
+            request.early_match = None
+    return request.early_match
+
+
+def is_sessionless(request):
+    """Обходится ли запрос без сессии, пользователя и сообщений.
+
+    Это безопасные запросы без cookie сессии к view, отмеченным
+    core.decorators.sessionless: пользователь у них всегда анонимный.
+    """
+    if not hasattr(request, 'sessionless'):
+        match = None
+        if (
+            request.method in ('GET', 'HEAD')
+            and settings.SESSION_COOKIE_NAME not in request.COOKIES
+        ):
+            match = _match(request)
+        request.sessionless = match is not None and getattr(
+            match.func, 'sessionless', False
+        )
+    return request.sessionless
+
+
+class MetricsMiddleware:
+    """Замеры стоимости запросов по именам view.
+
+    Стоит первым в MIDDLEWARE, чтобы время запроса включало остальные
+    middleware. Для каждого запроса учитываются время, число и время
+    SQL-запросов, попадания в кэш, время отрисовки шаблонов и размер
+    ответа; метрики отдает view core.views.metrics.
+    """
+
+    def __init__(self, get_response):
+        """Middleware над обработчиком get_response."""
+        self.get_response = get_response
+        self.enabled = settings.METRICS_ENABLED
+        if self.enabled:
+            metrics.install()
+
+    def __call__(self, request):
+        """Обрабатывает запрос и учитывает его стоимость."""
+        if not self.enabled:
+            return self.get_response(request)
+        start = time.perf_counter()
+        with metrics.collect() as stats:
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+        match = request.resolver_match
+        metrics.registry.record(
+            match.view_name if match else '<unresolved>',
+            response.status_code,
+            duration,
+            stats,
+            None if response.streaming else len(response.content),
+        )
+        return response
+
+
+class ProfilingMiddleware:
+    """Запись стеков и SQL медленных запросов.
+
+    Включается PROFILE_ENABLED. Стеки запроса снимает сэмплер, если
+    запрос идет дольше PROFILE_THRESHOLD секунд, а у каждого
+    PROFILE_SAMPLE_RATE-го запроса — с самого начала. Такие запросы
+    сохраняются в PROFILE_DIR, список и сводку выводит команда
+    profiles.
+    """
+
+    def __init__(self, get_response):
+        """Middleware над обработчиком get_response."""
+        self.get_response = get_response
+        self.enabled = settings.PROFILE_ENABLED
+        self.threshold = settings.PROFILE_THRESHOLD
+        self.rate = settings.PROFILE_SAMPLE_RATE
+        self.counter = count(1)
+
+    def __call__(self, request):
+        """Обрабатывает запрос и сохраняет его профиль, если нужно."""
+        if not self.enabled:
+            return self.get_response(request)
+        sampled = bool(self.rate) and next(self.counter) % self.rate == 0
+        capture = profiling.Capture(0 if sampled else self.threshold)
+        with profiling.capturing(capture):
+            response = self.get_response(request)
+        if sampled or capture.duration >= self.threshold:
+            match = request.resolver_match
+            profiling.save(capture, {
+                'view': match.view_name if match else '<unresolved>',
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'reason': 'sampled' if sampled else 'slow',
+            })
+        return response
+
+
+class ReplicaMiddleware:
+    """Чтение с реплик в запросах и закрепление за основной БД.
+
+    Запрос, который писал в БД, ставит cookie REPLICA_PIN_COOKIE на
+    REPLICA_PIN_SECONDS секунд, и запросы с ней читают основную БД:
+    пользователь сразу видит свой пост, комментарий или подписку, даже
+    если реплики отстают. Без DATABASE_REPLICAS ничего не делает.
+    """
+
+    def __init__(self, get_response):
+        """Middleware над обработчиком get_response."""
+        self.get_response = get_response
+
+    def __call__(self, request):
+        """Обрабатывает запрос с чтением с реплик."""
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        pinned = settings.REPLICA_PIN_COOKIE in request.COOKIES
+        with routers.request_scope(pinned) as state:
+            response = self.get_response(request)
+        if state['wrote']:
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE, '1',
+                max_age=settings.REPLICA_PIN_SECONDS, httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+
+class PageCacheMiddleware:
+    """Страницы целиком из кэша для анонимных посетителей.
+
+    Стоит перед SessionMiddleware: запрос без cookie сессии к view с
+    версией данных (атрибут page_version, см.
+    posts.caching.conditional_page) отдается из кэша без сессии,
+    аутентификации, сообщений и шаблонов. Ключ — путь с параметрами и
+    версия данных, поэтому изменение данных сразу делает прежнюю копию
+    ненужной. Включается PAGE_CACHE_ENABLED.
+    """
+
+    def __init__(self, get_response):
+        """Middleware над обработчиком get_response."""
+        self.get_response = get_response
+
+    def __call__(self, request):
+        """Отдает страницу из кэша или сохраняет ее после view."""
+        version = self.version(request)
+        if version is None:
+            return self.get_response(request)
+        key = pagecache.page_key('anonymous', request, version)
+        frozen = cache.get(key)
+        if frozen is not None:
+            return pagecache.restore(request, frozen)
+        response = self.get_response(request)
+        if pagecache.storable(response):
+            cache.set(
+                key, pagecache.freeze(response),
+                routers.cache_timeout(settings.PAGE_CACHE_TIMEOUT),
+            )
+        return response
+
+    def version(self, request):
+        """Версия данных страницы анонимного запроса или None."""
+        if (
+            not settings.PAGE_CACHE_ENABLED
+            or request.method not in ('GET', 'HEAD')
+            or settings.SESSION_COOKIE_NAME in request.COOKIES
+        ):
+            return None
+        match = _match(request)
+        version_func = match and getattr(match.func, 'page_version', None)
+        if version_func is None:
+            return None
+        # без cookie сессии AuthenticationMiddleware дала бы того же
+        # анонимного пользователя; имя view нужно метрикам
+        request.user = AnonymousUser()
+        request.resolver_match = match
+        return pagecache.page_version(
+            request, version_func, match.args, match.kwargs
+        )
+
+
+class SessionMiddleware(sessions_middleware.SessionMiddleware):
+    """SessionMiddleware без хранилища сессии для анонимных чтений.
+
+    У запросов, для которых is_sessionless, нет request.session, и
+    сессия не создается и не сохраняется.
+    """
+
+    def process_request(self, request):
+        """Подключает сессию, если она нужна запросу."""
+        if not is_sessionless(request):
+            super().process_request(request)
+
+    def process_response(self, request, response):
+        """Сохраняет сессию, если она была у запроса.
+
+        Ответ без сессии годится только для запросов без cookie сессии,
+        поэтому общие кэши должны различать его по Cookie.
+        """
+        if is_sessionless(request):
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        return super().process_response(request, response)
+
+
+class AuthenticationMiddleware(auth_middleware.AuthenticationMiddleware):
+    """AuthenticationMiddleware, сразу дающая аноним без сессии."""
+
+    def process_request(self, request):
+        """Ставит request.user: анонима или ленивого из сессии."""
+        if is_sessionless(request):
+            request.user = AnonymousUser()
+            return
+        super().process_request(request)
+
+
+class MessageMiddleware(messages_middleware.MessageMiddleware):
+    """MessageMiddleware без хранилища сообщений для анонимных чтений.
+
+    Без request._messages контекстный процессор отдает пустой список,
+    а process_response родителя ничего не сохраняет.
+    """
+
+    def process_request(self, request):
+        """Подключает хранилище сообщений, если запросу нужна сессия."""
+        if not is_sessionless(request):
+            super().process_request(request)
@@ -0,0 +1,126 @@
+import hashlib
+import re
+from urllib.parse import parse_qsl, urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response
+
+from . import routers
+
+# метка части страницы в закэшированной оболочке; текст постов и
+# комментариев экранируется шаблонами, поэтому подделать метку нельзя
+HOLE_RE = re.compile(r'<!--hole:(\w+):([^>]*)-->')
+
+_holes = {}
+
+
+def hole(name):
+    """Регистрирует часть страницы name, зависящую от пользователя.
+
+    Функция части получает запрос и строковые аргументы тега
+    {% hole %} и возвращает имя шаблона и контекст для него.
+    """
+    def register(func):
+        _holes[name] = func
+        return func
+    return register
+
+
+@hole('header')
+def header(request):
+    """Шапка: ссылки зависят от того, вошел ли пользователь."""
+    return 'includes/header.html', {}
+
+
+def render_hole(request, name, args):
+    """Часть страницы name для пользователя запроса."""
+    template_name, context = _holes[name](request, **args)
+    return render_to_string(template_name, context, request)
+
+
+def marker(name, args):
+    """Метка части страницы в оболочке."""
+    return f'<!--hole:{name}:{urlencode(args)}-->'
+
+
+def fill(shell, request):
+    """Страница из оболочки с частями для пользователя запроса."""
+    return HOLE_RE.sub(
+        lambda match: render_hole(
+            request, match[1], dict(parse_qsl(match[2]))
+        ),
+        shell,
+    )
+
+
+def page_version(request, version_func, args, kwargs):
+    """Версия данных страницы; считается один раз на запрос.
+
+    None означает, что страницы нет, и кэш не используется.
+    """
+    if not hasattr(request, 'page_version'):
+        request.page_version = version_func(request, *args, **kwargs)
+    return request.page_version
+
+
+def page_key(kind, request, version):
+    """Ключ страницы: путь с параметрами и версия ее данных."""
+    digest = hashlib.md5(':'.join(map(str, (
+        request.get_full_path(), *version
+    ))).encode()).hexdigest()
+    return f'page:{kind}:{digest}'
+
+
+def render_shell(request, key, view, *args, **kwargs):
+    """Ответ view со страницей, собранной из закэшированной оболочки.
+
+    Оболочка — страница, где вместо частей, зависящих от пользователя,
+    стоят метки; она рендерится один раз на версию данных, а части
+    заполняются при каждом запросе. При промахе возвращается ответ
+    самого view с замененным телом.
+    """
+    shell = cache.get(key)
+    if shell is None:
+        request.page_shell = True
+        try:
+            response = view(request, *args, **kwargs)
+        finally:
+            request.page_shell = False
+        if response.status_code != 200 or response.streaming:
+            return response
+        shell = response.content.decode(response.charset)
+        cache.set(
+            key, shell, routers.cache_timeout(settings.PAGE_CACHE_TIMEOUT)
+        )
+    else:
+        response = HttpResponse()
+    response.content = fill(shell, request)
+    return response
+
+
+def storable(response):
+    """Можно ли отдавать ответ всем анонимным посетителям."""
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+    )
+
+
+def freeze(response):
+    """Ответ в виде для кэша: тело и заголовки."""
+    return response.content, list(response.items())
+
+
+def restore(request, frozen):
+    """Ответ из кэша или 304, если у клиента та же версия."""
+    content, headers = frozen
+    response = HttpResponse(content)
+    for header, value in headers:
+        response[header] = value
+    return get_conditional_response(
+        request, etag=response.get('ETag'), response=response
+    )
@@ -0,0 +1,277 @@
+import datetime
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+STACKS_SUFFIX = '.folded'
+META_SUFFIX = '.json'
+
+
+def _frame_name(code):
+    """Имя кадра стека: функция и ее файл относительно проекта."""
+    filename = code.co_filename
+    for root in ('site-packages' + os.sep, settings.BASE_DIR + os.sep):
+        position = filename.rfind(root)
+        if position != -1:
+            filename = filename[position + len(root):]
+            break
+    return f'{code.co_name} ({filename}:{code.co_firstlineno})'
+
+
+def fold(frame):
+    """Стек кадра в свернутой записи flame graph: от корня через ';'."""
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame.f_code))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class Capture:
+    """Стеки и SQL одного запроса.
+
+    Стеки снимаются сэмплером, когда запрос идет дольше threshold
+    секунд (при threshold=0 — с самого начала), SQL-запросы
+    записываются все.
+    """
+
+    def __init__(self, threshold):
+        """Запись запроса, стеки которого снимаются после threshold."""
+        self.threshold = threshold
+        self.start = time.perf_counter()
+        self.duration = None
+        self.stacks = Counter()
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        """Выполняет SQL-запрос и записывает его текст и время."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if len(self.queries) < settings.PROFILE_MAX_QUERIES:
+                self.queries.append((
+                    round((start - self.start) * 1000, 3),
+                    round((time.perf_counter() - start) * 1000, 3),
+                    sql,
+                ))
+
+
+class Sampler(threading.Thread):
+    """Поток, периодически снимающий стеки потоков запросов.
+
+    Пока запросов нет, поток спит; пока идут только быстрые запросы,
+    он лишь сверяет их время с порогом, поэтому профилирование почти
+    ничего не стоит, если медленных запросов нет.
+    """
+
+    def __init__(self, interval):
+        """Сэмплер с периодом interval секунд."""
+        super().__init__(name='profiling-sampler', daemon=True)
+        self.interval = interval
+        self.captures = {}
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+
+    def register(self, capture):
+        """Начинает следить за запросом текущего потока."""
+        with self.lock:
+            self.captures[threading.get_ident()] = capture
+        self.wakeup.set()
+
+    def unregister(self):
+        """Перестает следить за запросом текущего потока."""
+        with self.lock:
+            self.captures.pop(threading.get_ident(), None)
+
+    def run(self):
+        """Снимает стеки, пока процесс жив."""
+        while True:
+            if not self.captures:
+                self.wakeup.wait()
+                self.wakeup.clear()
+                continue
+            time.sleep(self.interval)
+            self.sample()
+
+    def sample(self):
+        """Снимает стеки запросов, превысивших порог."""
+        now = time.perf_counter()
+        frames = None
+        with self.lock:
+            for ident, capture in self.captures.items():
+                if now - capture.start < capture.threshold:
+                    continue
+                if frames is None:
+                    frames = sys._current_frames()
+                frame = frames.get(ident)
+                if frame is not None:
+                    capture.stacks[fold(frame)] += 1
+
+
+_sampler = None
+_sampler_lock = threading.Lock()
+
+
+def sampler():
+    """Сэмплер процесса; запускается при первом обращении."""
+    global _sampler
+    with _sampler_lock:
+        if _sampler is None or not _sampler.is_alive():
+            _sampler = Sampler(settings.PROFILE_INTERVAL)
+            _sampler.start()
+    return _sampler
+
+
+@contextmanager
+def capturing(capture):
+    """Записывает стеки и SQL кода внутри блока в capture."""
+    current = sampler()
+    current.register(capture)
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(capture))
+            yield capture
+    finally:
+        current.unregister()
+        capture.duration = time.perf_counter() - capture.start
+
+
+def _slug(value):
+    """Часть имени файла из имени view."""
+    return re.sub(r'[^\w.-]+', '_', value)[:60]
+
+
+def save(capture, meta, directory=None, keep=None):
+    """Пишет стеки и описание запроса и возвращает имя записи.
+
+    Стеки пишутся в <имя>.folded (вход для flamegraph.pl или
+    speedscope), описание и SQL — в <имя>.json. В директории
+    остаются keep последних записей.
+    """
+    directory = directory or settings.PROFILE_DIR
+    keep = keep or settings.PROFILE_KEEP
+    os.makedirs(directory, exist_ok=True)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    duration_ms = round(capture.duration * 1000, 3)
+    name = '{}-{}-{}ms'.format(
+        now.strftime('%Y%m%dT%H%M%S%f'), _slug(meta.get('view', '')),
+        int(duration_ms),
+    )
+    path = os.path.join(directory, name)
+    with open(path + STACKS_SUFFIX, 'w', encoding='utf-8') as file:
+        for stack, count in capture.stacks.most_common():
+            file.write(f'{stack} {count}\n')
+    with open(path + META_SUFFIX, 'w', encoding='utf-8') as file:
+        json.dump({
+            **meta,
+            'time': now.isoformat(),
+            'duration_ms': duration_ms,
+            'threshold_ms': round(capture.threshold * 1000, 3),
+            'interval_ms': round(settings.PROFILE_INTERVAL * 1000, 3),
+            'samples': sum(capture.stacks.values()),
+            'queries': [
+                {'at_ms': at, 'ms': duration, 'sql': sql}
+                for at, duration, sql in capture.queries
+            ],
+        }, file, ensure_ascii=False, indent=1)
+    rotate(directory, keep)
+    return name
+
+
+def captures(directory=None):
+    """Имена записей в директории от старых к новым."""
+    directory = directory or settings.PROFILE_DIR
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        name[:-len(META_SUFFIX)] for name in os.listdir(directory)
+        if name.endswith(META_SUFFIX)
+    )
+
+
+def rotate(directory, keep):
+    """Удаляет записи, кроме keep последних."""
+    names = captures(directory)
+    for name in names[:max(0, len(names) - keep)]:
+        for suffix in (META_SUFFIX, STACKS_SUFFIX):
+            try:
+                os.remove(os.path.join(directory, name + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def load(name, directory=None):
+    """Описание записи и ее стеки {стек: число сэмплов}."""
+    path = os.path.join(directory or settings.PROFILE_DIR, name)
+    with open(path + META_SUFFIX, encoding='utf-8') as file:
+        meta = json.load(file)
+    stacks = Counter()
+    try:
+        with open(path + STACKS_SUFFIX, encoding='utf-8') as file:
+            for line in file:
+                stack, _, count = line.rstrip('\n').rpartition(' ')
+                stacks[stack] += int(count)
+    except FileNotFoundError:
+        pass
+    return meta, stacks
+
+
+def _normalize(sql):
+    """Текст SQL без конкретных списков параметров IN (...)."""
+    return re.sub(r'\((?:%s, )+%s\)', '(%s, ...)', sql)
+
+
+def summarize(names, directory=None, top=10):
+    """Сводка по записям names.
+
+    По view — число записей, среднее и наибольшее время; по кадрам —
+    доля сэмплов, где кадр на вершине стека (собственное время) и где
+    он есть в стеке (время с вызовами); по SQL — суммарное время и
+    число выполнений одинаковых запросов.
+    """
+    views = {}
+    own = Counter()
+    total = Counter()
+    sql_time = Counter()
+    sql_count = Counter()
+    samples = 0
+    for name in names:
+        meta, stacks = load(name, directory)
+        views.setdefault(meta.get('view', ''), []).append(meta['duration_ms'])
+        for stack, count in stacks.items():
+            frames = stack.split(';')
+            own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+            samples += count
+        for query in meta['queries']:
+            sql = _normalize(query['sql'])
+            sql_time[sql] += query['ms']
+            sql_count[sql] += 1
+    return {
+        'views': {
+            view: {
+                'captures': len(durations),
+                'mean_ms': round(sum(durations) / len(durations), 3),
+                'max_ms': max(durations),
+            }
+            for view, durations in views.items()
+        },
+        'samples': samples,
+        'own': own.most_common(top),
+        'total': total.most_common(top),
+        'sql': [
+            (sql, round(ms, 3), sql_count[sql])
+            for sql, ms in sql_time.most_common(top)
+        ],
+    }
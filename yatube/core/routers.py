@@ -0,0 +1,127 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# приложения, которые читаются только из основной БД: сессия, только
+# что созданная при входе, должна находиться сразу
+PRIMARY_APPS = {'sessions'}
+
+# метка последнего обновления реплик, входит в версии данных из реплик
+REPLICA_SYNC_KEY = 'replica_sync'
+
+_local = threading.local()
+
+
+@contextmanager
+def request_scope(pinned=False):
+    """Включает чтение с реплик для запроса внутри блока.
+
+    pinned направляет все чтения в основную БД: пользователь недавно
+    что-то записал и должен видеть свои изменения, даже если реплики
+    отстают. Возвращает словарь состояния; после блока в нем 'wrote'
+    отмечает, что запрос писал в БД.
+    """
+    state = {
+        'pinned': pinned, 'wrote': False, 'replica': None, 'synced': None,
+    }
+    _local.state = state
+    try:
+        yield state
+    finally:
+        _local.state = None
+
+
+def read_replica():
+    """Реплика, с которой читает текущий запрос, или None.
+
+    None — запрос читает основную БД или идет вне request_scope.
+    Реплика выбирается одна на запрос при первом обращении: у разных
+    реплик разное отставание.
+    """
+    state = getattr(_local, 'state', None)
+    if (
+        state is None
+        or not settings.DATABASE_REPLICAS
+        or state['pinned']
+        or connections[DEFAULT_DB_ALIAS].in_atomic_block
+    ):
+        return None
+    if state['replica'] is None:
+        state['replica'] = random.choice(settings.DATABASE_REPLICAS)
+    return state['replica']
+
+
+def replica_version():
+    """Метка данных реплики текущего запроса для версий кэша или None.
+
+    Реплика отстает от основной БД, поэтому страница, собранная по ее
+    данным, кэшируется отдельно от собранных по основной БД: иначе
+    устаревшая страница легла бы под версию, уже учитывающую запись, и
+    ее видели бы и закрепленные за основной БД клиенты. Метка меняется
+    при каждом обновлении реплик (replicas_synced).
+    """
+    alias = read_replica()
+    if alias is None:
+        return None
+    state = _local.state
+    if state['synced'] is None:
+        state['synced'] = cache.get(REPLICA_SYNC_KEY, 0)
+    return f'{alias}.{state["synced"]}'
+
+
+def replicas_synced():
+    """Отмечает обновление реплик: прежние их страницы устаревают."""
+    cache.set(REPLICA_SYNC_KEY, time.time_ns(), None)
+
+
+def cache_timeout(timeout):
+    """Срок хранения в кэше данных, прочитанных текущим запросом.
+
+    Данные реплики хранятся не дольше REPLICA_PIN_SECONDS — времени,
+    за которое реплики должны догнать основную БД: потоковую
+    репликацию PostgreSQL replicas_synced не отмечает.
+    """
+    if read_replica() is None:
+        return timeout
+    if timeout is None:
+        return settings.REPLICA_PIN_SECONDS
+    return min(timeout, settings.REPLICA_PIN_SECONDS)
+
+
+class ReplicaRouter:
+    """Чтения — с реплик DATABASE_REPLICAS, запись — в основную БД.
+
+    Реплики используются только внутри запросов (request_scope), поэтому
+    команды, фоновые потоки и обработчики вне запросов читают основную
+    БД. После первой записи и внутри транзакции основной БД запрос
+    тоже читает только ее, сессии всегда читаются из нее.
+    """
+
+    def db_for_read(self, model, **hints):
+        """Реплика запроса, основная БД или None — без мнения."""
+        state = getattr(_local, 'state', None)
+        if state is None or not settings.DATABASE_REPLICAS:
+            return None
+        if model._meta.app_label in PRIMARY_APPS:
+            return DEFAULT_DB_ALIAS
+        return read_replica() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        """Основная БД; запрос с этого момента читает только ее."""
+        state = getattr(_local, 'state', None)
+        if state is not None:
+            state['pinned'] = state['wrote'] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """Реплики содержат те же данные, что и основная БД."""
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """Схему меняют только в основной БД, реплики ее копируют."""
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,27 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from core import pagecache
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, name, **args):
+    """Часть страницы, зависящая от пользователя.
+
+    Использование::
+
+        {% hole 'follow_button' author=author.username %}
+
+    Аргументы передаются функции части строками. Пока рендерится
+    оболочка для кэша, вместо части выводится метка, которую
+    pagecache.fill заменяет при каждом запросе. Части не должны
+    стоять внутри {% feed_cache %}, иначе метка или чужая часть
+    попадет в общий фрагмент.
+    """
+    request = context.get('request')
+    args = {key: str(value) for key, value in args.items()}
+    if getattr(request, 'page_shell', False):
+        return mark_safe(pagecache.marker(name, args))
+    return mark_safe(pagecache.render_hole(request, name, args))
@@ -0,0 +1,198 @@
+import shutil
+import tempfile
+import threading
+from os import path
+
+from django.test import SimpleTestCase, override_settings
+
+from core.cache.sqlite import SQLiteCache
+from core.cache.tcp import SocketCache, serve_in_thread
+from core.cache.tiered import TieredCache
+
+
+class CacheContractMixin:
+    """Общие проверки бэкенда кэша, созданного в make_cache()."""
+
+    def test_get_set_delete(self):
+        """Запись, чтение и удаление ключа."""
+        cache = self.make_cache()
+        self.assertIsNone(cache.get('key'))
+        cache.set('key', {'value': [1, 2]})
+        self.assertEqual(cache.get('key'), {'value': [1, 2]})
+        self.assertIn('key', cache)
+        cache.delete('key')
+        self.assertEqual(cache.get('key', 'default'), 'default')
+
+    def test_add_and_incr(self):
+        """Метод add не перезаписывает ключ, incr увеличивает значение."""
+        cache = self.make_cache()
+        self.assertTrue(cache.add('counter', 1))
+        self.assertFalse(cache.add('counter', 10))
+        self.assertEqual(cache.incr('counter'), 2)
+        self.assertEqual(cache.incr('counter', 5), 7)
+        with self.assertRaises(ValueError):
+            cache.incr('missing')
+
+    def test_expiration(self):
+        """Просроченный ключ не читается и может быть добавлен заново."""
+        cache = self.make_cache()
+        cache.set('key', 'value', 0)
+        self.assertIsNone(cache.get('key'))
+        self.assertTrue(cache.add('key', 'new'))
+        self.assertEqual(cache.get('key'), 'new')
+
+    def test_many(self):
+        """get_many, set_many, delete_many и clear."""
+        cache = self.make_cache()
+        cache.set_many({'a': 1, 'b': 2})
+        self.assertEqual(cache.get_many(['a', 'b', 'c']), {'a': 1, 'b': 2})
+        cache.delete_many(['a'])
+        self.assertEqual(cache.get_many(['a', 'b']), {'b': 2})
+        cache.clear()
+        self.assertEqual(cache.get_many(['a', 'b']), {})
+
+    def test_shared_between_workers(self):
+        """Запись одного воркера видна другому."""
+        first, second = self.make_cache(), self.make_cache()
+        first.set('key', 'value')
+        self.assertEqual(second.get('key'), 'value')
+        self.assertFalse(second.add('key', 'other'))
+
+
+class SQLiteCacheTest(CacheContractMixin, SimpleTestCase):
+    """Тест кэша в файле SQLite."""
+
+    def setUp(self):
+        """Временная директория для файла кэша."""
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def make_cache(self, **params):
+        """Бэкенд поверх одного и того же файла."""
+        return SQLiteCache(path.join(self.directory, 'cache.sqlite3'), params)
+
+    def test_concurrent_incr(self):
+        """Вызовы incr из нескольких потоков не теряют обновлений."""
+        cache = self.make_cache()
+        cache.set('counter', 0)
+
+        def work():
+            for _ in range(50):
+                cache.incr('counter')
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(cache.get('counter'), 200)
+
+
+class SocketCacheTest(CacheContractMixin, SimpleTestCase):
+    """Тест сетевого кэша с локальным сервером."""
+
+    def setUp(self):
+        """Сервер кэша в фоновом потоке."""
+        self.server = serve_in_thread()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def make_cache(self):
+        """Клиент сервера."""
+        return SocketCache(self.server.location, {})
+
+    def test_server_errors_are_raised(self):
+        """Исключение на сервере поднимается у клиента."""
+        cache = self.make_cache()
+        cache.set('text', 'value')
+        with self.assertRaises(TypeError):
+            cache.incr('text')
+        self.assertEqual(cache.get('text'), 'value')
+
+
+class TieredCacheTest(CacheContractMixin, SimpleTestCase):
+    """Тест двухуровневого кэша поверх общего SQLite."""
+
+    def setUp(self):
+        """Общий кэш L2 и счетчик «процессов»."""
+        settings = override_settings(CACHES={
+            'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            },
+            'shared': self.shared_backend(),
+        })
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.workers = 0
+
+    def shared_backend(self):
+        """Настройки L2: SQLite в отдельном файле."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        return {
+            'BACKEND': 'core.cache.sqlite.SQLiteCache',
+            'LOCATION': path.join(directory, 'cache.sqlite3'),
+        }
+
+    def make_cache(self):
+        """Кэш отдельного «процесса» со своим L1."""
+        self.workers += 1
+        cache = TieredCache(f'{self.id()}-{self.workers}', {
+            'OPTIONS': {'SHARED': 'shared', 'SYNC_INTERVAL': 0},
+        })
+        cache.local.clear()
+        return cache
+
+    def test_reads_served_from_l1(self):
+        """Повторное чтение не обращается к L2."""
+        first, second = self.make_cache(), self.make_cache()
+        first.set('key', 'value')
+        self.assertEqual(second.get('key'), 'value')
+        first.shared.set(first.make_key('key'), 'changed_behind')
+        self.assertEqual(second.get('key'), 'value')
+
+    def test_invalidation_reaches_other_workers(self):
+        """Запись и удаление в одном процессе сбрасывают L1 других."""
+        first, second = self.make_cache(), self.make_cache()
+        first.set('key', 'old')
+        self.assertEqual(second.get('key'), 'old')
+        first.set('key', 'new')
+        self.assertEqual(second.get('key'), 'new')
+        first.add('counter', 0)
+        first.incr('counter')
+        self.assertEqual(second.get('counter'), 1)
+        first.delete('key')
+        self.assertIsNone(second.get('key'))
+
+    def test_clear_reaches_other_workers(self):
+        """Очистка в одном процессе очищает L1 остальных."""
+        first, second = self.make_cache(), self.make_cache()
+        first.set('key', 'value')
+        second.get('key')
+        first.clear()
+        self.assertIsNone(second.get('key'))
+
+    def test_lost_messages_clear_l1(self):
+        """Если сообщения инвалидации истекли, L1 очищается целиком."""
+        first, second = self.make_cache(), self.make_cache()
+        first.set('key', 'old')
+        second.get('key')
+        first.set('key', 'new')
+        first.shared.delete_many(
+            [f'tiered:message:{n}' for n in range(1, 10)]
+        )
+        self.assertEqual(second.get('key'), 'new')
+
+
+class TieredSocketCacheTest(TieredCacheTest):
+    """Тест двухуровневого кэша поверх сетевого кэша."""
+
+    def shared_backend(self):
+        """Настройки L2: сервер кэша в фоновом потоке."""
+        server = serve_in_thread()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return {
+            'BACKEND': 'core.cache.tcp.SocketCache',
+            'LOCATION': server.location,
+        }
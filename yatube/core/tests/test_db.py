@@ -0,0 +1,71 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import SimpleTestCase, TestCase
+
+from core import db
+
+
+class PragmasTest(SimpleTestCase):
+    """Тест настроек подключения профиля sqlite_wal."""
+
+    def test_pragmas_applied(self):
+        """Новое подключение получает WAL и остальные PRAGMA профиля."""
+        with tempfile.TemporaryDirectory() as directory:
+            wrapper = DatabaseWrapper({
+                **connection.settings_dict,
+                'NAME': os.path.join(directory, 'pragmas.sqlite3'),
+                'PRAGMAS': {'journal_mode': 'wal', 'synchronous': 'normal'},
+            })
+            try:
+                with wrapper.cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode')
+                    self.assertEqual(cursor.fetchone()[0], 'wal')
+                    cursor.execute('PRAGMA synchronous')
+                    self.assertEqual(cursor.fetchone()[0], 1)
+            finally:
+                wrapper.close()
+
+
+class HealthCheckTest(TestCase):
+    """Тест проверки постоянных подключений в начале запроса."""
+
+    def setUp(self):
+        """Проверка подключения по умолчанию при каждом запросе."""
+        # django.db.connection — прокси, атрибуты ставятся на само
+        # подключение
+        connection = self.connection = connections[DEFAULT_DB_ALIAS]
+        connection.ensure_connection()
+        patcher = mock.patch.dict(
+            connection.settings_dict, {'HEALTH_CHECK_INTERVAL': 0}
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(vars(connection).pop, 'health_checked_at', None)
+
+    def test_broken_connection_closed(self):
+        """Неработающее подключение закрывается, рабочее — нет."""
+        with mock.patch.object(self.connection, 'close') as close:
+            with mock.patch.object(
+                self.connection, 'is_usable', return_value=True
+            ):
+                db.check_connections()
+            close.assert_not_called()
+            with mock.patch.object(
+                self.connection, 'is_usable', return_value=False
+            ):
+                db.check_connections()
+            close.assert_called_once()
+
+    def test_interval(self):
+        """Подключение проверяется не чаще интервала."""
+        self.connection.settings_dict['HEALTH_CHECK_INTERVAL'] = 3600
+        with mock.patch.object(
+            self.connection, 'is_usable', return_value=True
+        ) as is_usable:
+            db.check_connections()
+            db.check_connections()
+        self.assertEqual(is_usable.call_count, 1)
@@ -0,0 +1,116 @@
+import re
+
+from django.core.cache import cache, caches
+from django.test import TestCase, override_settings
+
+from core import metrics
+from core.cache.tcp import serve_in_thread
+
+
+def value(text, line):
+    """Значение строки метрики line из выгрузки text."""
+    found = re.search(rf'^{re.escape(line)} (\S+)$', text, re.MULTILINE)
+    return float(found.group(1)) if found else None
+
+
+class MetricsTest(TestCase):
+    """Тест замеров стоимости запросов и выгрузки /metrics."""
+
+    def setUp(self):
+        """Пустой реестр метрик и кэш."""
+        metrics.registry.reset()
+        cache.clear()
+
+    def export(self):
+        """Текст /metrics."""
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        return response.content.decode()
+
+    def test_request_recorded_by_view_name(self):
+        """Запрос учитывается под именем view со всеми метриками."""
+        self.client.get('/')
+        self.client.get('/')
+        text = self.export()
+        view = '{view="posts:main_page"}'
+        self.assertEqual(
+            value(text, f'yatube_request_duration_seconds_count{view}'), 2
+        )
+        self.assertEqual(value(
+            text, 'yatube_request_duration_seconds_bucket'
+            '{view="posts:main_page",le="+Inf"}'
+        ), 2)
+        self.assertGreater(value(text, f'yatube_db_queries_sum{view}'), 0)
+        self.assertGreater(
+            value(text, f'yatube_db_duration_seconds_sum{view}'), 0
+        )
+        self.assertGreater(
+            value(text, f'yatube_template_duration_seconds_sum{view}'), 0
+        )
+        self.assertGreater(
+            value(text, f'yatube_response_size_bytes_sum{view}'), 0
+        )
+        self.assertGreater(value(text, f'yatube_cache_hits_total{view}'), 0)
+        self.assertEqual(value(
+            text,
+            'yatube_responses_total{view="posts:main_page",status="200"}'
+        ), 2)
+
+    def test_unresolved_request(self):
+        """Запрос к несуществующему адресу учитывается отдельно."""
+        self.client.get('/unexisting_page/')
+        self.assertEqual(value(
+            self.export(),
+            'yatube_responses_total{view="<unresolved>",status="404"}'
+        ), 1)
+
+    @override_settings(METRICS_ALLOWED_IPS=['10.0.0.1'])
+    def test_metrics_hidden_from_other_addresses(self):
+        """Метрики отдаются только разрешенным адресам."""
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+        response = self.client.get('/metrics', REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, 200)
+
+    def test_nested_collect(self):
+        """Вложенный замер учитывается и во внешнем."""
+        metrics.install()
+        with metrics.collect() as outer:
+            cache.get('missing')
+            with metrics.collect() as inner:
+                cache.set('key', 1)
+                cache.get('key')
+        self.assertEqual((inner.cache_hits, inner.cache_misses), (1, 0))
+        self.assertEqual((outer.cache_hits, outer.cache_misses), (1, 1))
+        self.assertIsNone(cache.get('missing'))
+        self.assertEqual(cache.get('missing', 'default'), 'default')
+
+    def test_socket_cache_misses(self):
+        """Промахи сетевого кэша возвращают default и считаются."""
+        server = serve_in_thread()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        with self.settings(CACHES={'default': {
+            'BACKEND': 'core.cache.tcp.SocketCache',
+            'LOCATION': server.location,
+        }}):
+            metrics.install()
+            socket_cache = caches['default']
+            with metrics.collect() as stats:
+                self.assertIsNone(socket_cache.get('missing'))
+                self.assertEqual(
+                    socket_cache.get('missing', 'default'), 'default'
+                )
+                socket_cache.set('key', 1)
+                self.assertEqual(socket_cache.get('key'), 1)
+        self.assertEqual((stats.cache_hits, stats.cache_misses), (1, 2))
+
+    def test_histogram_buckets(self):
+        """Корзины гистограммы накопительные, граница включается."""
+        histogram = metrics.Histogram((1, 5))
+        for observed in (0.5, 1, 3, 10):
+            histogram.observe(observed)
+        self.assertEqual(
+            list(histogram.cumulative()), [('1', 2), ('5', 3), ('+Inf', 4)]
+        )
+        self.assertEqual((histogram.sum, histogram.count), (14.5, 4))
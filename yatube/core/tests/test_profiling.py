@@ -0,0 +1,94 @@
+import shutil
+import tempfile
+import time
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from core import profiling
+from posts.models import Post
+
+PROFILE_DIR = tempfile.mkdtemp()
+
+
+def slow_function():
+    """Код, который сэмплер должен застать в стеке."""
+    time.sleep(0.05)
+
+
+@override_settings(PROFILE_DIR=PROFILE_DIR, PROFILE_INTERVAL=0.001)
+class ProfilingTest(TestCase):
+    """Тест записи стеков и SQL медленных запросов."""
+
+    @classmethod
+    def tearDownClass(cls):
+        """Удаление директории записей."""
+        super().tearDownClass()
+        shutil.rmtree(PROFILE_DIR, ignore_errors=True)
+
+    def setUp(self):
+        """Пустая директория записей."""
+        shutil.rmtree(PROFILE_DIR, ignore_errors=True)
+
+    def test_sampler_captures_stacks_after_threshold(self):
+        """Стеки снимаются только после порога, SQL — все."""
+        capture = profiling.Capture(threshold=0.02)
+        with profiling.capturing(capture):
+            Post.objects.count()
+            slow_function()
+        self.assertGreaterEqual(capture.duration, 0.05)
+        self.assertTrue(any(
+            stack.split(';')[-1].startswith('slow_function')
+            for stack in capture.stacks
+        ))
+        self.assertEqual(len(capture.queries), 1)
+        self.assertIn('COUNT', capture.queries[0][2])
+
+    def test_fast_code_not_sampled(self):
+        """Код быстрее порога не сэмплируется."""
+        capture = profiling.Capture(threshold=10)
+        with profiling.capturing(capture):
+            slow_function()
+        self.assertFalse(capture.stacks)
+
+    @override_settings(PROFILE_ENABLED=True, PROFILE_THRESHOLD=0)
+    def test_middleware_saves_slow_requests(self):
+        """Запрос дольше порога сохраняется и виден команде."""
+        self.client.get('/')
+        names = profiling.captures()
+        self.assertEqual(len(names), 1)
+        meta, _ = profiling.load(names[0])
+        self.assertEqual(meta['view'], 'posts:main_page')
+        self.assertEqual(meta['reason'], 'slow')
+        self.assertTrue(meta['queries'])
+        out = StringIO()
+        call_command('profiles', stdout=out)
+        self.assertIn(names[0], out.getvalue())
+        out = StringIO()
+        call_command('profiles', summary=True, stdout=out)
+        self.assertIn('posts:main_page', out.getvalue())
+        self.assertIn('SQL:', out.getvalue())
+
+    @override_settings(
+        PROFILE_ENABLED=True, PROFILE_THRESHOLD=10, PROFILE_SAMPLE_RATE=2
+    )
+    def test_middleware_samples_one_in_n(self):
+        """Из быстрых запросов сохраняется каждый N-й."""
+        for _ in range(4):
+            self.client.get('/')
+        names = profiling.captures()
+        self.assertEqual(len(names), 2)
+        self.assertEqual(profiling.load(names[0])[0]['reason'], 'sampled')
+
+    def test_rotation(self):
+        """В директории остаются keep последних записей."""
+        capture = profiling.Capture(threshold=0)
+        with profiling.capturing(capture):
+            slow_function()
+        for _ in range(5):
+            profiling.save(capture, {'view': 'test'}, keep=3)
+        names = profiling.captures()
+        self.assertEqual(len(names), 3)
+        _, stacks = profiling.load(names[-1])
+        self.assertEqual(stacks, capture.stacks)
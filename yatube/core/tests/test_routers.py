@@ -0,0 +1,118 @@
+import os
+import sqlite3
+import tempfile
+
+from django.contrib.sessions.models import Session
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core import routers
+from core.db import copy_sqlite
+from core.middleware import ReplicaMiddleware
+from posts.models import Post
+
+
+@override_settings(
+    DATABASE_REPLICAS=['replica1'], REPLICA_PIN_COOKIE='primary_pin',
+    REPLICA_PIN_SECONDS=15,
+)
+class ReplicaRouterTest(SimpleTestCase):
+    """Тест выбора БД для чтения и записи."""
+
+    def setUp(self):
+        """Роутер."""
+        self.router = routers.ReplicaRouter()
+
+    def test_reads_from_replica_in_request(self):
+        """В запросе чтения идут с реплики, вне запроса — как обычно."""
+        self.assertIsNone(self.router.db_for_read(Post))
+        with routers.request_scope():
+            self.assertEqual(self.router.db_for_read(Post), 'replica1')
+            self.assertEqual(self.router.db_for_read(Session), 'default')
+        self.assertIsNone(self.router.db_for_read(Post))
+
+    def test_no_replicas(self):
+        """Без реплик роутер не вмешивается."""
+        with self.settings(DATABASE_REPLICAS=[]), routers.request_scope():
+            self.assertIsNone(self.router.db_for_read(Post))
+
+    def test_write_pins_request(self):
+        """После записи запрос читает основную БД."""
+        with routers.request_scope() as state:
+            self.assertEqual(self.router.db_for_write(Post), 'default')
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+        self.assertTrue(state['wrote'])
+        with routers.request_scope(pinned=True) as state:
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+        self.assertFalse(state['wrote'])
+
+    def test_replica_cache_version_and_timeout(self):
+        """Данные реплики кэшируются с ее меткой и недолго."""
+        self.assertIsNone(routers.replica_version())
+        self.assertEqual(routers.cache_timeout(None), None)
+        with routers.request_scope():
+            version = routers.replica_version()
+            self.assertTrue(version.startswith('replica1.'))
+            self.assertEqual(routers.cache_timeout(3600), 15)
+            self.assertEqual(routers.cache_timeout(None), 15)
+            self.assertEqual(routers.cache_timeout(5), 5)
+        with routers.request_scope(pinned=True):
+            self.assertIsNone(routers.replica_version())
+            self.assertEqual(routers.cache_timeout(3600), 3600)
+
+    def test_migrations_only_on_primary(self):
+        """Схема меняется только в основной БД."""
+        self.assertTrue(self.router.allow_migrate('default', 'posts'))
+        self.assertFalse(self.router.allow_migrate('replica1', 'posts'))
+
+    def test_middleware_pin_cookie(self):
+        """Запрос с записью ставит cookie, с cookie читается основная БД."""
+        factory = RequestFactory()
+        reads = []
+
+        def read(request):
+            reads.append(self.router.db_for_read(Post))
+            return HttpResponse()
+
+        def write(request):
+            self.router.db_for_write(Post)
+            return HttpResponse()
+
+        response = ReplicaMiddleware(read)(factory.get('/'))
+        self.assertNotIn('primary_pin', response.cookies)
+        response = ReplicaMiddleware(write)(factory.post('/'))
+        self.assertEqual(response.cookies['primary_pin']['max-age'], 15)
+        request = factory.get('/')
+        request.COOKIES['primary_pin'] = '1'
+        ReplicaMiddleware(read)(request)
+        self.assertEqual(reads, ['replica1', 'default'])
+
+
+class CopySqliteTest(SimpleTestCase):
+    """Тест обновления реплики SQLite копией основной БД."""
+
+    def test_replica_lags_until_copied(self):
+        """Реплика видит запись основной БД только после копирования."""
+        with tempfile.TemporaryDirectory() as directory:
+            primary = os.path.join(directory, 'primary.sqlite3')
+            replica = os.path.join(directory, 'replica.sqlite3')
+
+            def execute(path, sql):
+                connection = sqlite3.connect(path)
+                try:
+                    with connection:
+                        return connection.execute(sql).fetchall()
+                finally:
+                    connection.close()
+
+            execute(primary, 'CREATE TABLE item (name TEXT)')
+            execute(primary, "INSERT INTO item VALUES ('first')")
+            copy_sqlite(primary, replica)
+            execute(primary, "INSERT INTO item VALUES ('second')")
+            self.assertEqual(
+                execute(replica, 'SELECT name FROM item'), [('first',)]
+            )
+            copy_sqlite(primary, replica)
+            self.assertEqual(
+                execute(replica, 'SELECT count(*) FROM item'), [(2,)]
+            )
@@ -0,0 +1,71 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+User = get_user_model()
+
+
+class SessionlessTest(TestCase):
+    """Тест анонимных чтений без сессии и бэкендов сессий."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Пользователь."""
+        cls.user = User.objects.create_user(username='test_session_user')
+
+    def setUp(self):
+        """Клиент вошедшего пользователя."""
+        self.user_client = Client()
+        self.user_client.force_login(self.user)
+
+    def test_anonymous_read_without_session(self):
+        """Анонимное чтение ленты не создает сессию и сообщения."""
+        response = self.client.get(reverse('posts:main_page'))
+        self.assertEqual(response.status_code, 200)
+        request = response.wsgi_request
+        self.assertFalse(hasattr(request, 'session'))
+        self.assertFalse(hasattr(request, '_messages'))
+        self.assertTrue(request.user.is_anonymous)
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('Cookie', response['Vary'])
+
+    def test_other_requests_get_session(self):
+        """Неотмеченные view, запросы с cookie и POST получают сессию."""
+        for client, method, url in (
+            (self.client, 'get', reverse('users:login')),
+            (self.client, 'post', reverse('users:login')),
+            (self.user_client, 'get', reverse('posts:main_page')),
+        ):
+            with self.subTest(method=method, url=url):
+                request = getattr(client, method)(url).wsgi_request
+                self.assertTrue(hasattr(request, 'session'))
+                self.assertTrue(hasattr(request, '_messages'))
+        request = self.user_client.get(
+            reverse('posts:main_page')
+        ).wsgi_request
+        self.assertEqual(request.user, self.user)
+
+    def test_login_from_anonymous(self):
+        """После входа с анонимной страницы пользователь узнается."""
+        self.client.get(reverse('posts:main_page'))
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('posts:main_page'))
+        self.assertEqual(response.wsgi_request.user, self.user)
+
+    @override_settings(
+        SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies'
+    )
+    def test_signed_cookies_without_session_table(self):
+        """С сессией в cookie вошедший не читает django_session."""
+        client = Client()
+        client.force_login(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse('posts:main_page'))
+        self.assertEqual(response.wsgi_request.user, self.user)
+        self.assertFalse(any(
+            'django_session' in query['sql'] for query in queries
+        ))
@@ -1,5 +1,9 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
 
+from . import metrics as request_metrics
+
 
 def page_not_found(request, exception):
     """view-функция вывода кастомной страницы об ошибке 404."""
@@ -27,3 +31,16 @@ def permission_denied(request, exception):
 def server_error(request):
     """view-функция вывода кастомной страницы об ошибке 500."""
     return render(request, 'core/500.html', status=500)
+
+
+def metrics(request):
+    """view-функция метрик процесса в текстовом формате Prometheus.
+
+    Доступна только с адресов из METRICS_ALLOWED_IPS.
+    """
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        raise Http404
+    return HttpResponse(
+        request_metrics.registry.export(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
@@ -1,37 +1,110 @@
+from django.conf import settings
 from django.contrib import admin
 
-from .models import Comment, Group, Post, Follow
+from core.admin import AutocompleteFilter, LargeTableAdmin
+from . import search
+from .models import Comment, Follow, Group, Post
 
 
-class PostAdmin(admin.ModelAdmin):
+def indexed_search(queryset, words, post_field):
+    """Фильтрует выборку по полнотекстовому индексу постов.
+
+    Вместо LIKE '%...%' по всей таблице id постов берутся из индекса
+    поиска. Индекс отдает не больше SEARCH_CANDIDATES лучших
+    совпадений; если их столько, найдены могли быть не все, и выборка
+    возвращается без фильтра — тогда подстроку ищет вызывающий.
+    Возвращает выборку и признак того, что фильтр применен.
+    """
+    hits = search.candidates(words)
+    if len(hits) >= settings.SEARCH_CANDIDATES:
+        return queryset, False
+    ids = [pk for pk, _, _ in hits]
+    return queryset.filter(**{f'{post_field}__in': ids}), True
+
+
+class IndexedSearchAdmin(LargeTableAdmin):
+    """Список с поиском по индексу постов и пояснением его предела."""
+
+    change_list_template = 'posts/admin/indexed_search_change_list.html'
+
+    def changelist_view(self, request, extra_context=None):
+        """Список объектов с пределом индекса в контексте."""
+        return super().changelist_view(request, {
+            'search_candidates': settings.SEARCH_CANDIDATES,
+            **(extra_context or {}),
+        })
+
+
+class PostAdmin(IndexedSearchAdmin):
     """Класс для создания в странички с постами в админ. панели."""
 
     list_display = ('pk', 'text', 'pub_date', 'author', 'group')
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
+    autocomplete_fields = ('author', 'group')
     search_fields = ('text',)
-    list_filter = ('pub_date',)
+    list_filter = ('pub_date', ('author', AutocompleteFilter))
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск по индексу постов или по подстроке при многих совпадениях."""
+        words = search.terms(search_term)
+        if not words:
+            return queryset, False
+        queryset, indexed = indexed_search(queryset, words, 'pk')
+        if not indexed:
+            for word in words:
+                queryset = queryset.filter(text__icontains=word)
+        return queryset, False
 
-class CommentAdmin(admin.ModelAdmin):
+
+class CommentAdmin(IndexedSearchAdmin):
     """Класс для создания в странички с комментариями в админ. панели."""
 
     list_display = ('pk', 'text', 'pub_date', 'author')
+    list_select_related = ('author',)
+    autocomplete_fields = ('author', 'post')
     search_fields = ('text',)
-    list_filter = ('pub_date',)
+    list_filter = ('pub_date', ('author', AutocompleteFilter))
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск среди комментариев постов, найденных по индексу.
+
+        Индекс хранит комментарии вместе с постом, поэтому подстрока
+        ищется только в комментариях найденных постов, а при многих
+        совпадениях — во всех комментариях.
+        """
+        words = search.terms(search_term)
+        if not words:
+            return queryset, False
+        queryset, _ = indexed_search(queryset, words, 'post')
+        for word in words:
+            queryset = queryset.filter(text__icontains=word)
+        return queryset, False
+
 
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(LargeTableAdmin):
     """Класс для создания в странички с подписками в админ. панели."""
 
     list_display = ('pk', 'user', 'author')
-    search_fields = ('user',)
-    list_filter = ('user', 'author')
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
+    search_fields = ('=user__username', '=author__username')
+    list_filter = (
+        ('user', AutocompleteFilter), ('author', AutocompleteFilter)
+    )
     empty_value_display = '-пусто-'
 
 
+class GroupAdmin(admin.ModelAdmin):
+    """Класс для создания в странички с группами в админ. панели."""
+
+    list_display = ('pk', 'title', 'slug')
+    search_fields = ('title', 'slug')
+
+
 admin.site.register(Post, PostAdmin)
-admin.site.register(Group)
+admin.site.register(Group, GroupAdmin)
 admin.site.register(Comment, CommentAdmin)
 admin.site.register(Follow, FollowAdmin)
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class PostsConfig(AppConfig):
     name = 'posts'
+
+    def ready(self):
+        """Подключает обработчики сигналов и части страниц приложения."""
+        from . import holes, signals  # noqa: F401
@@ -0,0 +1,281 @@
+import json
+import platform
+import random
+import statistics
+import time
+import tracemalloc
+from urllib.parse import urlencode
+
+import django
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from faker import Faker
+from mixer.backend.django import Mixer
+
+from about import urls as about_urls
+from . import counters, feed, search
+from . import urls as posts_urls
+from .models import Comment, Follow, Group, Post, User
+from .paginators import CursorPaginator
+from .views import POSTS_NUM
+
+# приложения, все именованные URL которых попадают в замеры
+URL_MODULES = (posts_urls, about_urls)
+
+# небольшие значения времени слишком шумные, чтобы считать их регрессией
+MIN_MS = 2.0
+MIN_KB = 64.0
+
+METRICS = ('queries', 'p50_ms', 'p95_ms', 'peak_kb')
+# пик памяти зависит от версий Python и Django и платформы: на другом
+# окружении те же страницы выделяют заметно больше или меньше памяти
+ENVIRONMENT_METRICS = ('peak_kb',)
+
+
+def seed(authors=50, groups=10, posts=2000, comments=5000, follows=500,
+         random_seed=0):
+    """Наполняет БД данными для замеров и возвращает их параметры.
+
+    Объекты генерируются mixer'ом без сохранения и пишутся bulk_create,
+    поэтому сигналы не срабатывают: счетчики и ленты подписок
+    достраиваются отдельно. Первый автор — «читатель», он подписан на
+    остальных авторов, а комментарии сосредоточены на его постах,
+    чтобы каждая страница каждой ленты была заполнена.
+    Индекс поиска тоже строится после загрузки.
+    """
+    random.seed(random_seed)
+    Faker.seed(random_seed)
+    mixer = Mixer(commit=False)
+
+    # bulk_create на SQLite не возвращает id, поэтому объекты
+    # перечитываются из БД
+    User.objects.bulk_create(
+        mixer.cycle(authors).blend(
+            User,
+            username=mixer.sequence('bench_user_{0}'),
+            is_active=True,
+        )
+    )
+    users = list(
+        User.objects.filter(username__startswith='bench_user_').order_by('pk')
+    )
+    Group.objects.bulk_create(
+        mixer.cycle(groups).blend(Group, slug=mixer.sequence('bench_{0}'))
+    )
+    group_list = list(
+        Group.objects.filter(slug__startswith='bench_').order_by('pk')
+    )
+    Post.objects.bulk_create(
+        mixer.cycle(posts).blend(
+            Post,
+            author=(users[i % authors] for i in range(posts)),
+            group=(group_list[i % groups] for i in range(posts)),
+            image='',
+            image_variants='',
+            thumbnail_status=Post.THUMBNAIL_READY,
+        ),
+        batch_size=500,
+    )
+    reader = users[0]
+    reader_posts = list(Post.objects.filter(author=reader).order_by('pk'))
+    hot = reader_posts[:max(1, len(reader_posts) // 20)]
+    Comment.objects.bulk_create(
+        mixer.cycle(comments).blend(
+            Comment,
+            post=(hot[i % len(hot)] for i in range(comments)),
+            author=(random.choice(users) for _ in range(comments)),
+        ),
+        batch_size=500,
+    )
+    pairs = {(reader.pk, user.pk) for user in users[1:follows + 1]}
+    while len(pairs) < min(follows, authors * (authors - 1)):
+        user, author = random.sample(users, 2)
+        pairs.add((user.pk, author.pk))
+    Follow.objects.bulk_create(
+        (Follow(user_id=user, author_id=author) for user, author in pairs),
+        batch_size=500,
+    )
+
+    counters.repair_users()
+    counters.repair_posts()
+    for user_id, author_id in pairs:
+        feed.backfill(user_id, author_id)
+    search.rebuild()
+    return {
+        'authors': authors,
+        'groups': groups,
+        'posts': posts,
+        'comments': comments,
+        'follows': follows,
+        'seed': random_seed,
+    }
+
+
+def targets(depth=20):
+    """Возвращает {имя URL: адрес} для всех именованных URL приложений.
+
+    Аргументы подставляются из данных, созданных seed(): пост и правка
+    поста относятся к «читателю», профиль — к первому из авторов, на
+    которых он подписан, поиск — по слову из того же поста.
+    Дополнительно замеряется страница главной, до которой depth раз
+    пролистали по курсору.
+    """
+    reader, author = User.objects.order_by('pk')[:2]
+    kwargs = {
+        'post_id': reader.posts.order_by('pk').first().pk,
+        'username': author.username,
+        'slug': Group.objects.order_by('pk').first().slug,
+    }
+    urls = {}
+    for module in URL_MODULES:
+        for pattern in module.urlpatterns:
+            if not pattern.name:
+                continue
+            name = f'{module.app_name}:{pattern.name}'
+            converters = pattern.pattern.converters
+            urls[name] = reverse(
+                name, kwargs={key: kwargs[key] for key in converters}
+            )
+
+    # поиск по первому слову поста «читателя»
+    word = search.terms(
+        Post.objects.filter(pk=kwargs['post_id']).values_list(
+            'text', flat=True
+        ).get()
+    )[:1]
+    if word:
+        urls['posts:search'] += '?' + urlencode({'q': word[0]})
+
+    page = CursorPaginator(Post.objects.all(), POSTS_NUM).get_page()
+    for _ in range(depth):
+        if not page.next_cursor:
+            break
+        cursor = page.next_cursor
+        page = page.paginator.get_page(cursor)
+    if page.number > 1:
+        urls['posts:main_page[deep]'] = f'{urls["posts:main_page"]}?' + (
+            urlencode({'cursor': cursor})
+        )
+    return urls
+
+
+def _request(client, url):
+    """Выполняет запрос без кэша и возвращает (ответ, мс, SQL-запросов)."""
+    cache.clear()
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        response = client.get(url)
+        elapsed = (time.perf_counter() - start) * 1000
+    return response, elapsed, len(queries)
+
+
+def run(repeat=20, depth=20):
+    """Замеряет все URL от имени «читателя» из данных seed().
+
+    Для каждого URL считаются число SQL-запросов, p50/p95 времени ответа
+    и пик выделенной памяти. Кэш очищается перед каждым запросом, т.е.
+    замеряется стоимость страницы без попаданий в кэш. URL обходятся
+    по кругу, поэтому подписка и отписка чередуются.
+    """
+    client = Client()
+    client.force_login(User.objects.order_by('pk').first())
+    urls = targets(depth)
+    results = {
+        name: {'url': url, 'timings': []} for name, url in urls.items()
+    }
+    for _ in range(repeat):
+        for name, url in urls.items():
+            response, elapsed, queries = _request(client, url)
+            results[name]['timings'].append(elapsed)
+            results[name]['queries'] = queries
+            results[name]['status'] = response.status_code
+
+    for name, url in urls.items():
+        tracemalloc.start()
+        try:
+            _request(client, url)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        timings = sorted(results[name].pop('timings'))
+        results[name].update({
+            'p50_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(timings[int(0.95 * (len(timings) - 1))], 3),
+            'peak_kb': round(peak / 1024, 1),
+        })
+    return results
+
+
+def environment():
+    """Окружение замеров: версии Python и Django и платформа."""
+    return {
+        'django': django.get_version(),
+        'platform': f'{platform.system()}-{platform.machine()}',
+        'python': platform.python_version(),
+    }
+
+
+def comparable(baseline_environment, metrics=METRICS):
+    """Метрики, которые можно сравнивать с эталоном из этого окружения.
+
+    Пик памяти сравнивается, только если эталон записан в таком же
+    окружении; у эталона без записанного окружения он не сравнивается.
+    """
+    if baseline_environment == environment():
+        return metrics
+    return tuple(
+        metric for metric in metrics if metric not in ENVIRONMENT_METRICS
+    )
+
+
+def compare(results, baseline, threshold=1.5, query_slack=0,
+            metrics=METRICS):
+    """Сравнивает замеры с эталоном и возвращает список регрессий.
+
+    Число запросов не должно превышать эталонное больше чем на
+    query_slack, время и память — больше чем в threshold раз.
+    URL, которых нет в эталоне, не сравниваются.
+    """
+    slack = {'p50_ms': MIN_MS, 'p95_ms': MIN_MS, 'peak_kb': MIN_KB}
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        for metric in metrics:
+            value, base = result[metric], expected[metric]
+            if metric == 'queries':
+                limit = base + query_slack
+            else:
+                limit = max(base * threshold, base + slack[metric])
+            if value > limit:
+                regressions.append(
+                    f'{name}: {metric} {value} > {limit:g} (эталон {base})'
+                )
+    return regressions
+
+
+def load_baseline(path):
+    """Читает эталонные замеры из JSON-файла."""
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)['results']
+
+
+def load_environment(path):
+    """Читает окружение, в котором записан эталон, или None."""
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)['meta'].get('environment')
+
+
+def save_baseline(path, results, meta):
+    """Сохраняет замеры и окружение, в котором они сделаны, как эталон."""
+    meta = {**meta, 'environment': environment()}
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(
+            {'meta': meta, 'results': results},
+            file, ensure_ascii=False, indent=2, sort_keys=True,
+        )
+        file.write('\n')
@@ -0,0 +1,160 @@
+import logging
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import transaction
+from django.db.models import Count, F
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from . import variants
+from .models import ImageBlob, Post
+
+logger = logging.getLogger(__name__)
+
+
+def retain(name):
+    """Учитывает еще одну ссылку поста на файл картинки.
+
+    Счетчик увеличивается одним UPDATE, который блокирует строку до
+    конца транзакции, — под той же блокировкой collect() удаляет файл.
+    """
+    if ImageBlob.objects.filter(name=name).update(
+        references=F('references') + 1
+    ):
+        return
+    _, created = ImageBlob.objects.get_or_create(
+        name=name, defaults={'references': 1}
+    )
+    if not created:
+        ImageBlob.objects.filter(name=name).update(
+            references=F('references') + 1
+        )
+
+
+def claim(name, place):
+    """Учитывает ссылку на файл name, который сейчас сохраняется.
+
+    Вызывается DeduplicatingStorage: place() кладет файл на место,
+    если его там нет, и делает это после retain(), под блокировкой
+    строки ImageBlob. Поэтому параллельный collect() либо успевает
+    удалить файл раньше, и place() запишет его заново, либо видит
+    ссылку и файл не трогает. Ссылка учитывается до сохранения поста,
+    и сигнал post_save ее не повторяет; если пост не сохранится, ее
+    снимает claiming(), а оставшиеся лишние ссылки — repair().
+    """
+    with transaction.atomic():
+        retain(name)
+        place()
+
+
+@contextmanager
+def claiming(file):
+    """Снимает ссылку claim(), если сохранение с загрузкой file не удалось.
+
+    Внутри транзакции ссылку вместе с ошибкой сохранения отменит ее
+    откат, а запросы в сломанной транзакции невозможны, поэтому она
+    снимается только вне транзакции.
+    """
+    uploading = bool(file) and not file._committed
+    try:
+        yield
+    except Exception:
+        if (uploading and file._committed
+                and not transaction.get_connection().in_atomic_block):
+            release(file.name, file.storage)
+        raise
+
+
+def release(name, storage):
+    """Снимает ссылку на файл и удаляет его, если ссылок не осталось.
+
+    Файл удаляется после фиксации транзакции: при откате ссылка
+    вернется, а файл должен остаться на месте.
+    """
+    ImageBlob.objects.filter(name=name, references__gt=0).update(
+        references=F('references') - 1
+    )
+    transaction.on_commit(lambda: collect(name, storage))
+
+
+def collect(name, storage):
+    """Удаляет файл без ссылок вместе с миниатюрами и вариантами.
+
+    Число ссылок проверяется заново: пока транзакция фиксировалась,
+    тот же файл мог загрузить другой пользователь. Строка и файлы
+    удаляются в одной транзакции, и сохранение того же файла в
+    claim() ждет ее конца.
+    """
+    with transaction.atomic():
+        deleted, _ = ImageBlob.objects.filter(
+            name=name, references=0
+        ).delete()
+        if not deleted:
+            return
+        default.kvstore.delete(ImageFile(name, storage))
+        names = [name] + [
+            variants.variant_name(name, width, extension)
+            for width in settings.POST_IMAGE_WIDTHS
+            for _, _, extension in variants.MODERN_FORMATS
+            + (variants.FALLBACK_FORMAT,)
+        ]
+        for file_name in names:
+            try:
+                storage.delete(file_name)
+            except (OSError, SuspiciousFileOperation):
+                logger.warning(
+                    'Файл %s не удален', file_name, exc_info=True
+                )
+
+
+def repair():
+    """Исправляет расхождения числа ссылок на файлы с постами.
+
+    Лишние ссылки остаются от загрузок, пост которых так и не
+    сохранился в транзакции, — их не может снять claiming(), — и от
+    файлов, сохраненных в хранилище без поста. Файлы, на которые не
+    ссылается ни один пост, удаляются collect(). Загрузки, идущие во
+    время исправления, тоже выглядят лишними ссылками, поэтому
+    запускать его нужно, когда картинки не загружаются.
+    Возвращает количество исправленных файлов.
+    """
+    actual = dict(
+        Post.objects.exclude(image='').order_by()
+        .values_list('image')
+        .annotate(total=Count('pk'))
+    )
+    storage = Post._meta.get_field('image').storage
+    fixed = 0
+    for name, references in ImageBlob.objects.values_list(
+        'name', 'references'
+    ).iterator():
+        expected = actual.pop(name, 0)
+        if references == expected:
+            continue
+        # число ссылок могло измениться после чтения — такой файл
+        # остается до следующего запуска
+        if ImageBlob.objects.filter(
+            name=name, references=references
+        ).update(references=expected):
+            fixed += 1
+            if not expected:
+                collect(name, storage)
+    for name, references in actual.items():
+        _, created = ImageBlob.objects.get_or_create(
+            name=name, defaults={'references': references}
+        )
+        fixed += created
+    return fixed
+
+
+def shared_variants(post):
+    """Описание вариантов другого поста с той же картинкой или ''."""
+    return Post.objects.filter(
+        image=post.image.name
+    ).exclude(
+        pk=post.pk
+    ).exclude(
+        image_variants=''
+    ).values_list('image_variants', flat=True).first() or ''
@@ -0,0 +1,138 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from core import pagecache, routers
+
+FEED_VERSION_KEY = 'feed_version'
+
+# как часто ждущий запрос проверяет, не появилось ли значение в кэше
+POLL_INTERVAL = 0.05
+
+
+def feed_version():
+    """Текущая версия содержимого лент.
+
+    Если ключ пропал из кэша, версия начинается с текущего времени
+    в наносекундах, чтобы не совпасть ни с одной из прежних. Запрос,
+    читающий реплику, получает версию с ее меткой, см.
+    core.routers.replica_version.
+    """
+    version = cache.get(FEED_VERSION_KEY)
+    if version is None:
+        cache.add(FEED_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(FEED_VERSION_KEY)
+    replica = routers.replica_version()
+    return version if replica is None else f'{version}@{replica}'
+
+
+def bump_feed_version():
+    """Сдвигает версию лент, делая все закэшированные страницы устаревшими."""
+    try:
+        cache.incr(FEED_VERSION_KEY)
+    except ValueError:
+        feed_version()
+
+
+def fragment_key(name, vary_on):
+    """Ключ фрагмента ленты с учетом версии и параметров страницы."""
+    digest = hashlib.md5(':'.join(map(str, vary_on)).encode()).hexdigest()
+    return f'feed:{name}:{feed_version()}:{digest}'
+
+
+def get_or_set_single_flight(key, compute, timeout,
+                             lock_timeout=None):
+    """Возвращает значение из кэша, вычисляя его не более одного раза.
+
+    Пересчитывает значение только запрос, захвативший блокировку через
+    cache.add, остальные ждут появления значения в кэше не дольше
+    lock_timeout секунд, после чего считают его сами, чтобы
+    зависший пересчет не задерживал страницу навсегда.
+    """
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    lock_timeout = lock_timeout or settings.FEED_CACHE_LOCK_TIMEOUT
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, lock_timeout):
+        try:
+            value = compute()
+            cache.set(key, value, timeout)
+        finally:
+            cache.delete(lock_key)
+        return value
+
+    deadline = time.monotonic() + lock_timeout
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        value = cache.get(key)
+        if value is not None:
+            return value
+    return compute()
+
+
+def page_etag(request, *parts):
+    """Значение ETag страницы из версии ее данных, пользователя и курсора.
+
+    Разметка страницы зависит от вошедшего пользователя (шапка,
+    кнопки), поэтому его id тоже входит в ETag.
+    """
+    user = request.user.pk if request.user.is_authenticated else 'anonymous'
+    return hashlib.md5(':'.join(map(str, (
+        user, request.GET.get('cursor', ''), *parts
+    ))).encode()).hexdigest()
+
+
+def conditional_page(version_func):
+    """Отвечает 304 Not Modified, пока версия данных страницы та же.
+
+    version_func(request, *args, **kwargs) возвращает кортеж версии
+    данных страницы и должна быть дешевле самой страницы: одно
+    обращение к кэшу или один запрос по индексу; None означает, что
+    страницы нет, и view отвечает как обычно. ETag — версия вместе с
+    пользователем и курсором.
+    Анонимные страницы могут храниться общим кэшем (обратным прокси)
+    PAGE_SHARED_MAX_AGE секунд, страницы вошедших пользователей —
+    только браузером, с проверкой при каждом запросе. При
+    PAGE_CACHE_ENABLED страница собирается из оболочки в кэше, см.
+    core.pagecache.render_shell.
+    """
+    def etag_func(request, *args, **kwargs):
+        version = pagecache.page_version(request, version_func, args, kwargs)
+        return version and page_etag(request, *version)
+
+    def decorator(view):
+        @wraps(view)
+        def shell_view(request, *args, **kwargs):
+            version = pagecache.page_version(
+                request, version_func, args, kwargs
+            )
+            if not settings.PAGE_CACHE_ENABLED or not version:
+                return view(request, *args, **kwargs)
+            key = pagecache.page_key('shell', request, version)
+            return pagecache.render_shell(request, key, view, *args, **kwargs)
+
+        conditional_view = condition(etag_func=etag_func)(shell_view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if response.status_code not in (200, 304):
+                return response
+            if request.user.is_authenticated:
+                patch_cache_control(response, private=True, no_cache=True)
+            else:
+                patch_cache_control(
+                    response, public=True, max_age=0,
+                    s_maxage=settings.PAGE_SHARED_MAX_AGE,
+                )
+            return response
+        wrapper.page_version = version_func
+        return wrapper
+    return decorator
@@ -0,0 +1,123 @@
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+
+from .models import Comment, Follow, Post, User, UserCounter
+
+# размер пачки для bulk_update при пересчете
+BATCH_SIZE = 500
+
+USER_COUNTERS = {
+    'posts_count': (Post, 'author'),
+    'followers_count': (Follow, 'author'),
+    'following_count': (Follow, 'user'),
+}
+
+
+def _grouped_counts(model, field):
+    """Считает строки model, сгруппированные по полю field."""
+    return dict(
+        model.objects.order_by()
+        .values_list(field)
+        .annotate(total=Count('pk'))
+    )
+
+
+def recount_user(user_id):
+    """Пересчитывает счетчики пользователя с нуля и сохраняет их."""
+    values = {
+        name: model.objects.filter(**{f'{field}_id': user_id}).count()
+        for name, (model, field) in USER_COUNTERS.items()
+    }
+    counter, _ = UserCounter.objects.update_or_create(
+        user_id=user_id, defaults=values
+    )
+    return counter
+
+
+def get_counter(user):
+    """Возвращает счетчики пользователя, создавая их при отсутствии."""
+    try:
+        return user.counter
+    except UserCounter.DoesNotExist:
+        return recount_user(user.pk)
+
+
+def _changed(name, delta):
+    """Выражение счетчика name, измененного на delta, но не меньше 0.
+
+    Счетчик, уже разошедшийся с данными, не уходит ниже нуля и не
+    нарушает ограничение неотрицательного поля; расхождение исправляет
+    recount_counters.
+    """
+    return Greatest(F(name) + delta, 0)
+
+
+def change_user(user_id, **deltas):
+    """Атомарно изменяет счетчики пользователя на deltas через F()."""
+    updated = UserCounter.objects.filter(user_id=user_id).update(
+        **{name: _changed(name, delta) for name, delta in deltas.items()}
+    )
+    if not updated and min(deltas.values()) > 0:
+        # строки еще нет — считаем ее целиком, это уже учтет изменение;
+        # уменьшение без строки бывает только при каскадном удалении
+        # пользователя, и создавать ее тогда нельзя
+        recount_user(user_id)
+
+
+def change_comments(post_id, delta):
+    """Атомарно изменяет счетчик комментариев поста через F().
+
+    Тем же UPDATE увеличивается версия поста: страница поста зависит
+    от самих комментариев, а не только от их числа, и удаление одного
+    с добавлением другого или правка не должны оставлять ее прежней.
+    """
+    Post.objects.filter(pk=post_id).update(
+        comments_count=_changed('comments_count', delta),
+        version=F('version') + 1,
+    )
+
+
+def repair_users():
+    """Исправляет расхождения счетчиков пользователей.
+
+    Возвращает количество исправленных строк.
+    """
+    actual = {
+        name: _grouped_counts(model, field)
+        for name, (model, field) in USER_COUNTERS.items()
+    }
+    existing = UserCounter.objects.in_bulk()
+    drifted, missing = [], []
+    for user_id in User.objects.values_list('pk', flat=True).iterator():
+        values = {
+            name: counts.get(user_id, 0) for name, counts in actual.items()
+        }
+        counter = existing.get(user_id)
+        if counter is None:
+            missing.append(UserCounter(user_id=user_id, **values))
+        elif any(getattr(counter, n) != v for n, v in values.items()):
+            for name, value in values.items():
+                setattr(counter, name, value)
+            drifted.append(counter)
+    UserCounter.objects.bulk_create(missing, batch_size=BATCH_SIZE)
+    UserCounter.objects.bulk_update(
+        drifted, list(USER_COUNTERS), batch_size=BATCH_SIZE
+    )
+    return len(drifted) + len(missing)
+
+
+def repair_posts():
+    """Исправляет расхождения счетчиков комментариев постов.
+
+    Возвращает количество исправленных постов.
+    """
+    actual = _grouped_counts(Comment, 'post')
+    drifted = []
+    posts = Post.objects.values_list('pk', 'comments_count').iterator()
+    for pk, comments_count in posts:
+        if actual.get(pk, 0) != comments_count:
+            drifted.append(Post(pk=pk, comments_count=actual.get(pk, 0)))
+    Post.objects.bulk_update(
+        drifted, ['comments_count'], batch_size=BATCH_SIZE
+    )
+    return len(drifted)
@@ -0,0 +1,178 @@
+from django.conf import settings
+from django.db import connection
+from django.db.models.functions import Substr
+
+from .models import (
+    POST_PREVIEW_LENGTH,
+    FeedEntry,
+    Follow,
+    Post,
+    User,
+    UserCounter
+)
+from .paginators import NEXT, CursorPaginator
+
+# размер пачки для bulk_create при раздаче и дозаполнении ленты
+BATCH_SIZE = 500
+
+
+def is_popular(author_id):
+    """Проверяет, превышает ли число подписчиков автора порог fan-out.
+
+    Посты популярных авторов не раздаются по лентам подписчиков,
+    а подмешиваются в ленту при чтении (fan-out-on-read).
+    """
+    return UserCounter.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.FEED_FANOUT_LIMIT,
+    ).exists()
+
+
+def popular_authors(user):
+    """Возвращает id популярных авторов, на которых подписан user."""
+    return list(
+        User.objects.filter(
+            following__user=user,
+            counter__followers_count__gt=settings.FEED_FANOUT_LIMIT,
+        ).values_list('pk', flat=True)
+    )
+
+
+def _bulk_insert(entries):
+    """Пакетно сохраняет записи ленты, пропуская уже существующие."""
+    FeedEntry.objects.bulk_create(
+        entries, batch_size=BATCH_SIZE, ignore_conflicts=True
+    )
+
+
+def fan_out_post(post):
+    """Раздает новый пост по лентам подписчиков автора."""
+    if is_popular(post.author_id):
+        return
+    followers = (
+        Follow.objects.filter(author_id=post.author_id)
+        .values_list('user_id', flat=True)
+        .iterator(chunk_size=BATCH_SIZE)
+    )
+    _bulk_insert(
+        FeedEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+        for user_id in followers
+    )
+
+
+def backfill(user_id, author_id):
+    """Дозаполняет ленту подписчика постами автора при подписке."""
+    if is_popular(author_id):
+        return
+    posts = (
+        Post.objects.filter(author_id=author_id)
+        .values_list('pk', 'pub_date')
+        .iterator(chunk_size=BATCH_SIZE)
+    )
+    _bulk_insert(
+        FeedEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+        for pk, pub_date in posts
+    )
+
+
+def backfill_all(author_id=None):
+    """Дозаполняет ленты всех подписчиков одним запросом.
+
+    То же, что backfill() для каждой подписки, но INSERT ... SELECT
+    на стороне БД; нужно после массовой загрузки подписок и постов.
+    С author_id дозаполняются только ленты подписчиков этого автора.
+    Счетчики подписчиков должны быть актуальны. Возвращает число
+    добавленных записей.
+    """
+    # имена таблиц в кавычках: у Follow оно с заглавной буквы, и без
+    # кавычек PostgreSQL привел бы его к нижнему регистру
+    entries, follows, posts, counters = (
+        connection.ops.quote_name(model._meta.db_table)
+        for model in (FeedEntry, Follow, Post, UserCounter)
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {entries} (user_id, post_id, pub_date) '
+            f'SELECT f.user_id, p.id, p.pub_date FROM {follows} f '
+            f'JOIN {posts} p ON p.author_id = f.author_id '
+            f'LEFT JOIN {counters} c ON c.user_id = f.author_id '
+            'WHERE COALESCE(c.followers_count, 0) <= %s '
+            f'AND NOT EXISTS (SELECT 1 FROM {entries} e '
+            'WHERE e.user_id = f.user_id AND e.post_id = p.id)'
+            + (' AND f.author_id = %s' if author_id is not None else ''),
+            [settings.FEED_FANOUT_LIMIT]
+            + ([author_id] if author_id is not None else []),
+        )
+        return cursor.rowcount
+
+
+def backfill_unpopular(author_id):
+    """Раздает посты автора, который после отписки перестал быть популярным.
+
+    Пока автор популярен, его новые посты не попадают в FeedEntry, а
+    подмешиваются при чтении. Когда число подписчиков опускается до
+    FEED_FANOUT_LIMIT, они дозаполняются в ленты всех подписчиков,
+    иначе пропали бы из ленты подписок.
+    """
+    if UserCounter.objects.filter(
+        user_id=author_id, followers_count=settings.FEED_FANOUT_LIMIT
+    ).exists():
+        backfill_all(author_id)
+
+
+def prune(user_id, author_id):
+    """Убирает посты автора из ленты подписчика при отписке."""
+    FeedEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+class FollowFeedPaginator(CursorPaginator):
+    """Паджинатор ленты подписок.
+
+    Основной источник — материализованная лента FeedEntry, к которой
+    при необходимости подмешиваются посты популярных авторов, читаемые
+    напрямую из Post. Оба источника выбираются по одному ключу
+    (pub_date, id поста) и сливаются на странице, а курсоры строятся
+    по постам, как и в обычных лентах.
+    """
+
+    def __init__(self, user, per_page):
+        """Готовит оба источника ленты для пользователя user."""
+        # то же, что Post.objects.for_feed(), но через запись ленты
+        entries = FeedEntry.objects.filter(user=user).select_related(
+            'post__author', 'post__group'
+        ).defer('post__text').annotate(
+            text_preview=Substr('post__text', 1, POST_PREVIEW_LENGTH)
+        )
+        super().__init__(entries, per_page)
+        self.popular_posts = None
+        authors = popular_authors(user)
+        if authors:
+            self.popular_posts = Post.objects.filter(
+                author__in=authors
+            ).for_feed()
+
+    def fetch(self, date, pk, direction):
+        """Выбирает посты из ленты и постов популярных авторов."""
+        entries = CursorPaginator(
+            self.object_list, self.per_page, id_field='post_id'
+        ).fetch(date, pk, direction)
+        posts = []
+        for entry in entries:
+            entry.post.text_preview = entry.text_preview
+            posts.append(entry.post)
+        if self.popular_posts is None:
+            return posts
+
+        posts += CursorPaginator(self.popular_posts, self.per_page).fetch(
+            date, pk, direction
+        )
+        # пост мог попасть в ленту до того, как автор стал популярным
+        posts = sorted(
+            {post.pk: post for post in posts}.values(),
+            key=lambda post: (post.pub_date, post.pk),
+            reverse=True,
+        )
+        limit = self.per_page + 1
+        return posts[:limit] if direction == NEXT else posts[-limit:]
@@ -1,5 +1,7 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
+from . import uploads
 from .models import Comment, Post
 
 
@@ -10,6 +12,22 @@ class PostForm(forms.ModelForm):
         """Изменение характеристик наследуемой модели."""
         super().__init__(*args, **kwargs)
         self.fields['group'].empty_label = "Если хотите, выберите группу"
+        # SizeLimitUploadHandler оставляет от слишком большого файла
+        # пустую заглушку, и ImageField отклоняет ее как битую картинку
+        upload = self.files.get(self.add_prefix('image'))
+        if getattr(upload, 'too_large', False):
+            field = self.fields['image']
+            field.error_messages = {
+                **field.error_messages,
+                'invalid_image': uploads.too_large_message(),
+            }
+
+    def clean_image(self):
+        """Проверяет размеры новой картинки и нормализует ее."""
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            image = uploads.normalize(image)
+        return image
 
     class Meta:
         """Сбор необходимых полей из молели.
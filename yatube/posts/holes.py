@@ -0,0 +1,39 @@
+from core.pagecache import hole
+from .forms import CommentForm
+from .models import Follow
+
+
+@hole('switcher')
+def switcher(request):
+    """Вкладки лент: лента подписок есть только у вошедших."""
+    return 'posts/includes/switcher.html', {}
+
+
+@hole('follow_button')
+def follow_button(request, author):
+    """Кнопка подписки на автора с username author."""
+    user = request.user
+    return 'posts/includes/follow_button.html', {
+        'author': author,
+        'follower': user.is_authenticated and Follow.objects.filter(
+            user=user, author__username=author
+        ).exists(),
+    }
+
+
+@hole('post_edit')
+def post_edit(request, post, author):
+    """Ссылка на правку поста post для его автора с id author."""
+    return 'posts/includes/post_edit.html', {
+        'post_id': post,
+        'is_author': str(request.user.pk) == author,
+    }
+
+
+@hole('comment_form')
+def comment_form(request, post):
+    """Форма комментария к посту post; после POST — с ошибками."""
+    return 'posts/includes/new_comment.html', {
+        'post_id': post,
+        'form': CommentForm(request.POST or None),
+    }
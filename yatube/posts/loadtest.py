@@ -0,0 +1,507 @@
+import re
+import statistics
+import threading
+import time
+from contextlib import contextmanager
+from http.client import HTTPConnection
+from http.cookies import SimpleCookie
+from io import BytesIO
+from random import Random
+from urllib.parse import urlencode
+from wsgiref.simple_server import WSGIRequestHandler
+from wsgiref.util import setup_testing_defaults
+
+from django.contrib.auth.hashers import make_password
+from django.core.servers.basehttp import ThreadedWSGIServer
+from django.db import connection, connections
+from django.test.utils import (
+    setup_test_environment,
+    teardown_test_environment
+)
+from django.urls import reverse
+
+from core import metrics
+from .models import Post, User
+from .synthetic import zipf_weights
+
+# доли сценариев в смеси по умолчанию
+MIX = {
+    'browse': 40,
+    'paginate': 10,
+    'profile': 20,
+    'post_detail': 17,
+    'login': 3,
+    'post_create': 3,
+    'comment': 3,
+    'follow': 4,
+}
+
+# смесь только пишущих сценариев и их запросы, меняющие данные
+WRITE_MIX = {'post_create': 1, 'comment': 1, 'follow': 1}
+WRITE_ENDPOINTS = ('post_create', 'comment', 'follow', 'unfollow')
+
+# верхние границы корзин гистограммы времени ответа, мс
+HISTOGRAM_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+# заголовки, в которых инструментированное приложение возвращает
+# число SQL-запросов и обращений к кэшу при обработке запроса
+QUERIES_HEADER = 'X-Load-Queries'
+HITS_HEADER = 'X-Load-Cache-Hits'
+MISSES_HEADER = 'X-Load-Cache-Misses'
+
+PASSWORD = 'loadtest-password'
+
+CSRF_RE = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+NEXT_RE = re.compile(r'href="\?cursor=([^"]+)">\s*Следующая')
+
+
+def instrument(application):
+    """WSGI-приложение, сообщающее в заголовках стоимость запроса.
+
+    Число SQL-запросов и попаданий в кэш за время обработки запроса
+    (см. core.metrics) добавляется к заголовкам ответа, поэтому клиент
+    получает их и при вызове приложения напрямую, и через HTTP.
+    """
+    metrics.install()
+
+    def app(environ, start_response):
+        with metrics.collect() as stats:
+            def start(status, headers, exc_info=None):
+                return start_response(status, list(headers) + [
+                    (QUERIES_HEADER, str(stats.queries)),
+                    (HITS_HEADER, str(stats.cache_hits)),
+                    (MISSES_HEADER, str(stats.cache_misses)),
+                ], exc_info)
+
+            return application(environ, start)
+    return app
+
+
+class WSGITransport:
+    """Вызывает WSGI-приложение в том же процессе."""
+
+    def __init__(self, application):
+        """Транспорт к приложению application."""
+        self.application = application
+
+    def __call__(self, method, path, body, headers):
+        """Выполняет запрос и возвращает (статус, заголовки, тело)."""
+        path, _, query = path.partition('?')
+        environ = {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.input': BytesIO(body),
+            'wsgi.multithread': True,
+        }
+        for name, value in headers.items():
+            if name == 'Content-Type':
+                environ['CONTENT_TYPE'] = value
+            else:
+                environ['HTTP_' + name.upper().replace('-', '_')] = value
+        setup_testing_defaults(environ)
+        response = {}
+
+        def start_response(status, response_headers, exc_info=None):
+            response['status'] = int(status.split()[0])
+            response['headers'] = response_headers
+
+        result = self.application(environ, start_response)
+        try:
+            content = b''.join(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return response['status'], response['headers'], content
+
+
+class HTTPTransport:
+    """Отправляет запросы HTTP-серверу."""
+
+    def __init__(self, host, port):
+        """Транспорт к серверу host:port."""
+        self.host = host
+        self.port = port
+
+    def __call__(self, method, path, body, headers):
+        """Выполняет запрос и возвращает (статус, заголовки, тело)."""
+        http = HTTPConnection(self.host, self.port, timeout=60)
+        try:
+            http.request(method, path, body or None, headers)
+            response = http.getresponse()
+            return response.status, response.getheaders(), response.read()
+        finally:
+            http.close()
+
+
+class _QuietHandler(WSGIRequestHandler):
+    """Обработчик запросов без записи в журнал."""
+
+    def log_message(self, format, *args):
+        """Не выводит строку журнала."""
+
+
+@contextmanager
+def serve(application):
+    """Запускает локальный многопоточный HTTP-сервер на свободном порту.
+
+    Возвращает (host, port). Сервер работает в этом же процессе, поэтому
+    видит временную БД замеров.
+    """
+    server = ThreadedWSGIServer(('127.0.0.1', 0), _QuietHandler)
+    server.set_app(application)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server.server_address[:2]
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+class Browser:
+    """Клиент с собственными cookie, как вкладка браузера."""
+
+    def __init__(self, transport):
+        """Клиент, отправляющий запросы через transport."""
+        self.transport = transport
+        self.cookies = SimpleCookie()
+
+    def request(self, method, path, data=None):
+        """Выполняет запрос и возвращает (статус, заголовки, тело)."""
+        headers = {}
+        body = b''
+        cookies = '; '.join(
+            f'{name}={morsel.value}'
+            for name, morsel in self.cookies.items() if morsel.value
+        )
+        if cookies:
+            headers['Cookie'] = cookies
+        if data is not None:
+            body = urlencode(data).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        status, response_headers, content = self.transport(
+            method, path, body, headers
+        )
+        for name, value in response_headers:
+            if name.lower() == 'set-cookie':
+                self.cookies.load(value)
+        return status, dict(response_headers), content.decode(
+            'utf-8', 'replace'
+        )
+
+
+def prepare(accounts):
+    """Задает пароль аккаунтам и выбирает адреса для сценариев.
+
+    Аккаунтами служат последние по id пользователи — обычные, а не
+    самые активные. Авторы для профилей и подписок упорядочены по
+    числу подписчиков, посты — по числу комментариев, чтобы популярные
+    страницы запрашивались чаще.
+    """
+    users = User.objects.order_by('-pk')
+    usernames = list(users.values_list('username', flat=True)[:accounts])
+    User.objects.filter(username__in=usernames).update(
+        password=make_password(PASSWORD)
+    )
+    return {
+        'accounts': usernames,
+        'authors': list(
+            User.objects.order_by(
+                '-counter__followers_count', 'pk'
+            ).values_list('username', flat=True)[:1000]
+        ),
+        'posts': list(
+            Post.objects.order_by(
+                '-comments_count', '-pk'
+            ).values_list('pk', flat=True)[:1000]
+        ),
+    }
+
+
+class VirtualUser:
+    """Пользователь, выполняющий сценарии смеси.
+
+    Анонимные сценарии идут через отдельный клиент без входа, а
+    сценарии, требующие входа, сначала входят под своим аккаунтом.
+    """
+
+    def __init__(self, transport, account, targets, rng, record, depth):
+        """Пользователь с аккаунтом account и генератором rng."""
+        self.anonymous = Browser(transport)
+        self.browser = Browser(transport)
+        self.account = account
+        self.targets = targets
+        self.rng = rng
+        self.record = record
+        self.depth = depth
+        self.logged_in = False
+        self.author_weights = zipf_weights(len(targets['authors']), 1.1)
+        self.post_weights = zipf_weights(len(targets['posts']), 1.1)
+
+    def call(self, endpoint, browser, path, data=None, expect=200):
+        """Выполняет запрос и записывает замер."""
+        start = time.perf_counter()
+        try:
+            status, headers, content = browser.request(
+                'GET' if data is None else 'POST', path, data
+            )
+        except OSError:
+            # обрыв соединения считается ошибкой запроса
+            status, headers, content = 0, {}, ''
+        elapsed = (time.perf_counter() - start) * 1000
+        self.record(endpoint, elapsed, status != expect, (
+            int(headers.get(QUERIES_HEADER, 0)),
+            int(headers.get(HITS_HEADER, 0)),
+            int(headers.get(MISSES_HEADER, 0)),
+        ))
+        return content
+
+    def author(self):
+        """Автор, выбранный с учетом популярности."""
+        return self.rng.choices(
+            self.targets['authors'], cum_weights=self.author_weights
+        )[0]
+
+    def browse(self):
+        """Главная страница без входа."""
+        self.call('index', self.anonymous, reverse('posts:main_page'))
+
+    def paginate(self):
+        """Листание главной по курсору на depth страниц вглубь."""
+        path = reverse('posts:main_page')
+        content = self.call('index', self.anonymous, path)
+        for _ in range(self.depth):
+            found = NEXT_RE.search(content)
+            if found is None:
+                break
+            content = self.call(
+                'index_deep', self.anonymous,
+                f'{path}?cursor={found.group(1)}',
+            )
+
+    def profile(self):
+        """Профиль автора без входа."""
+        self.call('profile', self.anonymous, reverse(
+            'posts:profile', kwargs={'username': self.author()}
+        ))
+
+    def post_detail(self):
+        """Пост с комментариями без входа."""
+        post_id = self.rng.choices(
+            self.targets['posts'], cum_weights=self.post_weights
+        )[0]
+        self.call('post_detail', self.anonymous, reverse(
+            'posts:post_detail', kwargs={'post_id': post_id}
+        ))
+
+    def login(self):
+        """Вход с новой сессией: форма входа и отправка пароля."""
+        self.browser = Browser(self.browser.transport)
+        path = reverse('users:login')
+        content = self.call('login_form', self.browser, path)
+        token = CSRF_RE.search(content)
+        self.call('login', self.browser, path, {
+            'username': self.account,
+            'password': PASSWORD,
+            'csrfmiddlewaretoken': token.group(1) if token else '',
+        }, expect=302)
+        self.logged_in = True
+
+    def post_create(self):
+        """Публикация поста: форма и ее отправка."""
+        if not self.logged_in:
+            self.login()
+        path = reverse('posts:post_create')
+        content = self.call('post_create_form', self.browser, path)
+        token = CSRF_RE.search(content)
+        self.call('post_create', self.browser, path, {
+            'text': f'Пост нагрузочного теста {self.rng.random()}',
+            'csrfmiddlewaretoken': token.group(1) if token else '',
+        }, expect=302)
+
+    def comment(self):
+        """Комментарий: страница поста с формой и ее отправка."""
+        if not self.logged_in:
+            self.login()
+        post_id = self.rng.choices(
+            self.targets['posts'], cum_weights=self.post_weights
+        )[0]
+        content = self.call('comment_form', self.browser, reverse(
+            'posts:post_detail', kwargs={'post_id': post_id}
+        ))
+        token = CSRF_RE.search(content)
+        self.call('comment', self.browser, reverse(
+            'posts:add_comment', kwargs={'post_id': post_id}
+        ), {
+            'text': f'Комментарий нагрузочного теста {self.rng.random()}',
+            'csrfmiddlewaretoken': token.group(1) if token else '',
+        }, expect=302)
+
+    def follow(self):
+        """Подписка на автора, лента подписок и отписка."""
+        if not self.logged_in:
+            self.login()
+        kwargs = {'username': self.author()}
+        self.call('follow', self.browser, reverse(
+            'posts:profile_follow', kwargs=kwargs
+        ), expect=302)
+        self.call('follow_index', self.browser, reverse('posts:follow_index'))
+        self.call('unfollow', self.browser, reverse(
+            'posts:profile_unfollow', kwargs=kwargs
+        ), expect=302)
+
+
+@contextmanager
+def temporary_database(path=None):
+    """Временная БД замеров вместо рабочей на время блока.
+
+    path задает файл БД SQLite вместо БД в памяти: только в файле
+    работают журнал WAL и настройки профиля, поэтому так измеряется
+    запись при конкурентной нагрузке.
+    """
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    if path and connection.vendor == 'sqlite':
+        connection.settings_dict['TEST']['NAME'] = path
+    connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, serialize=False
+    )
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def parse_mix(value):
+    """Смесь сценариев из строки вида browse=40,profile=20."""
+    mix = {}
+    for item in filter(None, value.split(',')):
+        name, _, weight = item.partition('=')
+        if name not in MIX:
+            raise ValueError(f'Неизвестный сценарий: {name}')
+        mix[name] = float(weight)
+    return mix
+
+
+def run(transport, targets, mix=None, concurrency=1, requests=None,
+        duration=None, seed=0, depth=5):
+    """Выполняет смесь сценариев и возвращает замеры и время работы.
+
+    concurrency пользователей выполняют сценарии, выбранные по весам
+    mix, пока не наберется requests запросов или не пройдет duration
+    секунд; начатый сценарий доводится до конца. Замер —
+    (endpoint, мс, ошибка, (запросов к БД, попаданий в кэш, промахов)).
+    """
+    if requests is None and duration is None:
+        raise ValueError('Нужно задать requests или duration')
+    mix = mix or MIX
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    deadline = time.monotonic() + duration if duration else None
+    samples = []
+    lock = threading.Lock()
+
+    def record(*sample):
+        with lock:
+            samples.append(sample)
+
+    def finished():
+        if requests is not None and len(samples) >= requests:
+            return True
+        return deadline is not None and time.monotonic() > deadline
+
+    def work(number):
+        rng = Random(seed * 1000 + number)
+        user = VirtualUser(
+            transport, targets['accounts'][number], targets, rng, record,
+            depth,
+        )
+        while not finished():
+            getattr(user, rng.choices(names, weights)[0])()
+
+    start = time.perf_counter()
+    _run_users(work, concurrency)
+    return samples, time.perf_counter() - start
+
+
+def _run_users(work, concurrency):
+    """Выполняет work(номер) для каждого пользователя.
+
+    Один пользователь работает в текущем потоке, чтобы видеть данные
+    его транзакции, несколько — каждый в своем потоке со своим
+    подключением к БД.
+    """
+    if concurrency == 1:
+        work(0)
+        return
+
+    def work_in_thread(number):
+        try:
+            work(number)
+        finally:
+            connections.close_all()
+
+    threads = [
+        threading.Thread(target=work_in_thread, args=(number,))
+        for number in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def _percentile(timings, fraction):
+    """Перцентиль отсортированного списка."""
+    return timings[int(fraction * (len(timings) - 1))]
+
+
+def _histogram(timings):
+    """Число ответов по корзинам HISTOGRAM_MS."""
+    buckets = {f'<={bound}ms': 0 for bound in HISTOGRAM_MS}
+    buckets[f'>{HISTOGRAM_MS[-1]}ms'] = 0
+    for timing in timings:
+        for bound in HISTOGRAM_MS:
+            if timing <= bound:
+                buckets[f'<={bound}ms'] += 1
+                break
+        else:
+            buckets[f'>{HISTOGRAM_MS[-1]}ms'] += 1
+    return buckets
+
+
+def summarize(samples, elapsed):
+    """Сводка по каждому endpoint и по всем запросам вместе.
+
+    Для каждого — число запросов и ошибок, RPS, перцентили времени
+    ответа, гистограмма, среднее число SQL-запросов и доля попаданий
+    в кэш.
+    """
+    groups = {}
+    for sample in samples:
+        groups.setdefault(sample[0], []).append(sample)
+    groups['total'] = samples
+    report = {}
+    for name, group in groups.items():
+        timings = sorted(sample[1] for sample in group)
+        hits = sum(sample[3][1] for sample in group)
+        lookups = hits + sum(sample[3][2] for sample in group)
+        report[name] = {
+            'requests': len(group),
+            'errors': sum(sample[2] for sample in group),
+            'rps': round(len(group) / elapsed, 2) if elapsed else 0.0,
+            'p50_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(_percentile(timings, 0.95), 3),
+            'p99_ms': round(_percentile(timings, 0.99), 3),
+            'max_ms': round(timings[-1], 3),
+            'queries': round(
+                sum(sample[3][0] for sample in group) / len(group), 2
+            ),
+            'cache_hit_rate': round(hits / lookups, 3) if lookups else None,
+            'histogram': _histogram(timings),
+        }
+    return report
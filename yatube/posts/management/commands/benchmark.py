@@ -0,0 +1,119 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    setup_test_environment,
+    teardown_test_environment
+)
+
+from posts import benchmark, synthetic
+
+
+class Command(BaseCommand):
+    """Замеры стоимости страниц приложений posts и about."""
+
+    help = (
+        'Наполняет временную тестовую БД данными, замеряет число '
+        'SQL-запросов, p50/p95 времени ответа и пик памяти для каждого '
+        'именованного URL и сравнивает результат с эталоном в JSON'
+    )
+
+    def add_arguments(self, parser):
+        """Параметры объема данных, замеров и сравнения с эталоном."""
+        parser.add_argument('--authors', type=int, default=50)
+        parser.add_argument('--groups', type=int, default=10)
+        parser.add_argument('--posts', type=int, default=2000)
+        parser.add_argument('--comments', type=int, default=5000)
+        parser.add_argument('--follows', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--synthetic', action='store_true',
+            help='Наполнить БД генератором generate_data: перекошенные '
+                 'распределения вместо равномерных',
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Сколько раз запрашивать каждый URL',
+        )
+        parser.add_argument(
+            '--depth', type=int, default=20,
+            help='Глубина листания главной для замера дальней страницы',
+        )
+        parser.add_argument(
+            '--baseline', default=settings.BENCHMARK_BASELINE,
+            help='JSON-файл с эталонными замерами',
+        )
+        parser.add_argument(
+            '--threshold', type=float, default=settings.BENCHMARK_THRESHOLD,
+            help='Во сколько раз время и память могут превысить эталон',
+        )
+        parser.add_argument(
+            '--query-slack', type=int, default=0,
+            help='На сколько число запросов может превысить эталон',
+        )
+        parser.add_argument(
+            '--update', action='store_true',
+            help='Записать замеры как новый эталон',
+        )
+
+    def handle(self, *args, **options):
+        """Замеряет страницы во временной БД и сравнивает с эталоном."""
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            sizes = {
+                'groups': options['groups'],
+                'posts': options['posts'],
+                'comments': options['comments'],
+                'follows': options['follows'],
+                'random_seed': options['seed'],
+            }
+            if options['synthetic']:
+                # картинки не создаются: файлы попали бы в MEDIA_ROOT
+                meta = synthetic.generate(
+                    users=options['authors'], image_share=0, **sizes
+                )
+            else:
+                meta = benchmark.seed(authors=options['authors'], **sizes)
+            results = benchmark.run(options['repeat'], options['depth'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        for name, result in sorted(results.items()):
+            self.stdout.write(
+                f'{name:32} {result["status"]} '
+                f'queries={result["queries"]:<4} '
+                f'p50={result["p50_ms"]:.1f}ms p95={result["p95_ms"]:.1f}ms '
+                f'peak={result["peak_kb"]:.0f}KB'
+            )
+
+        path = options['baseline']
+        if options['update'] or not os.path.exists(path):
+            benchmark.save_baseline(path, results, meta)
+            self.stdout.write(self.style.SUCCESS(f'Эталон записан в {path}'))
+            return
+
+        metrics = benchmark.comparable(benchmark.load_environment(path))
+        if metrics != benchmark.METRICS:
+            self.stdout.write(self.style.WARNING(
+                'Эталон записан в другом окружении, пик памяти '
+                'не сравнивается'
+            ))
+        regressions = benchmark.compare(
+            results,
+            benchmark.load_baseline(path),
+            threshold=options['threshold'],
+            query_slack=options['query_slack'],
+            metrics=metrics,
+        )
+        if regressions:
+            raise CommandError(
+                'Регрессии относительно эталона:\n' + '\n'.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
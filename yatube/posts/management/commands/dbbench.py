@@ -0,0 +1,149 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from yatube.wsgi import application
+
+from posts import loadtest, synthetic
+
+
+class Command(BaseCommand):
+    """Пропускная способность записи профилей БД под нагрузкой."""
+
+    help = (
+        'Выполняет пишущие сценарии (публикация, комментарии, подписки) '
+        'одновременно от нескольких пользователей через локальный '
+        'HTTP-сервер во временной БД и выводит число записей в секунду, '
+        'перцентили времени ответа и ошибки для каждого профиля DB_BACKEND'
+    )
+
+    def add_arguments(self, parser):
+        """Профили, объем данных и нагрузка."""
+        parser.add_argument(
+            '--profiles', default=settings.DB_BACKEND,
+            help='Профили через запятую, например sqlite,sqlite_wal; '
+                 'каждый замеряется в своем процессе',
+        )
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=1000)
+        parser.add_argument('--comments', type=int, default=1000)
+        parser.add_argument('--follows', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument(
+            '--requests', type=int,
+            help='Сколько запросов выполнить (по умолчанию 600)',
+        )
+        parser.add_argument(
+            '--duration', type=float, help='Сколько секунд нагружать',
+        )
+        parser.add_argument('--json', help='Записать сводку в JSON-файл')
+
+    def handle(self, *args, **options):
+        """Замеряет профили и выводит сводку."""
+        profiles = list(filter(None, options['profiles'].split(',')))
+        unknown = set(profiles) - settings.DATABASE_PROFILES.keys()
+        if unknown:
+            raise CommandError(
+                'Неизвестные профили: ' + ', '.join(sorted(unknown))
+            )
+        if options['concurrency'] >= options['users']:
+            raise CommandError('--concurrency должен быть меньше --users')
+        if options['requests'] is None and options['duration'] is None:
+            options['requests'] = 600
+
+        if profiles == [settings.DB_BACKEND]:
+            results = {settings.DB_BACKEND: self.measure(options)}
+        else:
+            results = {
+                profile: self.measure_in_process(profile, options)
+                for profile in profiles
+            }
+        for profile, result in results.items():
+            self.stdout.write(
+                f'{profile:12} writes={result["requests"]:<6} '
+                f'err={result["errors"]:<4} '
+                f'writes/s={result["rps"]:<8} '
+                f'p50={result["p50_ms"]:.1f}ms '
+                f'p95={result["p95_ms"]:.1f}ms '
+                f'p99={result["p99_ms"]:.1f}ms'
+            )
+        if options['json']:
+            with open(options['json'], 'w', encoding='utf-8') as file:
+                json.dump(results, file, ensure_ascii=False, indent=2)
+                file.write('\n')
+
+    def measure(self, options):
+        """Замеры текущего профиля: сводка по пишущим запросам.
+
+        БД SQLite создается во временном файле, а не в памяти, чтобы
+        действовали журнал и настройки профиля. Пользователи работают
+        каждый в своем потоке, сервер обрабатывает каждый запрос в
+        своем потоке со своим подключением к БД.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            with loadtest.temporary_database(
+                os.path.join(directory, 'dbbench.sqlite3')
+            ):
+                synthetic.generate(
+                    users=options['users'],
+                    posts=options['posts'],
+                    comments=options['comments'],
+                    follows=options['follows'],
+                    random_seed=options['seed'],
+                    image_share=0,
+                )
+                targets = loadtest.prepare(options['concurrency'])
+                cache.clear()
+                with loadtest.serve(
+                    loadtest.instrument(application)
+                ) as address:
+                    samples, elapsed = loadtest.run(
+                        loadtest.HTTPTransport(*address), targets,
+                        mix=loadtest.WRITE_MIX,
+                        concurrency=options['concurrency'],
+                        requests=options['requests'],
+                        duration=options['duration'],
+                        seed=options['seed'],
+                    )
+        writes = [
+            sample for sample in samples
+            if sample[0] in loadtest.WRITE_ENDPOINTS
+        ]
+        if not writes:
+            raise CommandError('Не выполнено ни одной записи')
+        return loadtest.summarize(writes, elapsed)['total']
+
+    def measure_in_process(self, profile, options):
+        """Замеры профиля в отдельном процессе.
+
+        Профиль БД выбирается при загрузке настроек, поэтому каждый
+        профиль замеряется своим запуском команды с DB_BACKEND.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'result.json')
+            command = [
+                sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'),
+                'dbbench', '--profiles', profile, '--json', path,
+            ]
+            for name in (
+                'users', 'posts', 'comments', 'follows', 'seed',
+                'concurrency', 'requests', 'duration',
+            ):
+                if options[name] is not None:
+                    command += [f'--{name}', str(options[name])]
+            finished = subprocess.run(
+                command, env={**os.environ, 'DB_BACKEND': profile},
+                capture_output=True, text=True,
+            )
+            if finished.returncode:
+                raise CommandError(
+                    f'Профиль {profile}: {finished.stderr.strip()}'
+                )
+            with open(path, encoding='utf-8') as file:
+                return json.load(file)[profile]
@@ -0,0 +1,39 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    """Выгрузка постов, комментариев или подписок в NDJSON или CSV."""
+
+    help = (
+        'Потоково выгружает посты, комментарии или подписки в файл '
+        'NDJSON или CSV, не загружая таблицу в память'
+    )
+
+    def add_arguments(self, parser):
+        """Вид объектов, файл и формат."""
+        parser.add_argument('kind', choices=sorted(transfer.FIELDS))
+        parser.add_argument('path', help='файл или - для stdout')
+        parser.add_argument(
+            '--format', choices=(transfer.NDJSON, transfer.CSV),
+            help='по умолчанию определяется по расширению файла',
+        )
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        """Пишет объекты в файл и выводит их число."""
+        path = options['path']
+        fmt = transfer.detect_format(path, options['format'])
+        if path == '-':
+            count = transfer.export(
+                options['kind'], sys.stdout, fmt, options['chunk_size']
+            )
+        else:
+            with open(path, 'w', encoding='utf-8', newline='') as stream:
+                count = transfer.export(
+                    options['kind'], stream, fmt, options['chunk_size']
+                )
+        self.stderr.write(self.style.SUCCESS(f'Выгружено: {count}'))
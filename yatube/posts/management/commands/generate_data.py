@@ -0,0 +1,84 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import synthetic
+from posts.models import User
+
+
+class Command(BaseCommand):
+    """Генерация перекошенных данных для замеров производительности."""
+
+    help = (
+        'Создает bulk_create пользователей, группы, подписки, посты с '
+        'картинками и комментарии с распределениями как в боевой БД: '
+        'подписчики по закону Ципфа, частота постов по Парето, всплески '
+        'комментариев; при одном --seed данные одинаковые'
+    )
+
+    def add_arguments(self, parser):
+        """Объем данных и параметры распределений."""
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--comments', type=int, default=50000)
+        parser.add_argument('--follows', type=int, default=20000)
+        parser.add_argument(
+            '--images', type=int, default=20,
+            help='Сколько разных картинок прикреплять к постам',
+        )
+        parser.add_argument(
+            '--image-share', type=float, default=0.1,
+            help='Доля постов с картинкой',
+        )
+        parser.add_argument(
+            '--zipf', type=float, default=1.1,
+            help='Показатель закона Ципфа для подписчиков, групп, '
+                 'картинок и комментариев',
+        )
+        parser.add_argument(
+            '--pareto', type=float, default=1.5,
+            help='Показатель Парето для частоты постов; меньше — '
+                 'тяжелее хвост',
+        )
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько дней до 2025-01-01 распределены посты',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--prefix', default='synthetic')
+        parser.add_argument(
+            '--no-index', action='store_true',
+            help='Не перестраивать индекс поиска',
+        )
+
+    def handle(self, *args, **options):
+        """Создает данные и выводит показатели перекоса."""
+        prefix = options['prefix']
+        if User.objects.filter(
+            username__startswith=f'{prefix}_user_'
+        ).exists():
+            raise CommandError(
+                f'Данные с префиксом {prefix} уже есть, задайте --prefix'
+            )
+        if options['users'] < 2:
+            raise CommandError('Нужно хотя бы два пользователя')
+        synthetic.generate(
+            users=options['users'],
+            groups=options['groups'],
+            posts=options['posts'],
+            comments=options['comments'],
+            follows=options['follows'],
+            images=options['images'],
+            image_share=options['image_share'],
+            zipf=options['zipf'],
+            pareto=options['pareto'],
+            days=options['days'],
+            random_seed=options['seed'],
+            batch_size=options['batch_size'],
+            prefix=prefix,
+            index=not options['no_index'],
+        )
+        for name, value in synthetic.skew(prefix).items():
+            if isinstance(value, float):
+                value = f'{value:.1%}'
+            self.stdout.write(f'{name:16} {value}')
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    """Создание миниатюр, не созданных фоновым пулом."""
+
+    help = (
+        'Создает миниатюры постов, оставшихся в очереди (например, после '
+        'перезапуска воркера) или завершившихся ошибкой'
+    )
+
+    def add_arguments(self, parser):
+        """Флаг обработки всех постов с картинками."""
+        parser.add_argument(
+            '--all', action='store_true',
+            help='пересоздать миниатюры всех постов, например после '
+                 'добавления размера в POST_THUMBNAILS',
+        )
+
+    def handle(self, *args, **options):
+        """Обрабатывает посты в текущем процессе и выводит итог."""
+        posts = Post.objects.exclude(image='')
+        if not options['all']:
+            posts = posts.exclude(thumbnail_status=Post.THUMBNAIL_READY)
+        post_ids = list(posts.values_list('pk', flat=True))
+        for post_id in post_ids:
+            thumbnails.process(post_id)
+        failed = Post.objects.filter(
+            pk__in=post_ids, thumbnail_status=Post.THUMBNAIL_FAILED
+        ).count()
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано постов: {len(post_ids)}, с ошибкой: {failed}'
+        ))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from posts import variants
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    """Отчет об экономии трафика адаптивными вариантами картинок."""
+
+    help = (
+        'Сравнивает объем JPEG полной ширины, который раньше получал '
+        'каждый клиент, с самым маленьким подходящим вариантом'
+    )
+
+    def handle(self, *args, **options):
+        """Выводит суммы байт до и после и долю экономии."""
+        posts = Post.objects.exclude(image_variants='').only(
+            'image_variants'
+        )
+        manifests = [
+            post.variants for post in posts.iterator() if post.variants
+        ]
+        report = variants.savings(manifests)
+        self.stdout.write(
+            f'Картинок: {len(manifests)}, '
+            f'байт до: {report["before"]}, после: {report["after"]}, '
+            f'экономия: {report["ratio"]:.1%}'
+        )
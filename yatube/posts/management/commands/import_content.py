@@ -0,0 +1,79 @@
+import sys
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    """Загрузка постов, комментариев или подписок из NDJSON или CSV."""
+
+    help = (
+        'Потоково загружает посты, комментарии или подписки из файла '
+        'NDJSON или CSV пачками bulk_create, каждая пачка в своей '
+        'транзакции; после сбоя загрузку можно продолжить с --resume'
+    )
+
+    def add_arguments(self, parser):
+        """Вид объектов, файл, формат и параметры загрузки."""
+        parser.add_argument('kind', choices=sorted(transfer.FIELDS))
+        parser.add_argument('path', help='файл или - для stdin')
+        parser.add_argument(
+            '--format', choices=(transfer.NDJSON, transfer.CSV),
+            help='по умолчанию определяется по расширению файла',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--defer-side-effects', action='store_true',
+            help='не обновлять счетчики и индекс поиска для каждой '
+                 'пачки, а пересчитать их один раз в конце',
+        )
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='продолжить с позиции, сохраненной в <файл>.checkpoint',
+        )
+
+    def handle(self, *args, **options):
+        """Загружает файл пачками и выводит итог."""
+        path = options['path']
+        fmt = transfer.detect_format(path, options['format'])
+        if path == '-':
+            if options['resume']:
+                raise CommandError('--resume не работает с stdin')
+            self.load(sys.stdin, fmt, None, options)
+            return
+        checkpoint = transfer.Checkpoint(path)
+        if not options['resume']:
+            checkpoint.clear()
+        with open(path, encoding='utf-8', newline='') as stream:
+            self.load(stream, fmt, checkpoint, options)
+        checkpoint.clear()
+
+    def load(self, stream, fmt, checkpoint, options):
+        """Читает записи и сохраняет их пачками."""
+        offset, records = checkpoint.load() if checkpoint else (0, 0)
+        if offset:
+            self.stderr.write(f'Продолжение после записи {records}')
+        importer = transfer.Importer(
+            options['kind'], options['defer_side_effects']
+        )
+        reader = transfer.read(stream, fmt, offset)
+        while True:
+            batch = list(islice(reader, options['batch_size']))
+            if not batch:
+                break
+            try:
+                importer.load([record for record, _ in batch])
+            except (KeyError, ValueError) as error:
+                raise CommandError(
+                    f'Ошибка в записях {records + 1}–{records + len(batch)}: '
+                    f'{error!r}'
+                )
+            records += len(batch)
+            if checkpoint:
+                checkpoint.save(batch[-1][1], records)
+        importer.finish()
+        self.stdout.write(self.style.SUCCESS(
+            f'Прочитано записей: {records}, создано: {importer.created}'
+        ))
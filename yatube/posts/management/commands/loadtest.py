@@ -0,0 +1,131 @@
+import json
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from yatube.wsgi import application
+
+from posts import loadtest, synthetic
+
+
+class Command(BaseCommand):
+    """Нагрузочный тест WSGI-приложения смесью сценариев."""
+
+    help = (
+        'Наполняет временную БД генератором generate_data и выполняет '
+        'смесь сценариев (главная, листание, профили, посты, вход, '
+        'публикация, комментарии, подписки) через WSGI-приложение '
+        'напрямую или через локальный HTTP-сервер; выводит RPS, '
+        'перцентили и гистограмму времени ответа, SQL-запросы и '
+        'попадания в кэш по каждому адресу'
+    )
+
+    def add_arguments(self, parser):
+        """Объем данных, смесь сценариев и режим нагрузки."""
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--posts', type=int, default=5000)
+        parser.add_argument('--comments', type=int, default=10000)
+        parser.add_argument('--follows', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--transport', choices=('wsgi', 'http'), default='wsgi',
+            help='wsgi — вызов приложения в процессе, http — через '
+                 'локальный многопоточный сервер',
+        )
+        parser.add_argument('--concurrency', type=int, default=1)
+        parser.add_argument(
+            '--requests', type=int,
+            help='Сколько запросов выполнить (по умолчанию 1000)',
+        )
+        parser.add_argument(
+            '--duration', type=float, help='Сколько секунд нагружать',
+        )
+        parser.add_argument(
+            '--mix', default='',
+            help='Веса сценариев, например browse=40,profile=20; '
+                 'сценарии: ' + ', '.join(loadtest.MIX),
+        )
+        parser.add_argument(
+            '--depth', type=int, default=5,
+            help='На сколько страниц вглубь листает сценарий paginate',
+        )
+        parser.add_argument(
+            '--histogram', action='store_true',
+            help='Вывести гистограмму времени ответа по каждому адресу',
+        )
+        parser.add_argument('--json', help='Записать сводку в JSON-файл')
+
+    def handle(self, *args, **options):
+        """Нагружает приложение во временной БД и выводит сводку."""
+        try:
+            mix = loadtest.parse_mix(options['mix'])
+        except ValueError as error:
+            raise CommandError(error)
+        if options['concurrency'] >= options['users']:
+            raise CommandError('--concurrency должен быть меньше --users')
+        requests = options['requests']
+        if requests is None and options['duration'] is None:
+            requests = 1000
+
+        with loadtest.temporary_database():
+            synthetic.generate(
+                users=options['users'],
+                posts=options['posts'],
+                comments=options['comments'],
+                follows=options['follows'],
+                random_seed=options['seed'],
+                image_share=0,
+            )
+            targets = loadtest.prepare(options['concurrency'])
+            cache.clear()
+            app = loadtest.instrument(application)
+            if options['transport'] == 'http':
+                with loadtest.serve(app) as address:
+                    samples, elapsed = self.run(
+                        loadtest.HTTPTransport(*address), targets, mix,
+                        requests, options,
+                    )
+            else:
+                samples, elapsed = self.run(
+                    loadtest.WSGITransport(app), targets, mix, requests,
+                    options,
+                )
+
+        report = loadtest.summarize(samples, elapsed)
+        self.print_report(report, options['histogram'])
+        if options['json']:
+            with open(options['json'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+                file.write('\n')
+
+    def run(self, transport, targets, mix, requests, options):
+        """Выполняет сценарии через transport."""
+        return loadtest.run(
+            transport, targets, mix=mix,
+            concurrency=options['concurrency'],
+            requests=requests,
+            duration=options['duration'],
+            seed=options['seed'],
+            depth=options['depth'],
+        )
+
+    def print_report(self, report, histogram):
+        """Выводит сводку по адресам и итог."""
+        for name, result in sorted(
+            report.items(), key=lambda item: item[0] == 'total'
+        ):
+            hit_rate = result['cache_hit_rate']
+            self.stdout.write(
+                f'{name:18} n={result["requests"]:<6} '
+                f'err={result["errors"]:<4} rps={result["rps"]:<8} '
+                f'p50={result["p50_ms"]:.1f}ms '
+                f'p95={result["p95_ms"]:.1f}ms '
+                f'p99={result["p99_ms"]:.1f}ms '
+                f'queries={result["queries"]:<6} cache='
+                + ('-' if hit_rate is None else f'{hit_rate:.0%}')
+            )
+            if histogram:
+                self.stdout.write('    ' + ' '.join(
+                    f'{bucket}:{total}'
+                    for bucket, total in result['histogram'].items()
+                    if total
+                ))
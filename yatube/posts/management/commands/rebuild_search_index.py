@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from posts import search
+
+
+class Command(BaseCommand):
+    """Перестроение полнотекстового индекса постов."""
+
+    help = (
+        'Строит индекс поиска по постам и комментариям заново, '
+        'например после массовой загрузки данных в обход сигналов'
+    )
+
+    def handle(self, *args, **options):
+        """Перестраивает индекс и выводит число постов в нем."""
+        count = search.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано постов: {count}'
+        ))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from posts import blobs, counters
+
+
+class Command(BaseCommand):
+    """Пересчет денормализованных счетчиков и ссылок на картинки."""
+
+    help = (
+        'Пересчитывает счетчики постов, подписчиков, подписок и '
+        'комментариев и ссылок на файлы картинок и исправляет '
+        'расхождения с реальными данными'
+    )
+
+    def handle(self, *args, **options):
+        """Исправляет счетчики и выводит число исправленных строк."""
+        users = counters.repair_users()
+        posts = counters.repair_posts()
+        images = blobs.repair()
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено счетчиков пользователей: {users}, '
+            f'постов: {posts}, файлов картинок: {images}'
+        ))
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 04:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_post_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='thumbnail_status',
+            field=models.CharField(choices=[('pending', 'В очереди'), ('processing', 'Создаются'), ('ready', 'Готовы'), ('failed', 'Ошибка')], default='ready', editable=False, help_text='Состояние фоновой генерации миниатюр картинки', max_length=10, verbose_name='Миниатюры'),
+        ),
+    ]
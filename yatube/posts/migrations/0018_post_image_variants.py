@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 04:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_post_thumbnail_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_variants',
+            field=models.TextField(blank=True, editable=False, help_text='JSON с адаптивными вариантами картинки, см. variants.py', verbose_name='Варианты картинки'),
+        ),
+    ]
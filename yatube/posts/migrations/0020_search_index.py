@@ -0,0 +1,52 @@
+from django.db import migrations
+
+SQLITE = (
+    "CREATE VIRTUAL TABLE posts_search USING fts5("
+    "text, comments, pub_ts UNINDEXED, "
+    "tokenize = 'unicode61 remove_diacritics 2')",
+    "INSERT INTO posts_search (rowid, text, comments, pub_ts) "
+    "SELECT p.id, p.text, COALESCE((SELECT group_concat(c.text, char(10)) "
+    "FROM posts_comment c WHERE c.post_id = p.id), ''), "
+    "CAST(strftime('%%s', p.pub_date) AS REAL) FROM posts_post p",
+)
+
+POSTGRES = (
+    "CREATE TABLE posts_search ("
+    "post_id integer PRIMARY KEY, text text NOT NULL, "
+    "comments text NOT NULL, pub_ts double precision NOT NULL, "
+    "document tsvector NOT NULL)",
+    "CREATE INDEX posts_search_document ON posts_search USING gin (document)",
+    "INSERT INTO posts_search (post_id, text, comments, pub_ts, document) "
+    "SELECT id, text, comments, extract(epoch FROM pub_date), "
+    "setweight(to_tsvector('russian', text), 'A') || "
+    "setweight(to_tsvector('russian', comments), 'B') FROM ("
+    "SELECT p.id, p.text, p.pub_date, COALESCE((SELECT string_agg("
+    "c.text, chr(10)) FROM posts_comment c WHERE c.post_id = p.id), '') "
+    "AS comments FROM posts_post p) posts",
+)
+
+
+def create_index(apps, schema_editor):
+    """Создает полнотекстовый индекс постов и заполняет его."""
+    statements = {'sqlite': SQLITE, 'postgresql': POSTGRES}.get(
+        schema_editor.connection.vendor, ()
+    )
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_index(apps, schema_editor):
+    """Удаляет полнотекстовый индекс постов."""
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute('DROP TABLE posts_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_imageblob'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -1,16 +1,50 @@
+import json
+
 from django.contrib.auth import get_user_model
 from django.db import models
 from django.db.models.constraints import UniqueConstraint
+from django.db.models.functions import Substr
 
 from core.models import CreatedModel
+from .storage import DeduplicatingStorage
 
 
 User = get_user_model()
 
+# сколько символов текста поста показывается в карточке ленты
+POST_PREVIEW_LENGTH = 500
+
+
+class PostQuerySet(models.QuerySet):
+    """Запросы к постам."""
+
+    def for_feed(self):
+        """Посты для карточек ленты.
+
+        Автор и группа выбираются тем же запросом, а вместо полного
+        текста из БД читается только начало, которое показывается в
+        карточке, — так страница ленты стоит фиксированное число
+        запросов при любом размере страницы и длине постов.
+        """
+        return self.select_related('author', 'group').defer(
+            'text'
+        ).annotate(text_preview=Substr('text', 1, POST_PREVIEW_LENGTH))
+
 
 class Post(CreatedModel):
     """Модель поста."""
 
+    THUMBNAIL_PENDING = 'pending'
+    THUMBNAIL_PROCESSING = 'processing'
+    THUMBNAIL_READY = 'ready'
+    THUMBNAIL_FAILED = 'failed'
+    THUMBNAIL_STATUSES = (
+        (THUMBNAIL_PENDING, 'В очереди'),
+        (THUMBNAIL_PROCESSING, 'Создаются'),
+        (THUMBNAIL_READY, 'Готовы'),
+        (THUMBNAIL_FAILED, 'Ошибка'),
+    )
+
     text = models.TextField(
         verbose_name='Текст поста',
         help_text='Введите текст поста'
@@ -34,18 +68,86 @@ class Post(CreatedModel):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=DeduplicatingStorage(),
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        'Количество комментариев',
+        default=0,
+        editable=False
+    )
+    version = models.PositiveIntegerField(
+        'Версия',
+        default=1,
+        editable=False,
+        help_text='Увеличивается при каждой правке поста'
+    )
+    thumbnail_status = models.CharField(
+        'Миниатюры',
+        max_length=10,
+        choices=THUMBNAIL_STATUSES,
+        default=THUMBNAIL_READY,
+        editable=False,
+        help_text='Состояние фоновой генерации миниатюр картинки'
+    )
+    image_variants = models.TextField(
+        'Варианты картинки',
+        blank=True,
+        editable=False,
+        help_text='JSON с адаптивными вариантами картинки, см. variants.py'
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
         ordering = ('-pub_date',)
+        # id в конце индексов нужен для keyset-паджинации по
+        # (pub_date, id): без него SQLite досортировывает страницу
+        # во временном B-дереве
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_pub_date_idx',
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx',
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx',
+            ),
+        ]
 
     def __str__(self) -> str:
         """Магический метод возврата текста поста."""
         return self.text[:15]
 
+    def save(self, *args, **kwargs):
+        """Сохраняет пост, не оставляя ссылок на картинку при ошибке."""
+        # blobs импортирует модели
+        from . import blobs
+
+        with blobs.claiming(self.image):
+            super().save(*args, **kwargs)
+
+    @property
+    def variants(self):
+        """Описание адаптивных вариантов картинки или None."""
+        try:
+            return json.loads(self.image_variants)
+        except ValueError:
+            return None
+
+    @property
+    def thumbnails_pending(self) -> bool:
+        """Миниатюры картинки еще создаются в фоне."""
+        return self.thumbnail_status in (
+            self.THUMBNAIL_PENDING, self.THUMBNAIL_PROCESSING
+        )
+
 
 class Group(models.Model):
     """Модель группы."""
@@ -86,6 +188,16 @@ class Comment(CreatedModel):
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(
+                fields=['post', '-pub_date', '-id'],
+                name='comment_post_pub_date_idx',
+            ),
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='comment_pub_date_idx',
+            ),
+        ]
 
     def __str__(self) -> str:
         """Магический метод возврата текста комментария."""
@@ -113,3 +225,92 @@ class Follow(CreatedModel):
             fields=['user', 'author'],
             name='unique_follower'),
         ]
+        # уникальный индекс (user, author) обслуживает подписки
+        # пользователя, этот — подписчиков автора при fan-out
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx',
+            ),
+        ]
+
+
+class FeedEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя.
+
+    Заполняется при публикации поста (fan-out-on-write), поэтому
+    чтение ленты /follow/ — это выборка по индексу (user, pub_date)
+    без join'а через Follow. pub_date копируется из поста.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries'
+    )
+    pub_date = models.DateTimeField('Дата публикации поста')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        ordering = ('-pub_date',)
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='feed_user_pub_date_idx',
+            ),
+        ]
+        constraints = [UniqueConstraint(
+            fields=['user', 'post'],
+            name='unique_feed_entry'),
+        ]
+
+
+class UserCounter(models.Model):
+    """Денормализованные счетчики пользователя.
+
+    Поддерживаются сигналами при создании и удалении Post и Follow,
+    расхождения исправляет команда recount_counters.
+    """
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counter'
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+
+    class Meta:
+        verbose_name = 'Счетчики пользователя'
+        verbose_name_plural = 'Счетчики пользователей'
+
+    def __str__(self) -> str:
+        """Магический метод возврата имени пользователя."""
+        return str(self.user)
+
+
+class ImageBlob(models.Model):
+    """Файл картинки в DeduplicatingStorage и число ссылок на него.
+
+    Поддерживается сигналами при сохранении и удалении Post: файл и
+    его миниатюры удаляются, когда на него не ссылается ни один пост.
+    """
+
+    name = models.CharField('Файл', max_length=100, unique=True)
+    references = models.PositiveIntegerField('Ссылок', default=0)
+
+    class Meta:
+        verbose_name = 'Файл картинки'
+        verbose_name_plural = 'Файлы картинок'
+
+    def __str__(self) -> str:
+        """Магический метод возврата имени файла."""
+        return self.name
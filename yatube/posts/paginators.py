@@ -0,0 +1,145 @@
+import base64
+import binascii
+
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def encode_cursor(number, direction, date, pk):
+    """Упаковывает позицию в ленте в непрозрачный токен для ?cursor=.
+
+    Вместо даты ключом позиции может быть число (см. SearchPaginator).
+    """
+    if hasattr(date, 'isoformat'):
+        date = date.isoformat()
+    raw = f'{number}|{direction}|{date}|{pk}'
+    token = base64.urlsafe_b64encode(raw.encode())
+    return token.decode().rstrip('=')
+
+
+def decode_cursor(token, parse_date=parse_datetime):
+    """Распаковывает токен курсора.
+
+    Возвращает кортеж (number, direction, date, pk) или None,
+    если токен пустой или поврежден. Ключ позиции разбирается
+    функцией parse_date.
+    """
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        number, direction, date, pk = raw.decode().split('|')
+        number, pk, date = int(number), int(pk), parse_date(date)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if date is None or number < 1 or direction not in (NEXT, PREVIOUS):
+        return None
+    return number, direction, date, pk
+
+
+class CursorPaginator(Paginator):
+    """Keyset-паджинатор по паре (pub_date, id).
+
+    В отличие от стандартного Paginator не выполняет COUNT(*) и
+    LIMIT/OFFSET: каждая страница — это выборка per_page + 1 строк
+    начиная с позиции курсора, поэтому время ответа не зависит от
+    глубины страницы. Возвращаемый объект — обычный Page с
+    дополнительными атрибутами next_cursor и previous_cursor.
+    """
+
+    date_field = 'pub_date'
+    id_field = 'pk'
+    parse_date = staticmethod(parse_datetime)
+
+    def __init__(self, object_list, per_page, date_field=None,
+                 id_field=None):
+        """Позволяет переопределить поля ключа паджинации."""
+        super().__init__(object_list, per_page)
+        self.date_field = date_field or self.date_field
+        self.id_field = id_field or self.id_field
+        self.num_pages = 1
+
+    def get_page(self, cursor=None):
+        """Возвращает страницу по токену курсора.
+
+        Пустой или поврежденный токен, как и в Paginator.get_page,
+        приводит к первой странице.
+        """
+        position = decode_cursor(cursor, self.parse_date)
+        if position is None:
+            return self._build_page(self.fetch(None, None, NEXT), 1, NEXT)
+
+        number, direction, date, pk = position
+        rows = self.fetch(date, pk, direction)
+        if direction == PREVIOUS and len(rows) <= self.per_page:
+            # дошли до начала ленты — отдаем «настоящую» первую страницу
+            rows = self.fetch(None, None, NEXT)
+            return self._build_page(rows, 1, NEXT)
+        if not rows:
+            return self._build_page(self.fetch(None, None, NEXT), 1, NEXT)
+        return self._build_page(rows, max(number, 2), direction)
+
+    def fetch(self, date, pk, direction):
+        """Выбирает per_page + 1 объектов после (или до) позиции курсора.
+
+        Лишний объект нужен только для того, чтобы узнать, есть ли
+        следующая страница. Результат всегда упорядочен от новых к старым.
+        """
+        date_field, id_field = self.date_field, self.id_field
+        queryset = self.object_list
+        if direction == NEXT:
+            if date is not None:
+                # date <= X отдается индексу как диапазон,
+                # вторая часть условия лишь отсекает дубликаты по дате
+                queryset = queryset.filter(
+                    Q(**{f'{date_field}__lte': date}),
+                    Q(**{f'{date_field}__lt': date})
+                    | Q(**{f'{id_field}__lt': pk}),
+                )
+            queryset = queryset.order_by(f'-{date_field}', f'-{id_field}')
+            return list(queryset[:self.per_page + 1])
+
+        queryset = queryset.filter(
+            Q(**{f'{date_field}__gte': date}),
+            Q(**{f'{date_field}__gt': date}) | Q(**{f'{id_field}__gt': pk}),
+        ).order_by(date_field, id_field)
+        return list(queryset[:self.per_page + 1])[::-1]
+
+    def cursor_for(self, obj, number, direction):
+        """Строит токен курсора, указывающий на объект obj."""
+        return encode_cursor(
+            number,
+            direction,
+            getattr(obj, self.date_field),
+            getattr(obj, self.id_field),
+        )
+
+    def _build_page(self, rows, number, direction):
+        """Собирает Page из выбранных строк.
+
+        Лишняя строка отбрасывается со стороны направления движения,
+        num_pages выставляется так, чтобы методы Page.has_next и
+        Page.has_previous работали без подсчета общего количества.
+        """
+        has_more = len(rows) > self.per_page
+        if direction == NEXT:
+            rows = rows[:self.per_page]
+            has_next = has_more
+        else:
+            rows = rows[-self.per_page:]
+            has_next = True
+
+        self.num_pages = number + 1 if has_next else number
+        page = Page(rows, number, self)
+        page.next_cursor = page.previous_cursor = None
+        if rows and has_next:
+            page.next_cursor = self.cursor_for(rows[-1], number + 1, NEXT)
+        if rows and number > 1:
+            page.previous_cursor = self.cursor_for(
+                rows[0], number - 1, PREVIOUS
+            )
+        return page
@@ -0,0 +1,313 @@
+import math
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Comment, Post
+from .paginators import NEXT, CursorPaginator
+
+# индекс создается миграцией 0020_search_index: на SQLite — таблица
+# FTS5 с rowid = id поста, на PostgreSQL — таблица с tsvector и GIN
+TABLE = 'posts_search'
+
+# веса текста поста и текста комментариев в ранжировании
+TEXT_WEIGHT = 4.0
+COMMENTS_WEIGHT = 1.0
+
+# конфигурация полнотекстового поиска PostgreSQL
+POSTGRES_CONFIG = 'russian'
+
+# границы подсветки в сниппете: управляющие символы не встречаются в
+# тексте, поэтому текст можно экранировать, не задев разметку
+MARK_START, MARK_END = '\x02', '\x03'
+SNIPPET_WORDS = 16
+
+MAX_TERMS = 10
+MIN_RELEVANCE = 1e-9
+
+
+def terms(query):
+    """Слова запроса в нижнем регистре, не больше MAX_TERMS."""
+    return re.findall(r'\w+', query.lower())[:MAX_TERMS]
+
+
+def _comments(post_id):
+    """Тексты комментариев поста одной строкой."""
+    return '\n'.join(
+        Comment.objects.filter(post_id=post_id).order_by('pk')
+        .values_list('text', flat=True)
+    )
+
+
+def index(post, comments=None):
+    """Добавляет пост в индекс или обновляет его запись."""
+    if comments is None:
+        comments = _comments(post.pk)
+    pub_ts = post.pub_date.timestamp()
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post.pk])
+            cursor.execute(
+                f'INSERT INTO {TABLE} (rowid, text, comments, pub_ts) '
+                'VALUES (%s, %s, %s, %s)',
+                [post.pk, post.text, comments, pub_ts],
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.execute(
+                f'INSERT INTO {TABLE} '
+                '(post_id, text, comments, pub_ts, document) '
+                'VALUES (%s, %s, %s, %s, '
+                "setweight(to_tsvector(%s, %s), 'A') || "
+                "setweight(to_tsvector(%s, %s), 'B')) "
+                'ON CONFLICT (post_id) DO UPDATE SET '
+                'text = EXCLUDED.text, comments = EXCLUDED.comments, '
+                'pub_ts = EXCLUDED.pub_ts, document = EXCLUDED.document',
+                [
+                    post.pk, post.text, comments, pub_ts,
+                    POSTGRES_CONFIG, post.text, POSTGRES_CONFIG, comments,
+                ],
+            )
+
+
+def add_comment(post_id, text):
+    """Дописывает текст нового комментария в запись поста в индексе.
+
+    Новый комментарий — последний по id, поэтому тексты идут в том же
+    порядке, что и в _comments, а прежние комментарии не перечитываются.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(
+                f'UPDATE {TABLE} SET comments = CASE comments '
+                "WHEN '' THEN %s ELSE comments || char(10) || %s END "
+                'WHERE rowid = %s',
+                [text, text, post_id],
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.execute(
+                f'UPDATE {TABLE} SET comments = CASE comments '
+                "WHEN '' THEN %s ELSE comments || chr(10) || %s END, "
+                "document = document || setweight(to_tsvector(%s, %s), 'B') "
+                'WHERE post_id = %s',
+                [text, text, POSTGRES_CONFIG, text, post_id],
+            )
+
+
+def _indexed(post_id):
+    """Есть ли запись поста в индексе."""
+    column = 'rowid' if connection.vendor == 'sqlite' else 'post_id'
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT 1 FROM {TABLE} WHERE {column} = %s', [post_id]
+        )
+        return cursor.fetchone() is not None
+
+
+def reindex_comments(post_id):
+    """Обновляет запись поста после правки или удаления комментария.
+
+    Комментарии поста собираются заново, поэтому вызывается только для
+    редких правок и удалений. Поста, удаленного из индекса, — например,
+    удаляемого вместе с комментариями, — это не касается.
+    """
+    if connection.vendor not in ('sqlite', 'postgresql'):
+        return
+    if not _indexed(post_id):
+        return
+    post = Post.objects.only('text', 'pub_date').filter(pk=post_id).first()
+    if post is not None:
+        index(post)
+
+
+def remove(post_id):
+    """Удаляет пост из индекса."""
+    if connection.vendor not in ('sqlite', 'postgresql'):
+        return
+    column = 'rowid' if connection.vendor == 'sqlite' else 'post_id'
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE {column} = %s', [post_id])
+
+
+def rebuild(batch_size=500):
+    """Строит индекс заново по всем постам и возвращает их число."""
+    with connection.cursor() as cursor:
+        if connection.vendor in ('sqlite', 'postgresql'):
+            cursor.execute(f'DELETE FROM {TABLE}')
+    comments = {}
+    for post_id, text in Comment.objects.order_by('pk').values_list(
+        'post_id', 'text'
+    ).iterator(chunk_size=batch_size):
+        comments.setdefault(post_id, []).append(text)
+    count = 0
+    posts = Post.objects.only('text', 'pub_date').order_by('pk')
+    for post in posts.iterator(chunk_size=batch_size):
+        index(post, '\n'.join(comments.get(post.pk, ())))
+        count += 1
+    return count
+
+
+def _score_sql(relevance, greatest):
+    """SQL-выражение score() для выражения релевантности relevance.
+
+    LN есть и в PostgreSQL, и в SQLite, где его регистрирует Django;
+    greatest — функция максимума двух значений в диалекте СУБД.
+    """
+    return (
+        f'LN({greatest}({relevance}, {MIN_RELEVANCE!r})) / LN(2) '
+        f'+ pub_ts / {float(settings.SEARCH_HALF_LIFE)!r}'
+    )
+
+
+def candidates(words):
+    """Лучшие совпадения: список (id, релевантность, pub_ts).
+
+    Оценка score() считается в запросе по всем совпадениям, и
+    выбирается не больше SEARCH_CANDIDATES лучших из них: дальше
+    результаты поиска не листаются, но ни одно совпадение не
+    пропускается из-за своего возраста.
+    """
+    limit = settings.SEARCH_CANDIDATES
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            relevance = f'-bm25({TABLE}, %s, %s)'
+            cursor.execute(
+                f'SELECT rowid, {relevance}, pub_ts FROM {TABLE} '
+                f'WHERE {TABLE} MATCH %s '
+                f'ORDER BY {_score_sql(relevance, "MAX")} DESC, rowid DESC '
+                'LIMIT %s',
+                [
+                    TEXT_WEIGHT, COMMENTS_WEIGHT,
+                    ' '.join(f'"{word}"' for word in words),
+                    TEXT_WEIGHT, COMMENTS_WEIGHT, limit,
+                ],
+            )
+            return cursor.fetchall()
+        if connection.vendor == 'postgresql':
+            relevance = 'ts_rank_cd(document, query)'
+            cursor.execute(
+                f'SELECT post_id, {relevance}, pub_ts '
+                f'FROM {TABLE}, plainto_tsquery(%s, %s) query '
+                'WHERE document @@ query '
+                f'ORDER BY {_score_sql(relevance, "GREATEST")} DESC, '
+                'post_id DESC LIMIT %s',
+                [POSTGRES_CONFIG, ' '.join(words), limit],
+            )
+            return cursor.fetchall()
+    # прочие СУБД: поиск подстроки без ранжирования
+    posts = Post.objects.all()
+    for word in words:
+        posts = posts.filter(text__icontains=word)
+    return [
+        (pk, 1.0, pub_date.timestamp())
+        for pk, pub_date in posts.order_by('-pk').values_list(
+            'pk', 'pub_date'
+        )[:limit]
+    ]
+
+
+def _snippets(words, ids):
+    """Возвращает {id поста: фрагмент текста с совпадениями}."""
+    with connection.cursor() as cursor:
+        placeholders = ', '.join(['%s'] * len(ids))
+        if connection.vendor == 'sqlite':
+            cursor.execute(
+                f'SELECT rowid, snippet({TABLE}, -1, %s, %s, %s, %s) '
+                f'FROM {TABLE} WHERE {TABLE} MATCH %s '
+                f'AND rowid IN ({placeholders})',
+                [
+                    MARK_START, MARK_END, '…', SNIPPET_WORDS,
+                    ' '.join(f'"{word}"' for word in words), *ids,
+                ],
+            )
+            return dict(cursor.fetchall())
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT post_id, ts_headline('
+                "%s, text || ' ' || comments, plainto_tsquery(%s, %s), %s) "
+                f'FROM {TABLE} WHERE post_id IN ({placeholders})',
+                [
+                    POSTGRES_CONFIG, POSTGRES_CONFIG, ' '.join(words),
+                    f'StartSel={MARK_START}, StopSel={MARK_END}, '
+                    f'MaxWords={SNIPPET_WORDS}, MinWords=5',
+                    *ids,
+                ],
+            )
+            return dict(cursor.fetchall())
+    return {}
+
+
+def highlight(snippet):
+    """Экранирует фрагмент и выделяет совпадения тегом <mark>."""
+    return mark_safe(
+        escape(snippet)
+        .replace(MARK_START, '<mark>')
+        .replace(MARK_END, '</mark>')
+    )
+
+
+def score(relevance, pub_ts):
+    """Итоговая оценка совпадения с учетом свежести поста.
+
+    Релевантность уменьшается вдвое за каждые SEARCH_HALF_LIFE секунд
+    возраста поста. Оценка считается в логарифмах и от текущего
+    времени не зависит, поэтому порядок результатов стабилен между
+    запросами страниц.
+    """
+    return (
+        math.log2(max(relevance, MIN_RELEVANCE))
+        + pub_ts / settings.SEARCH_HALF_LIFE
+    )
+
+
+class SearchPaginator(CursorPaginator):
+    """Паджинатор результатов поиска.
+
+    Результаты упорядочены по убыванию пары (оценка, id поста), и
+    курсоры строятся по ней так же, как в лентах по (pub_date, id),
+    поэтому страницы поиска выглядят и листаются как ленты.
+    """
+
+    date_field = 'search_score'
+    parse_date = staticmethod(float)
+
+    def __init__(self, query, per_page):
+        """Находит и ранжирует совпадения для запроса query."""
+        self.words = terms(query)
+        hits = candidates(self.words) if self.words else []
+        super().__init__(
+            sorted(
+                ((score(relevance, pub_ts), pk)
+                 for pk, relevance, pub_ts in hits),
+                reverse=True,
+            ),
+            per_page,
+        )
+
+    def fetch(self, date, pk, direction):
+        """Выбирает посты страницы и сниппеты к ним."""
+        if direction == NEXT:
+            keys = [
+                key for key in self.object_list
+                if date is None or key < (date, pk)
+            ][:self.per_page + 1]
+        else:
+            keys = [
+                key for key in self.object_list if key > (date, pk)
+            ][-self.per_page - 1:]
+        if not keys:
+            return []
+        ids = [pk for _, pk in keys]
+        posts = Post.objects.for_feed().in_bulk(ids)
+        snippets = _snippets(self.words, ids)
+        result = []
+        for key_score, post_id in keys:
+            post = posts.get(post_id)
+            if post is None:
+                continue
+            post.search_score = key_score
+            post.snippet = highlight(snippets.get(post_id, ''))
+            result.append(post)
+        return result
@@ -0,0 +1,170 @@
+from django.db.models import F
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save,
+)
+from django.dispatch import receiver
+
+from . import blobs, caching, counters, feed, search
+from .models import Comment, Follow, Group, Post, User, UserCounter
+
+# поля автора, которые выводятся в карточках его постов
+AUTHOR_FIELDS = ('username', 'first_name', 'last_name')
+
+
+@receiver(post_save, sender=User)
+def user_created(sender, instance, created, **kwargs):
+    """Заводит счетчики новому пользователю."""
+    if created:
+        UserCounter.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=User)
+def author_name_changing(sender, instance, update_fields=None, **kwargs):
+    """Запоминает прежнее имя пользователя, если оно может измениться."""
+    instance._old_name = None
+    if instance._state.adding or (
+        update_fields is not None
+        and not set(update_fields) & set(AUTHOR_FIELDS)
+    ):
+        return
+    instance._old_name = User.objects.filter(
+        pk=instance.pk
+    ).values_list(*AUTHOR_FIELDS).first()
+
+
+@receiver(post_save, sender=User)
+def author_renamed(sender, instance, **kwargs):
+    """Делает устаревшими карточки и ленты с постами переименованного."""
+    old = getattr(instance, '_old_name', None)
+    new = tuple(getattr(instance, field) for field in AUTHOR_FIELDS)
+    if old is not None and old != new:
+        Post.objects.filter(author=instance).update(version=F('version') + 1)
+        caching.bump_feed_version()
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, **kwargs):
+    """Учитывает новый пост в счетчиках и лентах подписчиков."""
+    if created:
+        counters.change_user(instance.author_id, posts_count=1)
+        feed.fan_out_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    """Уменьшает счетчик постов автора."""
+    counters.change_user(instance.author_id, posts_count=-1)
+
+
+@receiver(post_save, sender=Post)
+def post_indexed(sender, instance, created, **kwargs):
+    """Обновляет запись поста в индексе поиска."""
+    search.index(instance, '' if created else None)
+
+
+@receiver(pre_delete, sender=Post)
+def post_unindexed(sender, instance, **kwargs):
+    """Удаляет пост из индекса поиска.
+
+    Это делается до удаления его комментариев, чтобы они не
+    переиндексировали пост по одному; удаление идет в той же
+    транзакции, поэтому при ошибке запись в индексе остается.
+    """
+    search.remove(instance.pk)
+
+
+@receiver(pre_save, sender=Post)
+def post_image_changing(sender, instance, **kwargs):
+    """Запоминает прежний файл картинки и загружается ли новый.
+
+    Ссылку на загружаемый файл учитывает DeduplicatingStorage при
+    сохранении, см. blobs.claim.
+    """
+    instance._image_uploaded = bool(instance.image) and not (
+        instance.image._committed
+    )
+    instance._old_image = ''
+    if not instance._state.adding:
+        instance._old_image = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('image', flat=True).first() or ''
+
+
+@receiver(post_save, sender=Post)
+def post_image_saved(sender, instance, **kwargs):
+    """Переносит ссылку со старого файла картинки на новый."""
+    old, new = getattr(instance, '_old_image', ''), instance.image.name or ''
+    uploaded = getattr(instance, '_image_uploaded', False)
+    if new and new != old and not uploaded:
+        blobs.retain(new)
+    if old and (old != new or uploaded):
+        blobs.release(old, instance.image.storage)
+
+
+@receiver(post_delete, sender=Post)
+def post_image_deleted(sender, instance, **kwargs):
+    """Снимает ссылку удаленного поста на файл картинки."""
+    if instance.image:
+        blobs.release(instance.image.name, instance.image.storage)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    """Учитывает новый или правленый комментарий в счетчике и версии."""
+    counters.change_comments(instance.post_id, 1 if created else 0)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    """Уменьшает счетчик комментариев поста и меняет его версию."""
+    counters.change_comments(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_indexed(sender, instance, created, **kwargs):
+    """Добавляет новый или правленый комментарий в индекс поиска."""
+    if created:
+        search.add_comment(instance.post_id, instance.text)
+    else:
+        search.reindex_comments(instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_unindexed(sender, instance, **kwargs):
+    """Убирает удаленный комментарий из индекса поиска."""
+    search.reindex_comments(instance.post_id)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    """Учитывает подписку в счетчиках и дозаполняет ленту."""
+    if created:
+        counters.change_user(instance.author_id, followers_count=1)
+        counters.change_user(instance.user_id, following_count=1)
+        feed.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    """Учитывает отписку в счетчиках и ленте подписчика и автора."""
+    counters.change_user(instance.author_id, followers_count=-1)
+    counters.change_user(instance.user_id, following_count=-1)
+    feed.prune(instance.user_id, instance.author_id)
+    feed.backfill_unpopular(instance.author_id)
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def group_changed(sender, instance, created=False, **kwargs):
+    """Делает устаревшими карточки постов измененной или удаляемой группы."""
+    if not created:
+        Post.objects.filter(group=instance).update(version=F('version') + 1)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def feed_changed(sender, **kwargs):
+    """Сбрасывает закэшированные страницы лент."""
+    caching.bump_feed_version()
@@ -0,0 +1,66 @@
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class DeduplicatingStorage(FileSystemStorage):
+    """Хранилище, в котором одинаковые файлы хранятся один раз.
+
+    Файл сохраняется под именем из SHA-256 своего содержимого:
+    posts/3f/3fa1...c9.jpg. Хеш считается по кускам одновременно с
+    записью во временный файл, который затем либо переименовывается
+    в итоговое имя, либо удаляется, если такой файл уже есть. Поэтому
+    одинаковые картинки разных постов — это один файл и одни на всех
+    миниатюры. Сколько постов ссылается на файл, учитывает ImageBlob.
+    """
+
+    def save(self, name, content, max_length=None):
+        """Сохраняет файл под именем из хеша и возвращает это имя.
+
+        Ссылку на файл сразу учитывает blobs.claim(); временная копия
+        удаляется при любом исходе, если не стала итоговым файлом.
+        """
+        # blobs импортирует модели, а модели — это хранилище
+        from . import blobs
+
+        folder = posixpath.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        directory = self.path(folder)
+        os.makedirs(directory, exist_ok=True)
+
+        tmp = tempfile.NamedTemporaryFile(dir=directory, delete=False)
+        try:
+            digest = hashlib.sha256()
+            with tmp:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    tmp.write(chunk)
+            digest = digest.hexdigest()
+
+            blob = posixpath.join(folder, digest[:2], digest + extension)
+            if max_length is not None and len(blob) > max_length:
+                raise SuspiciousFileOperation(
+                    f'Имя {blob} длиннее {max_length} символов'
+                )
+            target = self.path(blob)
+            blobs.claim(blob, lambda: self._place(tmp.name, target))
+        finally:
+            if os.path.exists(tmp.name):
+                os.unlink(tmp.name)
+        return blob
+
+    def _place(self, source, target):
+        """Переносит файл source в target, если target еще нет."""
+        if os.path.exists(target):
+            return
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(source, target)
+        os.chmod(target, self.file_permissions_mode or 0o644)
@@ -0,0 +1,373 @@
+import datetime
+import math
+import random
+from io import BytesIO
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.db.models import Count, Max, Min
+from faker.providers.lorem.ru_RU import Provider as Lorem
+from PIL import Image, ImageDraw
+
+from . import counters, feed, search, thumbnails
+from .models import Comment, Follow, Group, ImageBlob, Post, User
+from .transfer import keep_pub_date
+
+# даты постов отсчитываются назад от фиксированного момента, чтобы
+# данные зависели только от seed
+END = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+
+# доли постов автора: в своей группе, в случайной, без группы
+HOME_GROUP, OTHER_GROUP = 0.7, 0.1
+
+# комментарии приходят всплеском после публикации поста
+BURST_SECONDS = 2 * 60 * 60
+LATE_COMMENTS = 0.1
+
+
+def zipf_weights(count, exponent):
+    """Накопленные веса закона Ципфа для рангов 0..count-1."""
+    return list(accumulate(1 / (rank + 1) ** exponent
+                           for rank in range(count)))
+
+
+class Generator:
+    """Генератор правдоподобно перекошенных данных.
+
+    Пользователи упорядочены по активности: первый пишет больше всех
+    и на него подписано больше всех, как у реальных «звезд».
+    - Подписчики распределены по закону Ципфа с показателем zipf.
+    - Частота постов — распределение Парето (тяжелый хвост):
+      большинство пишет редко, несколько авторов — постоянно.
+    - У автора есть «своя» группа, размеры групп тоже по Ципфу.
+    - Картинки берутся из небольшого набора по Ципфу — одни и те же
+      мемы у многих постов.
+    - Комментарии концентрируются на «вирусных» постах и приходят
+      всплеском в первые часы после публикации.
+    - Тексты — слова словаря с частотами по Ципфу.
+    Все случайные величины берутся из random.Random(seed).
+    """
+
+    def __init__(self, seed=0, zipf=1.1, pareto=1.5, days=365,
+                 batch_size=2000, prefix='synthetic'):
+        """Параметры распределений и вставки."""
+        self.rng = random.Random(seed)
+        self.zipf = zipf
+        self.pareto = pareto
+        self.days = days
+        self.batch_size = batch_size
+        self.prefix = prefix
+        self.words = Lorem.word_list
+        self.word_weights = zipf_weights(len(self.words), 1.0)
+
+    def text(self, median_words):
+        """Текст с логнормальной длиной и частотами слов по Ципфу."""
+        length = min(400, max(3, int(
+            self.rng.lognormvariate(math.log(median_words), 0.8)
+        )))
+        words = self.rng.choices(
+            self.words, cum_weights=self.word_weights, k=length
+        )
+        return ' '.join(words).capitalize() + '.'
+
+    def _bulk(self, model, objects):
+        """Пишет объекты пачками не больше batch_size.
+
+        Django 2.2 не уменьшает заданный batch_size до предела СУБД
+        (на SQLite — 999 параметров запроса), поэтому он учитывается
+        здесь.
+        """
+        fields = model._meta.concrete_fields
+        model.objects.bulk_create(objects, batch_size=min(
+            self.batch_size, connection.ops.bulk_batch_size(fields, [])
+        ))
+
+    def users(self, count):
+        """Создает пользователей и возвращает их id по рангу."""
+        password = make_password(None)
+        self._bulk(User, (
+            User(username=f'{self.prefix}_user_{i}', password=password)
+            for i in range(count)
+        ))
+        return list(User.objects.filter(
+            username__startswith=f'{self.prefix}_user_'
+        ).order_by('pk').values_list('pk', flat=True))
+
+    def groups(self, count):
+        """Создает группы и возвращает их id по рангу."""
+        self._bulk(Group, (
+            Group(
+                title=f'Группа {i}', slug=f'{self.prefix}-group-{i}',
+                description=self.text(12),
+            )
+            for i in range(count)
+        ))
+        return list(Group.objects.filter(
+            slug__startswith=f'{self.prefix}-group-'
+        ).order_by('pk').values_list('pk', flat=True))
+
+    def follows(self, users, count, reader_follows):
+        """Создает подписки с числом подписчиков по закону Ципфа.
+
+        Первый пользователь («читатель» в замерах) дополнительно
+        подписан на reader_follows следующих за ним авторов.
+        """
+        weights = zipf_weights(len(users), self.zipf)
+        pairs = {(0, author) for author in range(1, reader_follows + 1)}
+        attempts = 0
+        while len(pairs) < count and attempts < count * 20:
+            attempts += 1
+            user = self.rng.randrange(len(users))
+            author = self.rng.choices(range(len(users)),
+                                      cum_weights=weights)[0]
+            if user != author:
+                pairs.add((user, author))
+        self._bulk(Follow, (
+            Follow(user_id=users[user], author_id=users[author])
+            for user, author in sorted(pairs)
+        ))
+        return len(pairs)
+
+    def images(self, count):
+        """Создает count разных картинок и возвращает их имена."""
+        storage = Post._meta.get_field('image').storage
+        names = []
+        for number in range(count):
+            image = Image.new('RGB', (640, 480), tuple(
+                self.rng.randrange(256) for _ in range(3)
+            ))
+            draw = ImageDraw.Draw(image)
+            for _ in range(8):
+                x, y = self.rng.randrange(640), self.rng.randrange(480)
+                draw.ellipse(
+                    (x, y, x + self.rng.randrange(20, 200),
+                     y + self.rng.randrange(20, 200)),
+                    fill=tuple(self.rng.randrange(256) for _ in range(3)),
+                )
+            buffer = BytesIO()
+            image.save(buffer, 'JPEG', quality=85)
+            names.append(storage.save(
+                f'posts/{self.prefix}_{number}.jpg',
+                ContentFile(buffer.getvalue()),
+            ))
+        return names
+
+    def posts(self, users, groups, count, image_share, images):
+        """Создает посты в порядке дат и возвращает (первый, последний) id.
+
+        Интервалы между постами экспоненциальные, поэтому даты идут по
+        возрастанию без сортировки и id растут вместе с датой.
+        """
+        activity = sorted(
+            (self.rng.paretovariate(self.pareto) for _ in users),
+            reverse=True,
+        )
+        activity = list(accumulate(activity))
+        group_weights = zipf_weights(len(groups), self.zipf)
+        home = [
+            self.rng.choices(groups, cum_weights=group_weights)[0]
+            for _ in users
+        ] if groups else []
+        image_weights = zipf_weights(len(images), self.zipf)
+        span = self.days * 24 * 60 * 60
+        gap = span / max(count, 1)
+        moment = END - datetime.timedelta(seconds=span)
+
+        def build():
+            nonlocal moment
+            for _ in range(count):
+                moment += datetime.timedelta(
+                    seconds=self.rng.expovariate(1 / gap)
+                )
+                author = self.rng.choices(
+                    range(len(users)), cum_weights=activity
+                )[0]
+                group = None
+                if groups:
+                    chance = self.rng.random()
+                    if chance < HOME_GROUP:
+                        group = home[author]
+                    elif chance < HOME_GROUP + OTHER_GROUP:
+                        group = self.rng.choice(groups)
+                image = ''
+                if images and self.rng.random() < image_share:
+                    image = self.rng.choices(
+                        images, cum_weights=image_weights
+                    )[0]
+                yield Post(
+                    author_id=users[author], group_id=group,
+                    text=self.text(25), pub_date=moment, image=image,
+                )
+
+        self._bulk(Post, build())
+        bounds = Post.objects.filter(author_id__in=users).aggregate(
+            first=Min('pk'), last=Max('pk')
+        )
+        return bounds['first'], bounds['last']
+
+    def comments(self, users, first, last, count):
+        """Создает комментарии, сосредоточенные на вирусных постах.
+
+        Ранг поста по популярности выбирается по закону Ципфа, а в id
+        он переводится перестановкой rank * step mod n, которая не
+        требует хранить список постов.
+        """
+        total = last - first + 1
+        step = 7919
+        while math.gcd(step, total) != 1:
+            step += 2
+        span_end = END.timestamp()
+        created = 0
+        while created < count:
+            size = min(self.batch_size, count - created)
+            targets = [
+                first + self._zipf_rank(total) * step % total
+                for _ in range(size)
+            ]
+            dates = dict(Post.objects.filter(pk__in=set(targets))
+                         .values_list('pk', 'pub_date'))
+            objects = []
+            for post_id in targets:
+                posted = dates.get(post_id)
+                if posted is None:
+                    continue
+                if self.rng.random() < LATE_COMMENTS:
+                    delay = self.rng.uniform(
+                        0, max(0.0, span_end - posted.timestamp())
+                    )
+                else:
+                    delay = self.rng.expovariate(1 / BURST_SECONDS)
+                objects.append(Comment(
+                    post_id=post_id,
+                    author_id=self.rng.choice(users),
+                    text=self.text(8),
+                    pub_date=posted + datetime.timedelta(seconds=delay),
+                ))
+            self._bulk(Comment, objects)
+            created += size
+        return count
+
+    def _zipf_rank(self, total):
+        """Ранг 0..total-1 с вероятностью, убывающей по закону Ципфа.
+
+        Обратная функция непрерывного распределения Парето, поэтому
+        не нужна таблица весов размером с число постов.
+        """
+        exponent = max(self.zipf, 1.01)
+        while True:
+            rank = int((1 - self.rng.random()) ** (-1 / (exponent - 1))) - 1
+            if rank < total:
+                return rank
+
+
+def _attach_images(names):
+    """Учитывает ссылки на картинки и создает их миниатюры.
+
+    Миниатюры и варианты каждой картинки создаются один раз и
+    копируются во все посты с ней.
+    """
+    references = dict(
+        Post.objects.filter(image__in=names).order_by()
+        .values_list('image').annotate(total=Count('pk'))
+    )
+    for name, total in references.items():
+        ImageBlob.objects.update_or_create(
+            name=name, defaults={'references': total}
+        )
+        post_id = Post.objects.filter(image=name).values_list(
+            'pk', flat=True
+        ).first()
+        thumbnails.generate(post_id)
+        Post.objects.filter(image=name).update(
+            image_variants=Post.objects.values_list(
+                'image_variants', flat=True
+            ).get(pk=post_id)
+        )
+
+
+def generate(users=1000, groups=20, posts=20000, comments=50000,
+             follows=20000, images=20, image_share=0.1, reader_follows=50,
+             zipf=1.1, pareto=1.5, days=365, random_seed=0,
+             batch_size=2000, prefix='synthetic', index=True):
+    """Создает набор данных и возвращает его параметры.
+
+    Объекты пишутся bulk_create, поэтому сигналы не срабатывают:
+    счетчики, ленты подписок, ссылки на картинки и индекс поиска
+    достраиваются в конце отдельными проходами.
+    """
+    generator = Generator(
+        seed=random_seed, zipf=zipf, pareto=pareto, days=days,
+        batch_size=batch_size, prefix=prefix,
+    )
+    user_ids = generator.users(users)
+    group_ids = generator.groups(groups)
+    generator.follows(
+        user_ids, follows, min(reader_follows, users - 1)
+    )
+    image_names = generator.images(images if image_share else 0)
+    with keep_pub_date(Post, Comment):
+        first, last = generator.posts(
+            user_ids, group_ids, posts, image_share, image_names
+        )
+        if posts and comments:
+            generator.comments(user_ids, first, last, comments)
+
+    counters.repair_users()
+    counters.repair_posts()
+    feed.backfill_all()
+    if image_names:
+        _attach_images(image_names)
+    if index:
+        search.rebuild()
+    return {
+        'generator': 'synthetic',
+        'users': users,
+        'groups': groups,
+        'posts': posts,
+        'comments': comments,
+        'follows': follows,
+        'images': images,
+        'image_share': image_share,
+        'zipf': zipf,
+        'pareto': pareto,
+        'seed': random_seed,
+    }
+
+
+def _top_share(values, fraction=0.01):
+    """Доля суммы, приходящаяся на fraction наибольших значений."""
+    values = sorted(values, reverse=True)
+    total = sum(values)
+    if not total:
+        return 0.0
+    return sum(values[:max(1, int(len(values) * fraction))]) / total
+
+
+def skew(prefix='synthetic'):
+    """Показатели перекоса данных с префиксом prefix.
+
+    Доли подписчиков, постов и комментариев у верхнего 1% и
+    наибольшие значения — для сравнения с боевой БД.
+    """
+    users = User.objects.filter(username__startswith=f'{prefix}_user_')
+    followers = list(users.annotate(total=Count('following')).values_list(
+        'total', flat=True
+    ))
+    posts = list(users.annotate(total=Count('posts')).values_list(
+        'total', flat=True
+    ))
+    comments = list(
+        Post.objects.filter(author__in=users).annotate(
+            total=Count('comments')
+        ).values_list('total', flat=True)
+    )
+    return {
+        'followers_top1': _top_share(followers),
+        'followers_max': max(followers, default=0),
+        'posts_top1': _top_share(posts),
+        'posts_max': max(posts, default=0),
+        'comments_top1': _top_share(comments),
+        'comments_max': max(comments, default=0),
+    }
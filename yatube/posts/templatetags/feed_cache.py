@@ -0,0 +1,57 @@
+from django import template
+from django.conf import settings
+
+from core import routers
+from posts import caching
+
+register = template.Library()
+
+
+class FeedCacheNode(template.Node):
+    """Фрагмент ленты, кэшируемый до изменения ее содержимого."""
+
+    def __init__(self, nodelist, name, vary_on):
+        """Запоминает содержимое блока, имя фрагмента и его параметры."""
+        self.nodelist = nodelist
+        self.name = name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        """Отдает фрагмент из кэша или рендерит его один раз."""
+        key = caching.fragment_key(
+            self.name.resolve(context),
+            [value.resolve(context) for value in self.vary_on],
+        )
+        return caching.get_or_set_single_flight(
+            key,
+            lambda: self.nodelist.render(context),
+            routers.cache_timeout(settings.FEED_CACHE_TIMEOUT),
+        )
+
+
+@register.tag('feed_cache')
+def do_feed_cache(parser, token):
+    """Кэширует фрагмент ленты с учетом версии содержимого.
+
+    Использование::
+
+        {% feed_cache 'main_page' request.GET.cursor %}
+            ...
+        {% endfeed_cache %}
+
+    В отличие от {% cache %} фрагмент живет долго и сбрасывается сразу
+    при изменении постов или групп, а пересчет после сброса выполняет
+    только один запрос.
+    """
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' требует имя фрагмента"
+        )
+    nodelist = parser.parse(('endfeed_cache',))
+    parser.delete_first_token()
+    return FeedCacheNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        [parser.compile_filter(bit) for bit in bits[2:]],
+    )
@@ -0,0 +1,39 @@
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+register = template.Library()
+
+CARD_TEMPLATE = 'posts/includes/post_card.html'
+
+
+def card_key(post):
+    """Ключ кэша карточки: id поста и его версия."""
+    return f'post_card:{post.pk}:{post.version}'
+
+
+@register.simple_tag
+def post_cards(posts):
+    """Возвращает пары (пост, html карточки) для страницы ленты.
+
+    Карточки всей страницы читаются из кэша одним get_many, рендерятся
+    только отсутствующие, и они же сохраняются одним set_many.
+    Правка поста увеличивает его версию, и старая карточка больше
+    не запрашивается.
+    """
+    posts = list(posts)
+    cached = cache.get_many([card_key(post) for post in posts])
+    card_template = get_template(CARD_TEMPLATE)
+    cards, rendered = [], {}
+    for post in posts:
+        key = card_key(post)
+        if key not in cached:
+            cached[key] = rendered[key] = card_template.render(
+                {'post': post}
+            )
+        cards.append((post, mark_safe(cached[key])))
+    if rendered:
+        cache.set_many(rendered, settings.POST_CARD_CACHE_TIMEOUT)
+    return cards
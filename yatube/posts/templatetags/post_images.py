@@ -0,0 +1,35 @@
+from django import template
+from django.conf import settings
+
+register = template.Library()
+
+
+def _srcset(storage, items):
+    """Значение атрибута srcset для вариантов одного формата."""
+    return ', '.join(
+        f'{storage.url(name)} {width}w' for width, name, _ in items
+    )
+
+
+@register.inclusion_tag('posts/includes/picture.html')
+def post_picture(post):
+    """Тег <picture> с вариантами картинки поста.
+
+    Для каждого современного формата выводится <source> со всеми
+    ширинами, а JPEG — в самом <img>, поэтому браузер сам выбирает
+    формат и самый маленький файл, подходящий по ширине экрана.
+    """
+    storage = post.image.storage
+    *modern, (_, fallback) = post.variants['formats']
+    width, height = settings.POST_IMAGE_SIZE
+    return {
+        'sources': [
+            {'type': mime, 'srcset': _srcset(storage, items)}
+            for mime, items in modern
+        ],
+        'src': storage.url(fallback[-1][1]),
+        'srcset': _srcset(storage, fallback),
+        'sizes': f'(max-width: {width}px) 100vw, {width}px',
+        'width': width,
+        'height': height,
+    }
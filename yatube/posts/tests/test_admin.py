@@ -0,0 +1,115 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.admin import EstimatedCountPaginator
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class LargeTableAdminTest(TestCase):
+    """Тест списков постов, комментариев и подписок в админке."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Посты, комментарии и подписки нескольких авторов."""
+        cls.superuser = User.objects.create_superuser(
+            username='test_admin', email='admin@test.com', password='pass'
+        )
+        cls.authors = [
+            User.objects.create_user(username=f'test_admin_author_{i}')
+            for i in range(3)
+        ]
+        cls.group = Group.objects.create(
+            title='test_admin_group', slug='test_admin_group'
+        )
+        for author in cls.authors:
+            post = Post.objects.create(
+                author=author, group=cls.group, text=f'пост {author}'
+            )
+            Comment.objects.create(
+                post=post, author=author, text=f'комментарий {author}'
+            )
+            Follow.objects.create(user=cls.superuser, author=author)
+        cls.needle = Post.objects.create(
+            author=cls.authors[0], text='уникальное слово'
+        )
+
+    def setUp(self):
+        """Авторизованный суперпользователь."""
+        self.client = Client()
+        self.client.force_login(self.superuser)
+
+    def changelist(self, model, **params):
+        """Ответ страницы списка объектов модели."""
+        response = self.client.get(
+            reverse(f'admin:posts_{model}_changelist'), params
+        )
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_changelists_open(self):
+        """Списки открываются с фильтрами автодополнения."""
+        for model in ('post', 'comment', 'follow'):
+            with self.subTest(model=model):
+                response = self.changelist(model)
+                self.assertContains(response, 'admin-autocomplete')
+                self.assertNotContains(response, 'test_admin_author_2</a>')
+
+    def test_queries_do_not_depend_on_rows(self):
+        """Число запросов не растет с числом строк и пользователей."""
+        with CaptureQueriesContext(connection) as before:
+            self.changelist('post')
+        author = User.objects.create_user(username='test_admin_extra')
+        Post.objects.create(author=author, group=self.group, text='еще')
+        with CaptureQueriesContext(connection) as after:
+            self.changelist('post')
+        self.assertEqual(len(after), len(before))
+
+    def test_filter_by_author(self):
+        """Фильтр автодополнения отбирает посты автора."""
+        author = self.authors[1]
+        response = self.changelist('post', author__id__exact=author.pk)
+        self.assertEqual(
+            list(response.context['cl'].result_list),
+            list(Post.objects.filter(author=author)),
+        )
+
+    def test_search_uses_index(self):
+        """Поиск по постам и комментариям идет через индекс."""
+        response = self.changelist('post', q='уникальное')
+        self.assertEqual(list(response.context['cl'].result_list),
+                         [self.needle])
+        response = self.changelist('comment', q='комментарий')
+        self.assertEqual(response.context['cl'].result_count, 3)
+
+    @override_settings(SEARCH_CANDIDATES=1)
+    def test_search_beyond_index_limit(self):
+        """При многих совпадениях поиск не обрезается пределом индекса."""
+        response = self.changelist('post', q='пост')
+        self.assertEqual(response.context['cl'].result_count, 3)
+        self.assertContains(response, 'больше 1,')
+        response = self.changelist('comment', q='комментарий')
+        self.assertEqual(response.context['cl'].result_count, 3)
+
+    @override_settings(ADMIN_COUNT_LIMIT=2)
+    def test_estimated_count(self):
+        """Строки считаются до предела, дальше число оценивается."""
+        posts = Post.objects.order_by('pk')
+        self.assertEqual(
+            EstimatedCountPaginator(posts, 10).count,
+            posts.last().pk,
+        )
+        self.assertEqual(
+            EstimatedCountPaginator(
+                posts.filter(group=self.group), 10
+            ).count,
+            2,
+        )
+        self.assertEqual(
+            EstimatedCountPaginator(posts.filter(pk=self.needle.pk), 10).count,
+            1,
+        )
@@ -0,0 +1,81 @@
+from django.conf import settings
+from django.test import TestCase
+
+from .. import benchmark
+
+
+class BenchmarkTest(TestCase):
+    """Регрессия числа SQL-запросов относительно эталона замеров.
+
+    Время и память зависят от машины и сравниваются только командой
+    `manage.py benchmark`, а число запросов на заполненной странице от
+    объема данных не зависит и проверяется на небольшом наборе.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        """Небольшой набор данных, заполняющий все страницы лент."""
+        benchmark.seed(
+            authors=5, groups=2, posts=100, comments=40, follows=8
+        )
+
+    def test_all_named_urls_measured(self):
+        """Замеряются все именованные URL posts и about."""
+        results = benchmark.run(repeat=1, depth=2)
+        for module in benchmark.URL_MODULES:
+            for pattern in module.urlpatterns:
+                name = f'{module.app_name}:{pattern.name}'
+                with self.subTest(name=name):
+                    self.assertIn(name, results)
+                    self.assertLess(results[name]['status'], 400)
+
+    def test_all_named_urls_in_baseline(self):
+        """У каждого замеряемого URL есть эталон, иначе он не сравнивается."""
+        baseline = benchmark.load_baseline(settings.BENCHMARK_BASELINE)
+        for name in benchmark.run(repeat=1, depth=2):
+            with self.subTest(name=name):
+                self.assertIn(name, baseline)
+
+    def test_query_count_regression(self):
+        """Число запросов не превышает эталонное."""
+        results = benchmark.run(repeat=1, depth=2)
+        regressions = benchmark.compare(
+            results,
+            benchmark.load_baseline(settings.BENCHMARK_BASELINE),
+            metrics=('queries',),
+        )
+        self.assertEqual(regressions, [])
+
+    def test_peak_compared_in_same_environment(self):
+        """Пик памяти сравнивается только в окружении эталона."""
+        self.assertIn(
+            'peak_kb', benchmark.comparable(benchmark.environment())
+        )
+        other = {**benchmark.environment(), 'python': '2.7.18'}
+        for environment in (other, None):
+            with self.subTest(environment=environment):
+                metrics = benchmark.comparable(environment)
+                self.assertNotIn('peak_kb', metrics)
+                self.assertIn('queries', metrics)
+
+    def test_compare_thresholds(self):
+        """Сравнение учитывает порог времени и допуск по запросам."""
+        baseline = {'page': {'queries': 3, 'p50_ms': 10.0}}
+        results = {'page': {'queries': 4, 'p50_ms': 14.0}}
+        metrics = ('queries', 'p50_ms')
+        self.assertEqual(
+            len(benchmark.compare(results, baseline, metrics=metrics)), 1
+        )
+        self.assertEqual(
+            benchmark.compare(
+                results, baseline, query_slack=1, metrics=metrics
+            ),
+            [],
+        )
+        self.assertEqual(
+            len(benchmark.compare(
+                results, baseline, threshold=1.2, query_slack=1,
+                metrics=metrics,
+            )),
+            1,
+        )
@@ -0,0 +1,134 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(PAGE_SHARED_MAX_AGE=60)
+class ConditionalGetTest(TestCase):
+    """Проверка ответов 304 Not Modified и заголовков Cache-Control."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Автор, читатель, группа и пост."""
+        cls.author = User.objects.create_user(username='test_etag_author')
+        cls.reader = User.objects.create_user(username='test_etag_reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='test_etag_group', description=''
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост для ETag'
+        )
+        cls.urls = {
+            'index': reverse('posts:main_page'),
+            'group': reverse('posts:group_post', args=[cls.group.slug]),
+            'profile': reverse('posts:profile', args=[cls.author.username]),
+            'post_detail': reverse('posts:post_detail', args=[cls.post.pk]),
+        }
+
+    def setUp(self):
+        """Чистый кэш и клиент читателя."""
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def revalidate(self, client, url):
+        """Повторный запрос с ETag первого ответа."""
+        etag = client.get(url)['ETag']
+        return client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_not_modified(self):
+        """Неизменившаяся страница отвечает 304 без тела."""
+        for name, url in self.urls.items():
+            for client in (self.client, self.reader_client):
+                with self.subTest(name=name, client=client):
+                    response = self.revalidate(client, url)
+                    self.assertEqual(response.status_code, 304)
+                    self.assertEqual(response.content, b'')
+
+    def test_not_modified_is_cheap(self):
+        """Ответ 304 не выполняет запросов ленты и не рендерит шаблон."""
+        etag = self.client.get(self.urls['index'])['ETag']
+        with self.assertNumQueries(0), self.assertTemplateNotUsed(
+            'posts/index.html'
+        ):
+            self.client.get(self.urls['index'], HTTP_IF_NONE_MATCH=etag)
+        etag = self.client.get(self.urls['post_detail'])['ETag']
+        with self.assertNumQueries(1):
+            self.client.get(
+                self.urls['post_detail'], HTTP_IF_NONE_MATCH=etag
+            )
+
+    def test_changes_modify_etag(self):
+        """Новый пост, комментарий и подписка меняют ETag страниц."""
+        etags = {
+            name: self.reader_client.get(url)['ETag']
+            for name, url in self.urls.items()
+        }
+        Post.objects.create(
+            author=self.author, group=self.group, text='Новый пост'
+        )
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+        for name, url in self.urls.items():
+            with self.subTest(name=name):
+                response = self.reader_client.get(
+                    url, HTTP_IF_NONE_MATCH=etags[name]
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_comment_changes_modify_etag(self):
+        """Замена и правка комментария меняют ETag страницы поста."""
+        url = self.urls['post_detail']
+        comment = Comment.objects.create(
+            post=self.post, author=self.reader, text='Первый'
+        )
+        etag = self.reader_client.get(url)['ETag']
+        comment.delete()
+        comment = Comment.objects.create(
+            post=self.post, author=self.reader, text='Второй'
+        )
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Второй')
+        etag = response['ETag']
+        comment.text = 'Исправленный'
+        comment.save()
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Исправленный')
+
+    def test_etag_depends_on_user_and_cursor(self):
+        """У анонима, читателя и другой страницы ленты разные ETag."""
+        url = self.urls['index']
+        self.assertNotEqual(
+            self.client.get(url)['ETag'], self.reader_client.get(url)['ETag']
+        )
+        self.assertNotEqual(
+            self.client.get(url)['ETag'],
+            self.client.get(url, {'cursor': 'x'})['ETag'],
+        )
+
+    def test_cache_control(self):
+        """Анонимные страницы кэшируются прокси, личные — нет."""
+        response = self.client.get(self.urls['index'])
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('s-maxage=60', response['Cache-Control'])
+        response = self.reader_client.get(self.urls['index'])
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('no-cache', response['Cache-Control'])
+
+    def test_missing_objects(self):
+        """Для несуществующих поста и автора ответ 404."""
+        for url in (
+            reverse('posts:post_detail', args=[self.post.pk + 100]),
+            reverse('posts:profile', args=['nobody']),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
@@ -0,0 +1,101 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Post, UserCounter
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    """Тест денормализованных счетчиков."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Создание пользователей."""
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_count_author')
+        cls.reader = User.objects.create_user(username='test_count_reader')
+
+    def counter(self, user):
+        """Свежие значения счетчиков пользователя из БД."""
+        return UserCounter.objects.get(user=user)
+
+    def test_post_counter(self):
+        """Счетчик постов меняется при создании и удалении поста."""
+        post = Post.objects.create(author=self.author, text='test_post')
+        self.assertEqual(self.counter(self.author).posts_count, 1)
+        post.delete()
+        self.assertEqual(self.counter(self.author).posts_count, 0)
+
+    def test_comment_counter(self):
+        """Счетчик комментариев меняется вместе с комментариями."""
+        post = Post.objects.create(author=self.author, text='test_post')
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='test_comment'
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+    def test_follow_counters(self):
+        """Счетчики подписчиков и подписок меняются при подписке."""
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.counter(self.author).followers_count, 1)
+        self.assertEqual(self.counter(self.reader).following_count, 1)
+        follow.delete()
+        self.assertEqual(self.counter(self.author).followers_count, 0)
+        self.assertEqual(self.counter(self.reader).following_count, 0)
+
+    def test_drifted_counters_stay_non_negative(self):
+        """Уменьшение нулевого счетчика оставляет его нулем."""
+        post = Post.objects.create(author=self.author, text='test_post')
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='test_comment'
+        )
+        UserCounter.objects.filter(user=self.author).update(posts_count=0)
+        Post.objects.filter(pk=post.pk).update(comments_count=0)
+        comment.delete()
+        post.delete()
+        self.assertEqual(self.counter(self.author).posts_count, 0)
+        Post.objects.create(author=self.author, text='test_post')
+        self.assertEqual(self.counter(self.author).posts_count, 1)
+
+    def test_recount_command_repairs_drift(self):
+        """recount_counters исправляет рассинхронизированные счетчики."""
+        post = Post.objects.create(author=self.author, text='test_post')
+        Comment.objects.create(post=post, author=self.reader, text='test')
+        UserCounter.objects.filter(user=self.author).update(posts_count=42)
+        UserCounter.objects.filter(user=self.reader).delete()
+        Post.objects.filter(pk=post.pk).update(comments_count=0)
+
+        call_command('recount_counters', stdout=StringIO())
+
+        post.refresh_from_db()
+        self.assertEqual(self.counter(self.author).posts_count, 1)
+        self.assertEqual(self.counter(self.reader).posts_count, 0)
+        self.assertEqual(post.comments_count, 1)
+
+    def test_pages_without_aggregates(self):
+        """Профиль и пост выводят счетчики без COUNT-запросов."""
+        post = Post.objects.create(author=self.author, text='test_post')
+        Follow.objects.create(user=self.reader, author=self.author)
+        client = Client()
+        urls = [
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', args=[post.pk]),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = client.get(url)
+                self.assertEqual(response.context['counter'].posts_count, 1)
+                for query in queries.captured_queries:
+                    self.assertNotIn('COUNT(', query['sql'].upper())
@@ -0,0 +1,131 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import feed
+from ..models import FeedEntry, Follow, Group, Post
+
+User = get_user_model()
+
+
+class FollowFeedTest(TestCase):
+    """Тест материализованной ленты подписок."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Создание пользователей и постов."""
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_feed_author')
+        cls.reader = User.objects.create_user(username='test_feed_reader')
+        cls.group = Group.objects.create(
+            title='test_feed_group',
+            slug='test_feed_slug',
+            description='test_feed_description',
+        )
+        for i in range(3):
+            Post.objects.create(
+                author=cls.author,
+                text=f'test_feed_post_{i}',
+                group=cls.group,
+            )
+
+    def setUp(self):
+        """Авторизованный читатель."""
+        self.authorized_reader = Client()
+        self.authorized_reader.force_login(self.reader)
+
+    def follow(self):
+        """Подписка читателя на автора через view-функцию."""
+        self.authorized_reader.get(reverse(
+            'posts:profile_follow',
+            kwargs={'username': self.author.username},
+        ))
+
+    def test_follow_backfills_feed(self):
+        """Подписка дозаполняет ленту постами автора."""
+        self.follow()
+        self.assertEqual(
+            FeedEntry.objects.filter(user=self.reader).count(), 3
+        )
+
+    def test_new_post_fans_out(self):
+        """Новый пост раздается по лентам подписчиков."""
+        self.follow()
+        post = Post.objects.create(author=self.author, text='test_new')
+        entry = FeedEntry.objects.get(user=self.reader, post=post)
+        self.assertEqual(entry.pub_date, post.pub_date)
+
+    def test_unfollow_prunes_feed(self):
+        """Отписка убирает посты автора из ленты."""
+        self.follow()
+        self.authorized_reader.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': self.author.username},
+        ))
+        self.assertFalse(FeedEntry.objects.filter(user=self.reader).exists())
+
+    @override_settings(FEED_FANOUT_LIMIT=0)
+    def test_popular_author_read_path(self):
+        """Посты популярного автора подмешиваются в ленту при чтении."""
+        self.follow()
+        Post.objects.create(author=self.author, text='test_popular')
+        self.assertFalse(FeedEntry.objects.filter(user=self.reader).exists())
+
+        response = self.authorized_reader.get(reverse('posts:follow_index'))
+        self.assertEqual(len(response.context['page_obj']), 4)
+
+    def test_popular_author_merge_without_duplicates(self):
+        """Посты из ленты и из fan-out-on-read не дублируются."""
+        self.follow()
+        with override_settings(FEED_FANOUT_LIMIT=0):
+            Post.objects.create(author=self.author, text='test_popular')
+            response = self.authorized_reader.get(
+                reverse('posts:follow_index')
+            )
+        pks = [post.pk for post in response.context['page_obj']]
+        self.assertEqual(len(pks), 4)
+        self.assertEqual(len(pks), len(set(pks)))
+
+    def test_follow_index_queries_do_not_grow(self):
+        """Число запросов ленты не зависит от числа постов на странице."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        url = reverse('posts:follow_index')
+        with CaptureQueriesContext(connection) as few_posts:
+            self.authorized_reader.get(url)
+        for i in range(5):
+            Post.objects.create(author=self.author, text=f'test_more_{i}')
+        with CaptureQueriesContext(connection) as more_posts:
+            response = self.authorized_reader.get(url)
+        self.assertEqual(len(response.context['page_obj']), 8)
+        self.assertEqual(len(few_posts), len(more_posts))
+
+    def test_backfill_all_quotes_tables(self):
+        """Массовое дозаполнение ленты обращается к таблицам в кавычках."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        FeedEntry.objects.all().delete()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(feed.backfill_all(), 3)
+        self.assertIn(
+            connection.ops.quote_name(Follow._meta.db_table),
+            queries[0]['sql'],
+        )
+        self.assertEqual(
+            FeedEntry.objects.filter(user=self.reader).count(), 3
+        )
+
+    @override_settings(FEED_FANOUT_LIMIT=1)
+    def test_author_no_longer_popular(self):
+        """Посты, написанные автором в популярности, остаются в ленте."""
+        other = User.objects.create_user(username='test_feed_other')
+        self.follow()
+        Follow.objects.create(user=other, author=self.author)
+        post = Post.objects.create(author=self.author, text='test_popular')
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+        Follow.objects.filter(user=other).delete()
+        self.assertTrue(
+            FeedEntry.objects.filter(user=self.reader, post=post).exists()
+        )
+        response = self.authorized_reader.get(reverse('posts:follow_index'))
+        self.assertIn(post, response.context['page_obj'])
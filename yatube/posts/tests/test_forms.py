@@ -1,12 +1,16 @@
+import hashlib
 import shutil
 import tempfile
+from io import BytesIO
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
+from .. import uploads
 from ..models import Comment, Group, Post
 
 User = get_user_model()
@@ -126,6 +130,9 @@ class PostsFormsTest(TestCase):
             content_type='image/gif'
         )
 
+        # картинка хранится под именем из хеша содержимого
+        digest = hashlib.sha256(small_gif2).hexdigest()
+
         form_data_edit = {
             'text': 'test_text_3',
             'author': self.author,
@@ -148,7 +155,7 @@ class PostsFormsTest(TestCase):
                 group=form_data_edit['group'],
                 text=form_data_edit['text'],
                 pk=self.post.pk,
-                image=f'posts/{uploaded2.name}'
+                image=f'posts/{digest[:2]}/{digest}.gif'
             ).exists()
         )
 
@@ -243,3 +250,93 @@ class PostsFormsTest(TestCase):
                 self.guest_client.post(url, form_data)
         # проверяем, что комментарий не добавился в БД
         self.assertEqual(Comment.objects.count(), comment_count)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageUploadTest(TestCase):
+    """Тест проверки и нормализации загружаемых картинок."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Создание автора."""
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_upload_user')
+
+    @classmethod
+    def tearDownClass(cls):
+        """Удаление временных медиафайлов."""
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        """Авторизованный автор."""
+        self.authorized_author = Client()
+        self.authorized_author.force_login(self.author)
+
+    def upload(self, size=(50, 40), image_format='JPEG', exif=None):
+        """Картинка, сохраненная Pillow в заданном формате."""
+        buffer = BytesIO()
+        options = {'exif': exif} if exif else {}
+        Image.new('RGB', size, 'red').save(buffer, image_format, **options)
+        return SimpleUploadedFile(
+            f'upload.{image_format.lower()}', buffer.getvalue()
+        )
+
+    def create(self, image):
+        """Создает пост через форму и возвращает ответ."""
+        return self.authorized_author.post(
+            reverse('posts:post_create'),
+            data={'text': 'test_upload', 'image': image},
+        )
+
+    def saved_image(self):
+        """Картинка созданного поста, открытая Pillow."""
+        post = Post.objects.get(text='test_upload')
+        return Image.open(post.image.path)
+
+    @override_settings(POST_IMAGE_MAX_BYTES=1024)
+    def test_too_large_file_rejected_while_streaming(self):
+        """Файл больше лимита отклоняется с понятной ошибкой."""
+        response = self.create(
+            self.upload(size=(400, 400), image_format='BMP')
+        )
+        self.assertFormError(
+            response, 'form', 'image', uploads.too_large_message()
+        )
+        self.assertFalse(Post.objects.filter(text='test_upload').exists())
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=100)
+    def test_too_many_pixels_rejected(self):
+        """Картинка с огромным разрешением отклоняется."""
+        response = self.create(self.upload())
+        self.assertFormError(
+            response, 'form', 'image', 'Слишком большое разрешение картинки.'
+        )
+
+    @override_settings(POST_IMAGE_MAX_SIDE=20)
+    def test_large_image_downscaled(self):
+        """Картинка больше лимита уменьшается с сохранением пропорций."""
+        self.create(self.upload(size=(50, 40)))
+        self.assertEqual(self.saved_image().size, (20, 16))
+
+    def test_exif_stripped_and_applied(self):
+        """Поворот из EXIF применяется, сами EXIF-данные удаляются."""
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Orientation: повернуть на 90°
+        exif[0x010F] = 'test_camera'
+        self.create(self.upload(size=(50, 40), exif=exif.tobytes()))
+        image = self.saved_image()
+        self.assertEqual(image.size, (40, 50))
+        self.assertFalse(image.getexif())
+
+    def test_clean_image_kept_as_is(self):
+        """Небольшая картинка без EXIF сохраняется без изменений."""
+        upload = self.upload(image_format='PNG')
+        content = upload.read()
+        upload.seek(0)
+        self.create(upload)
+        post = Post.objects.get(text='test_upload')
+        digest = hashlib.sha256(content).hexdigest()
+        self.assertEqual(post.image.name, f'posts/{digest[:2]}/{digest}.png')
+        with post.image.open('rb') as file:
+            self.assertEqual(file.read(), content)
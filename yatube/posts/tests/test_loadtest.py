@@ -0,0 +1,100 @@
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase
+from yatube.wsgi import application
+
+from .. import loadtest, synthetic
+from ..models import Comment, Follow, Post
+
+SIZES = {
+    'users': 20, 'groups': 2, 'posts': 200, 'comments': 100,
+    'follows': 50, 'image_share': 0, 'index': False,
+}
+
+
+class LoadTestTest(TestCase):
+    """Тест нагрузочного теста через WSGI-приложение."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Небольшой набор данных и аккаунты виртуальных пользователей."""
+        synthetic.generate(**SIZES)
+        cls.targets = loadtest.prepare(1)
+
+    def setUp(self):
+        """Чистый кэш перед каждым тестом."""
+        cache.clear()
+
+    def run_mix(self, mix, requests=40):
+        """Выполняет смесь сценариев и возвращает сводку."""
+        samples, elapsed = loadtest.run(
+            loadtest.WSGITransport(loadtest.instrument(application)),
+            self.targets, mix=mix, requests=requests, depth=2,
+        )
+        return loadtest.summarize(samples, elapsed)
+
+    def test_all_scenarios(self):
+        """Все сценарии смеси выполняются без ошибок."""
+        report = self.run_mix(loadtest.MIX, requests=200)
+        for endpoint in (
+            'index', 'index_deep', 'profile', 'post_detail', 'login_form',
+            'login', 'post_create_form', 'post_create', 'comment_form',
+            'comment', 'follow', 'follow_index', 'unfollow',
+        ):
+            with self.subTest(endpoint=endpoint):
+                self.assertIn(endpoint, report)
+                self.assertEqual(report[endpoint]['errors'], 0)
+        self.assertGreaterEqual(report['total']['requests'], 200)
+        self.assertGreater(report['total']['rps'], 0)
+
+    def test_writes_reach_database(self):
+        """Вход, публикация, комментарии и подписки идут под аккаунтом."""
+        posts = Post.objects.count()
+        follows = Follow.objects.count()
+        comments = Comment.objects.count()
+        report = self.run_mix(loadtest.WRITE_MIX)
+        self.assertEqual(report['total']['errors'], 0)
+        self.assertEqual(
+            Post.objects.count() - posts, report['post_create']['requests']
+        )
+        self.assertEqual(
+            Comment.objects.count() - comments, report['comment']['requests']
+        )
+        # отписка следует за подпиской, новых подписок не остается
+        self.assertLessEqual(Follow.objects.count(), follows)
+
+    def test_queries_and_cache_hits(self):
+        """Стоимость запроса берется из заголовков приложения."""
+        report = self.run_mix({'browse': 1}, requests=5)
+        self.assertGreater(report['index']['queries'], 0)
+        self.assertGreater(report['index']['cache_hit_rate'], 0)
+        self.assertEqual(
+            sum(report['index']['histogram'].values()),
+            report['index']['requests'],
+        )
+
+    def test_parse_mix(self):
+        """Смесь читается из строки, неизвестный сценарий — ошибка."""
+        self.assertEqual(
+            loadtest.parse_mix('browse=3,login=1'),
+            {'browse': 3.0, 'login': 1.0},
+        )
+        with self.assertRaises(ValueError):
+            loadtest.parse_mix('unknown=1')
+
+
+class HTTPLoadTestTest(TransactionTestCase):
+    """Тест нагрузочного теста через локальный HTTP-сервер."""
+
+    def test_http_transport(self):
+        """Запросы через сервер проходят и несут стоимость запроса."""
+        synthetic.generate(**SIZES)
+        targets = loadtest.prepare(1)
+        app = loadtest.instrument(application)
+        with loadtest.serve(app) as address:
+            samples, elapsed = loadtest.run(
+                loadtest.HTTPTransport(*address), targets,
+                mix={'browse': 1, 'login': 1}, requests=10,
+            )
+        report = loadtest.summarize(samples, elapsed)
+        self.assertEqual(report['total']['errors'], 0)
+        self.assertGreater(report['index']['queries'], 0)
@@ -0,0 +1,222 @@
+import os
+import sqlite3
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings,
+)
+from django.urls import reverse
+
+from core import routers
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(PAGE_CACHE_ENABLED=True)
+class PageCacheTest(TestCase):
+    """Проверка кэша страниц целиком и частей для пользователя."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Автор, читатель, группа и пост."""
+        cls.author = User.objects.create_user(username='test_page_author')
+        cls.reader = User.objects.create_user(username='test_page_reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='test_page_group', description=''
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост для кэша'
+        )
+        cls.urls = {
+            'index': reverse('posts:main_page'),
+            'group': reverse('posts:group_post', args=[cls.group.slug]),
+            'profile': reverse('posts:profile', args=[cls.author.username]),
+            'post_detail': reverse('posts:post_detail', args=[cls.post.pk]),
+        }
+
+    def setUp(self):
+        """Чистый кэш и клиенты автора и читателя."""
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_anonymous_page_from_cache(self):
+        """Повторная анонимная страница отдается без БД и шаблонов."""
+        for name, url in self.urls.items():
+            with self.subTest(name=name):
+                first = self.client.get(url)
+                with self.assertTemplateNotUsed('base.html'):
+                    second = self.client.get(url)
+                self.assertEqual(second.status_code, 200)
+                self.assertEqual(second.content, first.content)
+                self.assertEqual(second['ETag'], first['ETag'])
+        with self.assertNumQueries(0):
+            self.client.get(self.urls['index'])
+
+    def test_anonymous_not_modified(self):
+        """Страница из кэша отвечает 304 на тот же ETag."""
+        etag = self.client.get(self.urls['index'])['ETag']
+        response = self.client.get(
+            self.urls['index'], HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_new_post_invalidates(self):
+        """Новый пост виден сразу на закэшированных страницах."""
+        for url in self.urls.values():
+            self.client.get(url)
+        Post.objects.create(
+            author=self.author, group=self.group, text='Совсем новый пост'
+        )
+        for name in ('index', 'group', 'profile'):
+            with self.subTest(name=name):
+                response = self.client.get(self.urls[name])
+                self.assertContains(response, 'Совсем новый пост')
+
+    def test_comment_replaced_and_edited(self):
+        """Удаленный и правленый комментарий не остается в кэше."""
+        url = self.urls['post_detail']
+        comment = Comment.objects.create(
+            post=self.post, author=self.reader, text='Старый комментарий'
+        )
+        for client in (self.client, self.reader_client):
+            client.get(url)
+        comment.delete()
+        comment = Comment.objects.create(
+            post=self.post, author=self.reader, text='Новый комментарий'
+        )
+        for client in (self.client, self.reader_client):
+            with self.subTest(client=client):
+                response = client.get(url)
+                self.assertNotContains(response, 'Старый комментарий')
+                self.assertContains(response, 'Новый комментарий')
+        comment.text = 'Правленый комментарий'
+        comment.save()
+        for client in (self.client, self.reader_client):
+            with self.subTest(client=client):
+                self.assertContains(client.get(url), 'Правленый')
+
+    def test_same_as_without_cache(self):
+        """Страницы из оболочки совпадают с обычными."""
+        for name in ('index', 'group', 'profile'):
+            for client in (self.client, self.reader_client):
+                with self.subTest(name=name, client=client):
+                    url = self.urls[name]
+                    client.get(url)
+                    cached = client.get(url).content
+                    with self.settings(PAGE_CACHE_ENABLED=False):
+                        self.assertEqual(client.get(url).content, cached)
+
+    def test_shell_shared_by_users(self):
+        """Оболочка рендерится один раз, шапка — для каждого."""
+        url = self.urls['index']
+        self.reader_client.get(url)
+        with self.assertTemplateNotUsed('posts/index.html'):
+            response = self.author_client.get(url)
+        self.assertContains(response, self.author.username)
+        self.assertNotContains(response, self.reader.username)
+        self.assertContains(response, reverse('posts:follow_index'))
+        self.assertNotContains(
+            self.client.get(url), reverse('posts:follow_index')
+        )
+
+    def test_follow_button(self):
+        """Кнопка подписки зависит от пользователя и подписки."""
+        url = self.urls['profile']
+        follow = reverse('posts:profile_follow', args=[self.author.username])
+        unfollow = reverse(
+            'posts:profile_unfollow', args=[self.author.username]
+        )
+        self.assertContains(self.reader_client.get(url), follow)
+        self.assertNotContains(self.author_client.get(url), follow)
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = self.reader_client.get(url)
+        self.assertContains(response, unfollow)
+        self.assertNotContains(response, follow)
+
+    def test_post_detail_holes(self):
+        """Ссылка правки только у автора, форма — у вошедших."""
+        url = self.urls['post_detail']
+        edit = reverse('posts:post_edit', args=[self.post.pk])
+        comment = reverse('posts:add_comment', args=[self.post.pk])
+        self.client.get(url)
+        response = self.author_client.get(url)
+        self.assertContains(response, edit)
+        self.assertContains(response, comment)
+        response = self.reader_client.get(url)
+        self.assertNotContains(response, edit)
+        self.assertContains(response, comment)
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        response = self.client.get(url)
+        self.assertNotContains(response, edit)
+        self.assertNotContains(response, comment)
+
+    def test_markers_in_text_are_escaped(self):
+        """Метка части в тексте поста не заполняется."""
+        post = Post.objects.create(
+            author=self.author, text='<!--hole:header:-->'
+        )
+        url = reverse('posts:post_detail', args=[post.pk])
+        self.reader_client.get(url)
+        response = self.reader_client.get(url)
+        self.assertContains(response, '&lt;!--hole:header:--&gt;')
+        self.assertContains(response, 'Пользователь:', count=1)
+
+
+@override_settings(
+    PAGE_CACHE_ENABLED=True, DATABASE_REPLICAS=['lagging_replica'],
+    REPLICA_PIN_COOKIE='primary_pin',
+)
+class ReplicaPageCacheTest(TransactionTestCase):
+    """Кэш страниц при чтении с отстающей реплики.
+
+    Реплика копирует только сохраненные данные, поэтому тест идет без
+    общей транзакции TestCase.
+    """
+
+    def setUp(self):
+        """Пост и реплика — файл SQLite с копией основной БД."""
+        cache.clear()
+        self.author = User.objects.create_user(
+            username='test_replica_author'
+        )
+        Post.objects.create(author=self.author, text='Первый пост')
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, 'replica.sqlite3')
+        connections.databases['lagging_replica'] = {
+            **connections.databases[DEFAULT_DB_ALIAS], 'NAME': path,
+        }
+        self.addCleanup(os.rmdir, directory)
+        self.addCleanup(os.remove, path)
+        self.addCleanup(connections.databases.pop, 'lagging_replica')
+        self.addCleanup(connections['lagging_replica'].close)
+        self.path = path
+        self.sync()
+        self.pinned_client = Client()
+        self.pinned_client.cookies['primary_pin'] = '1'
+
+    def sync(self):
+        """Копирует основную БД в реплику, как sync_replicas."""
+        replica = sqlite3.connect(self.path)
+        try:
+            connections[DEFAULT_DB_ALIAS].connection.backup(replica)
+        finally:
+            replica.close()
+        routers.replicas_synced()
+
+    def test_stale_replica_page_not_kept(self):
+        """Страница с реплики до обновления не остается в кэше."""
+        url = reverse('posts:main_page')
+        self.assertContains(self.client.get(url), 'Первый пост')
+        Post.objects.create(author=self.author, text='Второй пост')
+        self.assertNotContains(self.client.get(url), 'Второй пост')
+        self.assertContains(self.pinned_client.get(url), 'Второй пост')
+        self.sync()
+        self.assertContains(self.client.get(url), 'Второй пост')
+        self.assertContains(self.pinned_client.get(url), 'Второй пост')
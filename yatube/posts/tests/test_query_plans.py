@@ -0,0 +1,105 @@
+import re
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# полный просмотр таблицы: «SCAN <таблица>» без «USING ... INDEX»
+FULL_SCAN = re.compile(r'\bSCAN (?!CONSTANT ROW)\S+(?!.*\bUSING\b)')
+TEMP_SORT = 'USE TEMP B-TREE'
+
+
+@skipUnless(connection.vendor == 'sqlite', 'планы запросов SQLite')
+class QueryPlansTest(TestCase):
+    """Проверка планов запросов view-функций приложения posts.
+
+    Каждая страница запрашивается через тестовый клиент, для всех
+    выполненных SELECT строится EXPLAIN QUERY PLAN. Тест падает, если
+    какой-либо запрос читает таблицу целиком или сортирует выборку
+    во временном B-дереве, т.е. не попадает в индекс.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """Тестовые данные на несколько страниц каждой ленты."""
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_plan_author')
+        cls.reader = User.objects.create_user(username='test_plan_reader')
+        cls.group = Group.objects.create(
+            title='test_plan_group',
+            slug='test_plan_slug',
+            description='test_plan_description',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for i in range(12):
+            cls.post = Post.objects.create(
+                author=cls.author,
+                text=f'test_plan_post_{i}',
+                group=cls.group,
+            )
+            Comment.objects.create(
+                post=cls.post, author=cls.reader, text=f'comment_{i}'
+            )
+
+    def setUp(self):
+        """Авторизованный читатель."""
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def explain(self, sql):
+        """Возвращает строки плана выполнения запроса."""
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assert_indexed(self, url, params=None):
+        """Проверяет планы всех SELECT, выполненных при запросе url."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        for query in queries.captured_queries:
+            sql = query['sql']
+            if not sql.upper().startswith('SELECT'):
+                continue
+            for step in self.explain(sql):
+                with self.subTest(url=url, sql=sql, step=step):
+                    self.assertIsNone(FULL_SCAN.search(step))
+                    self.assertNotIn(TEMP_SORT, step)
+        return response
+
+    def test_feed_plans(self):
+        """Первая и следующая страницы лент идут по индексам."""
+        urls = [
+            reverse('posts:main_page'),
+            reverse('posts:group_post', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:follow_index'),
+        ]
+        for url in urls:
+            response = self.assert_indexed(url)
+            page_obj = response.context['page_obj']
+            response = self.assert_indexed(
+                url, {'cursor': page_obj.next_cursor}
+            )
+            self.assert_indexed(
+                url, {'cursor': response.context['page_obj'].previous_cursor}
+            )
+
+    def test_post_detail_plans(self):
+        """Пост и страницы его комментариев идут по индексам."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=self.reader, text=f'extra_{i}')
+            for i in range(12)
+        )
+        response = self.assert_indexed(url)
+        self.assert_indexed(
+            url, {'cursor': response.context['comments'].next_cursor}
+        )
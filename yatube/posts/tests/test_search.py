@@ -0,0 +1,198 @@
+import datetime
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import Client, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import search
+from ..models import Comment, Post
+from ..views import POSTS_NUM
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    """Тест полнотекстового поиска по постам и комментариям."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Автор постов."""
+        cls.author = User.objects.create_user(username='test_search_author')
+
+    def setUp(self):
+        """Клиент без авторизации и пустой кэш карточек."""
+        self.client = Client()
+        cache.clear()
+
+    def create(self, text, days_ago=0):
+        """Пост с датой публикации days_ago дней назад."""
+        post = Post.objects.create(author=self.author, text=text)
+        if days_ago:
+            post.pub_date -= datetime.timedelta(days=days_ago)
+            post.save()
+        return post
+
+    def found(self, query, cursor=None):
+        """Посты страницы результатов поиска."""
+        data = {'q': query}
+        if cursor:
+            data['cursor'] = cursor
+        response = self.client.get(reverse('posts:search'), data)
+        self.assertEqual(response.status_code, 200)
+        return response.context['page_obj']
+
+    def test_finds_posts_and_comments(self):
+        """Находятся посты по своему тексту и по тексту комментариев."""
+        by_text = self.create('Рецепт яблочного пирога')
+        by_comment = self.create('Про выходные')
+        Comment.objects.create(
+            post=by_comment, author=self.author, text='а где пирога рецепт?'
+        )
+        self.create('Совсем другое')
+        self.assertEqual(list(self.found('рецепт пирога')),
+                         [by_text, by_comment])
+
+    def test_recent_posts_ranked_higher(self):
+        """При равной релевантности выше более свежий пост."""
+        old = self.create('новости погоды', days_ago=90)
+        new = self.create('новости погоды', days_ago=1)
+        self.assertEqual(list(self.found('погоды')), [new, old])
+
+    def test_best_matches_ranked_beyond_newest(self):
+        """Лучшее совпадение находится, даже если оно не из самых новых."""
+        best = self.create('пирог пирог пирог')
+        for number in range(3):
+            self.create(f'пирог и еще много разных слов номер {number}')
+        with self.settings(SEARCH_CANDIDATES=2):
+            self.assertEqual(list(self.found('пирог'))[0], best)
+            self.assertEqual(len(search.candidates(['пирог'])), 2)
+
+    def test_snippet_highlighted_and_escaped(self):
+        """Совпадение выделено, разметка из текста экранирована."""
+        self.create('<script>alert(1)</script> важная новость')
+        page = self.found('новость')
+        self.assertEqual(
+            page[0].snippet,
+            '&lt;script&gt;alert(1)&lt;/script&gt; '
+            'важная <mark>новость</mark>',
+        )
+
+    def test_index_follows_changes(self):
+        """Правка и удаление поста и комментария обновляют индекс."""
+        post = self.create('первая версия')
+        post.text = 'вторая версия'
+        post.save()
+        self.assertEqual(list(self.found('первая')), [])
+        self.assertEqual(list(self.found('вторая')), [post])
+        comment = Comment.objects.create(
+            post=post, author=self.author, text='отличный комментарий'
+        )
+        self.assertEqual(list(self.found('отличный')), [post])
+        comment.text = 'хороший комментарий'
+        comment.save()
+        self.assertEqual(list(self.found('отличный')), [])
+        self.assertEqual(list(self.found('хороший')), [post])
+        comment.delete()
+        self.assertEqual(list(self.found('хороший')), [])
+        post.delete()
+        self.assertEqual(list(self.found('версия')), [])
+
+    def test_comments_indexed_incrementally(self):
+        """Комментарии поста не перечитываются при новом и при удалении."""
+        post = self.create('пост с обсуждением')
+        with CaptureQueriesContext(connection) as creating:
+            for text in ('первый ответ', 'второй ответ'):
+                Comment.objects.create(
+                    post=post, author=self.author, text=text
+                )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT comments FROM {search.TABLE} WHERE rowid = %s',
+                [post.pk],
+            )
+            self.assertEqual(cursor.fetchone()[0], search._comments(post.pk))
+        with CaptureQueriesContext(connection) as deleting:
+            post.delete()
+        for query in (*creating, *deleting):
+            self.assertNotIn('ORDER BY "posts_comment"."id"', query['sql'])
+        self.assertEqual(list(self.found('ответ')), [])
+
+    def test_pagination(self):
+        """Результаты листаются курсором с сохранением запроса."""
+        posts = [self.create(f'запись номер {i}') for i in range(15)]
+        first = self.found('запись')
+        self.assertEqual(len(first), POSTS_NUM)
+        second = self.found('запись', first.next_cursor)
+        self.assertEqual(len(second), 5)
+        self.assertEqual(
+            set(first) | set(second), set(posts)
+        )
+        response = self.client.get(
+            reverse('posts:search'), {'q': 'запись'}
+        )
+        self.assertContains(response, 'q=%D0%B7%D0%B0%D0%BF%D0%B8%D1%81%D1%8C')
+        previous = self.found('запись', second.previous_cursor)
+        self.assertEqual(list(previous), list(first))
+
+    def test_query_syntax_ignored(self):
+        """Операторы FTS в запросе считаются обычными словами."""
+        post = self.create('кавычки и скобки')
+        self.assertEqual(list(self.found('"кавычки" (скобки*')), [post])
+        self.assertEqual(list(self.found('   ')), [])
+        self.assertEqual(list(self.found('NEAR(')), [])
+
+    def test_rebuild_command(self):
+        """Команда строит индекс для постов, созданных в обход сигналов."""
+        Post.objects.bulk_create([
+            Post(author=self.author, text='массовая загрузка'),
+        ])
+        self.assertEqual(list(self.found('массовая')), [])
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('Проиндексировано постов: 1', out.getvalue())
+        self.assertEqual(len(self.found('массовая')), 1)
+        self.assertEqual(search.terms('Раз, ДВА!'), ['раз', 'два'])
+
+
+class SearchIndexMigrationTest(TransactionTestCase):
+    """Тест индекса, построенного миграцией по существующим постам."""
+
+    def setUp(self):
+        """Пост, созданный до индекса; после теста — последняя схема."""
+        self.addCleanup(self.migrate, None)
+        apps = self.migrate([('posts', '0019_imageblob')])
+        author = apps.get_model('auth', 'User').objects.create(
+            username='test_migration_author'
+        )
+        self.post = apps.get_model('posts', 'Post').objects.create(
+            author=author, text='Старый пост'
+        )
+
+    def migrate(self, targets):
+        """Применяет миграции до targets или до последних."""
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets or executor.loader.graph.leaf_nodes())
+        return executor.loader.project_state(targets).apps
+
+    def pub_ts(self):
+        """Время публикации поста в индексе."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT pub_ts FROM {search.TABLE} WHERE rowid = %s',
+                [self.post.pk],
+            )
+            (pub_ts,), = cursor.fetchall()
+        return pub_ts
+
+    def test_pub_ts_of_existing_posts(self):
+        """У постов, созданных до индекса, есть время публикации."""
+        self.migrate([('posts', '0020_search_index')])
+        self.assertAlmostEqual(
+            self.pub_ts(), self.post.pub_date.timestamp(), delta=1
+        )
@@ -0,0 +1,186 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.test import TransactionTestCase, override_settings
+
+from .. import thumbnails, variants
+from ..models import ImageBlob, Post
+from ..storage import DeduplicatingStorage
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+OTHER_GIF = SMALL_GIF[:-4] + b'\x0B\x0A\x00\x3B'
+
+
+def uploaded_gif(name='small.gif', content=SMALL_GIF):
+    """Загруженная картинка."""
+    return SimpleUploadedFile(name, content, content_type='image/gif')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_THUMBNAIL_ASYNC=False)
+class DeduplicatingStorageTest(TransactionTestCase):
+    """Тест хранения одинаковых картинок одним файлом."""
+
+    @classmethod
+    def tearDownClass(cls):
+        """Удаление временных медиафайлов."""
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        """Автор постов."""
+        self.author = User.objects.create_user(username='test_blob_author')
+
+    def create(self, name='small.gif', content=SMALL_GIF):
+        """Пост с картинкой."""
+        return Post.objects.create(
+            author=self.author, text='test_blob',
+            image=uploaded_gif(name, content),
+        )
+
+    def test_name_from_content(self):
+        """Файл сохраняется под именем из хеша содержимого."""
+        storage = DeduplicatingStorage()
+        first = storage.save('posts/a.GIF', ContentFile(SMALL_GIF))
+        second = storage.save('posts/b.gif', ContentFile(SMALL_GIF))
+        digest = hashlib.sha256(SMALL_GIF).hexdigest()
+        self.assertEqual(first, f'posts/{digest[:2]}/{digest}.gif')
+        self.assertEqual(first, second)
+        self.assertTrue(storage.exists(first))
+
+    def test_duplicates_share_file(self):
+        """Одинаковые картинки разных постов — один файл с двумя ссылками."""
+        first = self.create('first.gif')
+        second = self.create('second.gif')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(
+            ImageBlob.objects.get(name=first.image.name).references, 2
+        )
+
+    def test_file_deleted_with_last_reference(self):
+        """Файл удаляется только вместе с последним постом."""
+        first, second = self.create(), self.create()
+        name, storage = first.image.name, first.image.storage
+        first.delete()
+        self.assertTrue(storage.exists(name))
+        second.delete()
+        self.assertFalse(storage.exists(name))
+        self.assertFalse(ImageBlob.objects.filter(name=name).exists())
+
+    def test_edit_moves_reference(self):
+        """Замена картинки снимает ссылку со старого файла."""
+        kept, edited = self.create(), self.create()
+        old = edited.image.name
+        edited.image = uploaded_gif('other.gif', OTHER_GIF)
+        edited.save()
+        self.assertNotEqual(edited.image.name, old)
+        self.assertEqual(ImageBlob.objects.get(name=old).references, 1)
+        self.assertEqual(
+            ImageBlob.objects.get(name=edited.image.name).references, 1
+        )
+        edited.text = 'test_blob_edited'
+        edited.save()
+        self.assertEqual(
+            ImageBlob.objects.get(name=edited.image.name).references, 1
+        )
+        edited.image = uploaded_gif('again.gif', OTHER_GIF)
+        edited.save()
+        self.assertEqual(
+            ImageBlob.objects.get(name=edited.image.name).references, 1
+        )
+        self.assertTrue(kept.image.storage.exists(old))
+
+    def test_upload_while_last_reference_released(self):
+        """Файл, повторно загруженный во время удаления, не пропадает."""
+        first = self.create()
+        save = DeduplicatingStorage.save
+
+        def save_then_delete(storage, *args, **kwargs):
+            name = save(storage, *args, **kwargs)
+            first.delete()
+            return name
+
+        with mock.patch.object(DeduplicatingStorage, 'save', save_then_delete):
+            second = self.create()
+        self.assertEqual(second.image.name, first.image.name)
+        self.assertTrue(second.image.storage.exists(second.image.name))
+        self.assertEqual(
+            ImageBlob.objects.get(name=second.image.name).references, 1
+        )
+
+    def test_temporary_file_removed_on_error(self):
+        """Временная копия удаляется и при ошибке сохранения."""
+        storage = DeduplicatingStorage()
+        with self.assertRaises(SuspiciousFileOperation):
+            storage.save('posts/a.gif', ContentFile(SMALL_GIF), max_length=5)
+        with mock.patch('posts.blobs.claim', side_effect=OSError):
+            with self.assertRaises(OSError):
+                storage.save('posts/b.gif', ContentFile(OTHER_GIF))
+        # временные копии лежат в самой папке, файлы — в подпапках
+        self.assertFalse([
+            entry for entry in os.scandir(storage.path('posts'))
+            if entry.is_file()
+        ])
+
+    def test_failed_save_releases_upload(self):
+        """Ссылка на загрузку снимается, если пост не сохранился."""
+        with self.assertRaises(IntegrityError):
+            Post.objects.create(
+                author_id=0, text='test_blob', image=uploaded_gif()
+            )
+        self.assertFalse(ImageBlob.objects.exists())
+
+    def test_repair_fixes_references(self):
+        """recount_counters исправляет ссылки и удаляет лишние файлы."""
+        post = self.create()
+        storage = post.image.storage
+        orphan = storage.save('posts/orphan.gif', ContentFile(OTHER_GIF))
+        ImageBlob.objects.filter(name=post.image.name).update(references=5)
+        call_command('recount_counters', stdout=StringIO())
+        self.assertEqual(
+            ImageBlob.objects.get(name=post.image.name).references, 1
+        )
+        self.assertFalse(ImageBlob.objects.filter(name=orphan).exists())
+        self.assertFalse(storage.exists(orphan))
+        self.assertTrue(storage.exists(post.image.name))
+        ImageBlob.objects.all().delete()
+        call_command('recount_counters', stdout=StringIO())
+        self.assertEqual(
+            ImageBlob.objects.get(name=post.image.name).references, 1
+        )
+
+    def test_thumbnails_shared(self):
+        """Для повторной загрузки варианты не создаются заново."""
+        first, second = self.create(), self.create()
+        with mock.patch.object(
+            variants, 'generate', wraps=variants.generate
+        ) as generate:
+            thumbnails.process(first.pk)
+            thumbnails.process(second.pk)
+        generate.assert_called_once()
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertTrue(second.image_variants)
+        self.assertEqual(first.image_variants, second.image_variants)
@@ -0,0 +1,121 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+
+from .. import search, synthetic
+from ..models import Comment, FeedEntry, Follow, ImageBlob, Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SIZES = {
+    'users': 100, 'groups': 5, 'posts': 1000, 'comments': 2000,
+    'follows': 800, 'images': 3, 'image_share': 0.2,
+}
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class SyntheticDataTest(TestCase):
+    """Тест генератора перекошенных данных."""
+
+    @classmethod
+    def tearDownClass(cls):
+        """Удаление временной директории для картинок."""
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def snapshot(self, prefix):
+        """Данные с префиксом prefix без id и префиксов."""
+        users = User.objects.filter(username__startswith=f'{prefix}_user_')
+        rank = {pk: i for i, pk in enumerate(
+            users.order_by('pk').values_list('pk', flat=True)
+        )}
+        posts = Post.objects.filter(author__in=users).order_by('pk')
+        first = posts.values_list('pk', flat=True).first()
+        return (
+            sorted(
+                (rank[user], rank[author])
+                for user, author in Follow.objects.filter(
+                    user__in=users
+                ).values_list('user_id', 'author_id')
+            ),
+            [
+                (rank[author], text, date, image)
+                for author, text, date, image in posts.values_list(
+                    'author_id', 'text', 'pub_date', 'image'
+                )
+            ],
+            sorted(
+                (post - first, rank[author], text, date)
+                for post, author, text, date in Comment.objects.filter(
+                    post__in=posts
+                ).values_list('post_id', 'author_id', 'text', 'pub_date')
+            ),
+        )
+
+    def test_same_seed_same_data(self):
+        """Один seed дает одинаковые данные, другой — другие."""
+        synthetic.generate(prefix='one', random_seed=1, **SIZES)
+        synthetic.generate(prefix='two', random_seed=1, **SIZES)
+        synthetic.generate(prefix='three', random_seed=2, **SIZES)
+        self.assertEqual(self.snapshot('one'), self.snapshot('two'))
+        self.assertNotEqual(self.snapshot('one'), self.snapshot('three'))
+
+    def test_sizes_and_side_effects(self):
+        """Созданы все объекты, ленты, ссылки на картинки и индекс."""
+        synthetic.generate(**SIZES)
+        self.assertEqual(User.objects.count(), SIZES['users'])
+        self.assertEqual(Post.objects.count(), SIZES['posts'])
+        self.assertEqual(Comment.objects.count(), SIZES['comments'])
+        self.assertEqual(Follow.objects.count(), SIZES['follows'])
+        reader = User.objects.order_by('pk').first()
+        self.assertTrue(FeedEntry.objects.filter(user=reader).exists())
+        self.assertEqual(
+            sum(ImageBlob.objects.values_list('references', flat=True)),
+            Post.objects.exclude(image='').count(),
+        )
+        self.assertFalse(
+            Post.objects.exclude(image='').filter(image_variants='').exists()
+        )
+        word = search.terms(Post.objects.first().text)[:1]
+        self.assertTrue(search.candidates(word))
+
+    def test_skew(self):
+        """Подписчики, посты и комментарии сосредоточены у верхушки."""
+        synthetic.generate(**SIZES)
+        skew = synthetic.skew()
+        # при равномерном распределении на верхний 1% приходится 1%
+        self.assertGreater(skew['followers_top1'], 0.05)
+        self.assertGreater(skew['posts_top1'], 0.03)
+        self.assertGreater(skew['comments_top1'], 0.2)
+        users = list(User.objects.order_by('pk'))
+        self.assertEqual(
+            skew['followers_max'],
+            Follow.objects.filter(author=users[0]).count(),
+        )
+
+    def test_comment_bursts(self):
+        """Большинство комментариев приходит в первые часы после поста."""
+        synthetic.generate(**SIZES)
+        comments = Comment.objects.values_list('pub_date', 'post__pub_date')
+        early = sum(
+            (comment - post).total_seconds() < 6 * 60 * 60
+            for comment, post in comments
+        )
+        self.assertGreater(early / len(comments), 0.7)
+        self.assertFalse(any(comment < post for comment, post in comments))
+
+    def test_command(self):
+        """Команда выводит перекос и не смешивает данные по префиксу."""
+        out = StringIO()
+        call_command(
+            'generate_data', users=20, posts=100, comments=100, follows=50,
+            image_share=0, stdout=out,
+        )
+        self.assertIn('followers_top1', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('generate_data', users=20, stdout=StringIO())
@@ -0,0 +1,245 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import (
+    Client,
+    TestCase,
+    TransactionTestCase,
+    override_settings
+)
+from django.urls import reverse
+from sorl.thumbnail import get_thumbnail
+
+from .. import thumbnails, variants
+from ..models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def uploaded_gif(name='small.gif'):
+    """Загруженная картинка для формы или модели."""
+    return SimpleUploadedFile(name, SMALL_GIF, content_type='image/gif')
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    POST_THUMBNAIL_ASYNC=False,
+    POST_THUMBNAIL_RETRY_DELAY=0,
+)
+class ThumbnailsTest(TestCase):
+    """Тест фонового создания миниатюр."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Создание автора."""
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_thumb_author')
+
+    @classmethod
+    def tearDownClass(cls):
+        """Удаление временных медиафайлов."""
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        """Авторизованный автор."""
+        self.authorized_author = Client()
+        self.authorized_author.force_login(self.author)
+        cache.clear()
+
+    def test_create_generates_thumbnails(self):
+        """После создания поста миниатюры готовы, версия увеличена."""
+        self.authorized_author.post(
+            reverse('posts:post_create'),
+            data={'text': 'test_thumb', 'image': uploaded_gif()},
+        )
+        post = Post.objects.get(text='test_thumb')
+        self.assertEqual(post.thumbnail_status, Post.THUMBNAIL_READY)
+        self.assertEqual(post.version, 2)
+        for geometry, options in settings.POST_THUMBNAILS:
+            self.assertTrue(
+                get_thumbnail(post.image, geometry, **options).exists()
+            )
+
+    def test_edit_without_new_image_skips_generation(self):
+        """Правка текста не ставит задачу в очередь."""
+        post = Post.objects.create(
+            author=self.author, text='test_thumb', image=uploaded_gif()
+        )
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            self.authorized_author.post(
+                reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+                data={'text': 'test_thumb_edited'},
+            )
+        schedule.assert_not_called()
+
+    def test_failed_generation_is_retried(self):
+        """Ошибка повторяется POST_THUMBNAIL_RETRIES раз, затем failed."""
+        post = Post.objects.create(author=self.author, text='test_thumb')
+        with mock.patch.object(
+            thumbnails, 'generate', side_effect=OSError
+        ) as generate:
+            thumbnails.process(post.pk)
+        self.assertEqual(
+            generate.call_count, settings.POST_THUMBNAIL_RETRIES + 1
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.thumbnail_status, Post.THUMBNAIL_FAILED)
+
+    def test_placeholder_until_ready(self):
+        """Пока миниатюры создаются, в ленте выводится заглушка."""
+        post = Post.objects.create(
+            author=self.author,
+            text='test_thumb',
+            image=uploaded_gif(),
+            thumbnail_status=Post.THUMBNAIL_PENDING,
+        )
+        url = reverse('posts:main_page')
+        self.assertContains(
+            self.authorized_author.get(url), 'Картинка обрабатывается'
+        )
+        thumbnails.process(post.pk)
+        self.assertNotContains(
+            self.authorized_author.get(url), 'Картинка обрабатывается'
+        )
+
+    def test_command_processes_pending(self):
+        """generate_thumbnails обрабатывает оставшиеся в очереди посты."""
+        post = Post.objects.create(
+            author=self.author,
+            text='test_thumb',
+            image=uploaded_gif(),
+            thumbnail_status=Post.THUMBNAIL_PENDING,
+        )
+        call_command('generate_thumbnails', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.thumbnail_status, Post.THUMBNAIL_READY)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_THUMBNAIL_ASYNC=False)
+class ImageVariantsTest(TestCase):
+    """Тест адаптивных вариантов картинки."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Создание автора."""
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_variant_user')
+
+    @classmethod
+    def tearDownClass(cls):
+        """Удаление временных медиафайлов."""
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        """Авторизованный автор."""
+        self.authorized_author = Client()
+        self.authorized_author.force_login(self.author)
+        cache.clear()
+
+    def create_post(self):
+        """Пост с картинкой, созданный через форму."""
+        self.authorized_author.post(
+            reverse('posts:post_create'),
+            data={'text': 'test_variant', 'image': uploaded_gif()},
+        )
+        return Post.objects.get(text='test_variant')
+
+    def test_variants_for_every_width(self):
+        """Для каждой ширины создается файл в хранилище."""
+        post = self.create_post()
+        *_, (mime, items) = post.variants['formats']
+        self.assertEqual(mime, 'image/jpeg')
+        self.assertEqual(
+            [width for width, _, _ in items],
+            sorted(settings.POST_IMAGE_WIDTHS),
+        )
+        for _, name, size in items:
+            self.assertEqual(post.image.storage.size(name), size)
+
+    def test_picture_with_modern_sources(self):
+        """Лента выводит <picture> с source для современных форматов."""
+        modern = (('PNG', 'image/png', 'png'),)
+        with mock.patch.object(variants, 'MODERN_FORMATS', modern):
+            self.create_post()
+        response = self.authorized_author.get(reverse('posts:main_page'))
+        self.assertContains(response, '<picture>')
+        self.assertContains(response, '<source type="image/png"')
+        for width in settings.POST_IMAGE_WIDTHS:
+            self.assertContains(response, f'_{width}w.jpg {width}w')
+
+    def test_new_image_resets_variants(self):
+        """Удаление картинки при правке сбрасывает варианты."""
+        post = self.create_post()
+        self.authorized_author.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            data={'text': 'test_variant', 'image-clear': 'on'},
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.image_variants, '')
+
+    def test_savings(self):
+        """Экономия считается против JPEG полной ширины."""
+        manifest = {'original': 5000, 'formats': [
+            ['image/webp', [[320, 'a', 100], [960, 'b', 600]]],
+            ['image/jpeg', [[320, 'c', 200], [960, 'd', 1000]]],
+        ]}
+        self.assertEqual(
+            variants.savings([manifest]),
+            {'before': 2000, 'after': 700, 'ratio': 0.65},
+        )
+
+    def test_savings_command(self):
+        """image_savings выводит отчет по всем постам."""
+        self.create_post()
+        out = StringIO()
+        call_command('image_savings', stdout=out)
+        self.assertIn('Картинок: 1', out.getvalue())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_THUMBNAIL_ASYNC=True)
+class ThumbnailPoolTest(TransactionTestCase):
+    """Тест пула фоновых воркеров."""
+
+    @classmethod
+    def tearDownClass(cls):
+        """Удаление временных медиафайлов."""
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def tearDown(self):
+        """Остановка пула."""
+        thumbnails.drain()
+
+    def test_pool_generates_after_commit(self):
+        """Задача выполняется в пуле после фиксации транзакции."""
+        author = User.objects.create_user(username='test_pool_author')
+        post = Post.objects.create(
+            author=author,
+            text='test_pool',
+            image=uploaded_gif('pool.gif'),
+            thumbnail_status=Post.THUMBNAIL_PENDING,
+        )
+        thumbnails.schedule(post.pk)
+        thumbnails.drain()
+        post.refresh_from_db()
+        self.assertEqual(post.thumbnail_status, Post.THUMBNAIL_READY)
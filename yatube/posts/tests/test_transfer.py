@@ -0,0 +1,220 @@
+import datetime
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from .. import search, transfer
+from ..models import Comment, FeedEntry, Follow, Group, Post, UserCounter
+
+User = get_user_model()
+
+
+class TransferTest(TestCase):
+    """Тест выгрузки и загрузки постов, комментариев и подписок."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Авторы, группа, посты с комментариями и подписка."""
+        cls.author = User.objects.create_user(username='test_transfer_author')
+        cls.reader = User.objects.create_user(username='test_transfer_reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='test_transfer_group', description=''
+        )
+        cls.date = timezone.now() - datetime.timedelta(days=100)
+        for i in range(5):
+            post = Post.objects.create(
+                author=cls.author,
+                group=cls.group if i % 2 else None,
+                text=f'импорт номер {i}',
+            )
+            Comment.objects.create(
+                post=post, author=cls.reader, text=f'ответ {i}'
+            )
+        Post.objects.update(pub_date=cls.date)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        """Временная директория для файлов."""
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def path(self, name):
+        """Путь к файлу во временной директории."""
+        return os.path.join(self.directory, name)
+
+    def export_all(self, extension):
+        """Выгружает все виды объектов и возвращает пути файлов."""
+        paths = {}
+        for kind in ('posts', 'comments', 'follows'):
+            paths[kind] = self.path(f'{kind}.{extension}')
+            call_command(
+                'export_content', kind, paths[kind], stderr=StringIO()
+            )
+        return paths
+
+    def import_all(self, paths, *args):
+        """Загружает файлы в порядке зависимостей."""
+        for kind in ('posts', 'comments', 'follows'):
+            call_command(
+                'import_content', kind, paths[kind], *args, stdout=StringIO()
+            )
+
+    def snapshot(self):
+        """Содержимое таблиц для сравнения."""
+        return (
+            list(Post.objects.order_by('pk').values_list(
+                'pk', 'author__username', 'group__slug', 'text', 'pub_date',
+                'comments_count',
+            )),
+            list(Comment.objects.order_by('pk').values_list(
+                'pk', 'post_id', 'author__username', 'text',
+            )),
+            list(Follow.objects.values_list(
+                'user__username', 'author__username'
+            )),
+        )
+
+    def clear(self):
+        """Удаляет посты и подписки вместе с их последствиями."""
+        Post.objects.all().delete()
+        Follow.objects.all().delete()
+
+    def test_round_trip(self):
+        """Выгрузка и загрузка в обоих форматах восстанавливают данные."""
+        expected = self.snapshot()
+        for extension in ('ndjson', 'csv'):
+            with self.subTest(extension=extension):
+                paths = self.export_all(extension)
+                self.clear()
+                self.import_all(paths, '--batch-size', '2')
+                self.assertEqual(self.snapshot(), expected)
+                self.assertEqual(
+                    UserCounter.objects.get(user=self.author).posts_count, 5
+                )
+                self.assertEqual(
+                    UserCounter.objects.get(user=self.author).followers_count,
+                    1,
+                )
+                self.assertEqual(
+                    FeedEntry.objects.filter(user=self.reader).count(), 5
+                )
+                self.assertEqual(len(search.candidates(['ответ'])), 5)
+
+    def test_repeated_import_skips_existing(self):
+        """Повторная загрузка не создает дубликатов."""
+        paths = self.export_all('ndjson')
+        expected = self.snapshot()
+        self.import_all(paths)
+        self.assertEqual(self.snapshot(), expected)
+
+    def test_resume_after_crash(self):
+        """После сбоя загрузка продолжается с сохраненной позиции."""
+        paths = self.export_all('csv')
+        expected = self.snapshot()
+        self.clear()
+        load = transfer.Importer.load
+        calls = []
+
+        def crash_on_third_batch(importer, rows):
+            calls.append(len(rows))
+            if len(calls) == 3:
+                raise RuntimeError('сбой')
+            return load(importer, rows)
+
+        with mock.patch.object(
+            transfer.Importer, 'load', crash_on_third_batch
+        ):
+            with self.assertRaises(RuntimeError):
+                call_command(
+                    'import_content', 'posts', paths['posts'],
+                    '--batch-size', '2', stdout=StringIO(),
+                )
+        self.assertEqual(Post.objects.count(), 4)
+        self.assertTrue(os.path.exists(paths['posts'] + '.checkpoint'))
+        out = StringIO()
+        call_command(
+            'import_content', 'posts', paths['posts'], '--resume',
+            '--batch-size', '2', stdout=out, stderr=StringIO(),
+        )
+        self.assertIn('Прочитано записей: 5, создано: 1', out.getvalue())
+        self.assertFalse(os.path.exists(paths['posts'] + '.checkpoint'))
+        for kind in ('comments', 'follows'):
+            call_command(
+                'import_content', kind, paths[kind], stdout=StringIO()
+            )
+        self.assertEqual(self.snapshot(), expected)
+
+    def test_defer_side_effects(self):
+        """С --defer-side-effects счетчики пересчитываются в конце."""
+        paths = self.export_all('ndjson')
+        expected = self.snapshot()
+        self.clear()
+        self.import_all(paths, '--defer-side-effects')
+        self.assertEqual(self.snapshot(), expected)
+        self.assertEqual(
+            UserCounter.objects.get(user=self.reader).following_count, 1
+        )
+        self.assertEqual(len(search.candidates(['импорт'])), 5)
+
+    def test_follows_backfilled_per_author(self):
+        """Ленты новых подписчиков дозаполняются одним запросом на автора."""
+        readers = [
+            User.objects.create_user(username=f'test_transfer_reader_{i}')
+            for i in range(3)
+        ]
+        importer = transfer.Importer('follows')
+        with mock.patch.object(
+            transfer.feed, 'backfill_all', wraps=transfer.feed.backfill_all
+        ) as backfill_all:
+            importer.load([
+                {'user': reader.username, 'author': self.author.username}
+                for reader in readers
+            ])
+        backfill_all.assert_called_once_with(self.author.pk)
+        for reader in readers:
+            self.assertEqual(
+                FeedEntry.objects.filter(user=reader).count(), 5
+            )
+
+    def test_deferred_fan_out_uses_recounted_followers(self):
+        """При отложенных последствиях ленты раздаются по новым счетчикам."""
+        paths = self.export_all('ndjson')
+        self.clear()
+        UserCounter.objects.filter(user=self.author).update(
+            followers_count=settings.FEED_FANOUT_LIMIT + 1
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+        call_command(
+            'import_content', 'posts', paths['posts'],
+            '--defer-side-effects', stdout=StringIO(),
+        )
+        self.assertEqual(
+            UserCounter.objects.get(user=self.author).followers_count, 1
+        )
+        self.assertEqual(
+            FeedEntry.objects.filter(user=self.reader).count(), 5
+        )
+
+    def test_unknown_authors_and_groups_created(self):
+        """Авторы и группы, которых нет в БД, создаются по ключу."""
+        path = self.path('posts.ndjson')
+        with open(path, 'w') as stream:
+            stream.write(
+                '{"id": 1000, "author": "test_new_author", '
+                '"group": "test_new_group", "text": "новый", '
+                '"pub_date": "2022-04-16T14:17:00+00:00", "image": ""}\n'
+            )
+        call_command('import_content', 'posts', path, stdout=StringIO())
+        post = Post.objects.get(pk=1000)
+        self.assertEqual(post.author.username, 'test_new_author')
+        self.assertEqual(post.group.slug, 'test_new_group')
+        self.assertFalse(post.author.has_usable_password())
+        self.assertEqual(post.pub_date.year, 2022)
@@ -1,15 +1,20 @@
 import shutil
 import tempfile
+from unittest import mock
 
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from ..models import Follow, Group, Post
+from .. import caching
+from ..models import Comment, Follow, Group, Post
+from ..templatetags.post_cards import card_key
 
 User = get_user_model()
 
@@ -95,6 +100,10 @@ class PostsViewsTest(TestCase):
         # директорию TEMP_MEDIA_ROOT и всё её содержимое
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
+    def setUp(self):
+        """Пустой кэш: id постов повторяются в разных тестах."""
+        cache.clear()
+
     def test_posts_views_access(self):
         """Тест используемых шаблонов."""
         url_templates = {
@@ -262,23 +271,24 @@ class PostsViewsTest(TestCase):
         """Тест cache главной стр. приложения post."""
         response = self.authorized_author.get(
             reverse('posts:main_page')).content
-        # создание тестового поста N2
-        Post.objects.create(
-            author=self.author,
-            text='test_post_2',
-            group=self.group,
-        )
+        # изменение в обход сигналов не сбрасывает кэш
+        Post.objects.filter(pk=self.post.pk).update(text='test_post_upd')
         response_cache = self.authorized_author.get(
             reverse('posts:main_page')).content
 
         self.assertEqual(response, response_cache)
 
-        cache.clear()
-
-        response_cache_clear = self.authorized_author.get(
+        # создание тестового поста N2 сразу сбрасывает кэш
+        Post.objects.create(
+            author=self.author,
+            text='test_post_2',
+            group=self.group,
+        )
+        response_new_post = self.authorized_author.get(
             reverse('posts:main_page')).content
 
-        self.assertNotEqual(response, response_cache_clear)
+        self.assertNotEqual(response, response_new_post)
+        self.assertIn('test_post_2'.encode(), response_new_post)
 
 
 class PaginatorViewsTest(TestCase):
@@ -326,8 +336,9 @@ class PaginatorViewsTest(TestCase):
         for url in templates:
             with self.subTest(templates=url):
                 response1 = self.authorized_author.get(url)
+                next_cursor = response1.context['page_obj'].next_cursor
                 response2 = self.authorized_author.get(
-                    url + '?page=2')
+                    url, {'cursor': next_cursor})
                 # на первой странице выводится 10 записей
                 # p.s. число 10 берется из указанных в viwes.py
                 # настройках паджинатора
@@ -337,6 +348,42 @@ class PaginatorViewsTest(TestCase):
                 self.assertEqual(
                     len(response2.context['page_obj']), 3)
 
+    def test_paginator_previous_cursor(self):
+        """Курсор «Предыдущая» возвращает на первую страницу."""
+        url = reverse('posts:main_page')
+        page1 = self.authorized_author.get(url).context['page_obj']
+        page2 = self.authorized_author.get(
+            url, {'cursor': page1.next_cursor}).context['page_obj']
+        self.assertTrue(page2.has_previous())
+        self.assertFalse(page2.has_next())
+
+        page_back = self.authorized_author.get(
+            url, {'cursor': page2.previous_cursor}).context['page_obj']
+        self.assertEqual(page_back.number, 1)
+        self.assertEqual(
+            [post.pk for post in page_back],
+            [post.pk for post in page1],
+        )
+
+    def test_paginator_broken_cursor(self):
+        """Поврежденный курсор отдает первую страницу."""
+        response = self.authorized_author.get(
+            reverse('posts:main_page'), {'cursor': 'не-курсор'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['page_obj'].number, 1)
+        self.assertEqual(len(response.context['page_obj']), 10)
+
+    def test_paginator_without_count_and_offset(self):
+        """Страница ленты выбирается без COUNT(*) и OFFSET."""
+        url = reverse('posts:group_post', kwargs={'slug': self.group.slug})
+        page1 = self.authorized_author.get(url).context['page_obj']
+        with CaptureQueriesContext(connection) as queries:
+            self.authorized_author.get(url, {'cursor': page1.next_cursor})
+        for query in queries.captured_queries:
+            with self.subTest(sql=query['sql']):
+                self.assertNotIn('COUNT(', query['sql'].upper())
+                self.assertNotIn('OFFSET', query['sql'].upper())
+
 
 class Follow_Unfollow_ViewsTest(TestCase):
     """Тест подписки/отписки от автора."""
@@ -498,3 +545,250 @@ class Follow_Unfollow_ViewsTest(TestCase):
             len(response_author_01.context['page_obj']),
             len(response_author_03.context['page_obj']),
         )
+
+
+class FeedQueriesTest(TestCase):
+    """Страница ленты стоит фиксированное число запросов."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Автор, читатель, подписка и первый пост."""
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_feed_author')
+        cls.reader = User.objects.create_user(username='test_feed_reader')
+        cls.group = Group.objects.create(
+            title='test_feed_group',
+            slug='test_feed_slug',
+            description='test_feed_description',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.post = Post.objects.create(
+            author=cls.author, text='test_feed_post', group=cls.group
+        )
+
+    def setUp(self):
+        """Авторизованный читатель."""
+        self.authorized_reader = Client()
+        self.authorized_reader.force_login(self.reader)
+        cache.clear()
+
+    def count_queries(self, url):
+        """Число SQL-запросов при открытии url без кэша."""
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.authorized_reader.get(url)
+        return len(queries)
+
+    def test_feed_queries_do_not_depend_on_page_size(self):
+        """Запросов столько же, сколько и при одном посте на странице."""
+        urls = [
+            reverse('posts:main_page'),
+            reverse('posts:group_post', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': self.author.username}),
+            reverse('posts:follow_index'),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        ]
+        single = {url: self.count_queries(url) for url in urls}
+        # у каждого нового поста и комментария свой автор,
+        # чтобы N+1 по авторам был заметен
+        for i in range(12):
+            user = User.objects.create_user(username=f'test_feed_{i}')
+            Follow.objects.create(user=self.reader, author=user)
+            Post.objects.create(
+                author=user, text=f'test_feed_post_{i}', group=self.group
+            )
+            Post.objects.create(
+                author=self.author, text=f'test_feed_{i}', group=self.group
+            )
+            Comment.objects.create(
+                post=self.post, author=user, text=f'test_feed_comment_{i}'
+            )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.count_queries(url), single[url])
+
+    def test_feed_text_preview(self):
+        """Карточка ленты получает только начало текста поста."""
+        long_post = Post.objects.create(
+            author=self.author, text='х' * 1000, group=self.group
+        )
+        response = self.authorized_reader.get(reverse('posts:main_page'))
+        post = response.context['page_obj'][0]
+        self.assertEqual(post.pk, long_post.pk)
+        self.assertEqual(len(post.text_preview), 500)
+        self.assertIn('text', post.get_deferred_fields())
+
+
+class PostCardCacheTest(TestCase):
+    """Тест кэша карточек постов в лентах."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Автор и пара постов."""
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_card_author')
+        cls.group = Group.objects.create(
+            title='test_card_group',
+            slug='test_card_slug',
+            description='test_card_description',
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, text=f'test_card_{i}', group=cls.group
+            )
+            for i in range(2)
+        ]
+        cls.urls = [
+            reverse('posts:main_page'),
+            reverse('posts:group_post', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': cls.author.username}),
+        ]
+
+    def setUp(self):
+        """Авторизованный автор и пустой кэш."""
+        self.authorized_author = Client()
+        self.authorized_author.force_login(self.author)
+        cache.clear()
+
+    def test_cards_read_from_cache(self):
+        """Карточки берутся из кэша одним get_many."""
+        post = self.posts[0]
+        cache.set(card_key(post), '<p>карточка_из_кэша</p>')
+        for url in self.urls:
+            with self.subTest(url=url):
+                with mock.patch.object(
+                    cache, 'get_many', wraps=cache.get_many
+                ) as get_many:
+                    response = self.authorized_author.get(url)
+                self.assertEqual(get_many.call_count, 1)
+                self.assertContains(response, 'карточка_из_кэша')
+                self.assertContains(response, self.posts[1].text)
+                self.assertIsNotNone(cache.get(card_key(self.posts[1])))
+
+    def test_post_edit_bumps_card_version(self):
+        """Правка поста меняет версию, и лента показывает новый текст."""
+        post = self.posts[1]
+        url = reverse('posts:group_post', kwargs={'slug': self.group.slug})
+        self.authorized_author.get(url)
+        self.authorized_author.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            data={'text': 'test_card_edited', 'group': self.group.pk},
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.version, 2)
+        response = self.authorized_author.get(url)
+        self.assertContains(response, 'test_card_edited')
+
+    def test_author_rename_bumps_card_version(self):
+        """Новое имя автора сразу видно в карточках его постов."""
+        for url in self.urls:
+            self.authorized_author.get(url)
+        author = User.objects.get(pk=self.author.pk)
+        author.first_name, author.last_name = 'Лев', 'Толстой'
+        author.save()
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertContains(
+                    self.authorized_author.get(url), 'Лев Толстой'
+                )
+        versions = {post.version for post in Post.objects.all()}
+        author.save(update_fields=['last_login'])
+        self.assertEqual(
+            {post.version for post in Post.objects.all()}, versions
+        )
+
+
+class FeedCacheTest(TestCase):
+    """Тест кэша главной страницы с событийной инвалидацией."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Автор, группа и пост."""
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_index_author')
+        cls.group = Group.objects.create(
+            title='test_index_group',
+            slug='test_index_slug',
+            description='test_index_description',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, text='test_index_post', group=cls.group
+        )
+
+    def setUp(self):
+        """Пустой кэш."""
+        self.guest_client = Client()
+        cache.clear()
+
+    def test_post_and_group_changes_bump_version(self):
+        """Изменение поста или группы сдвигает версию лент."""
+        changes = [
+            lambda: Post.objects.create(author=self.author, text='test_new'),
+            lambda: self.post.save(),
+            lambda: self.group.save(),
+            lambda: Post.objects.filter(text='test_new').delete(),
+        ]
+        for change in changes:
+            version = caching.feed_version()
+            change()
+            self.assertGreater(caching.feed_version(), version)
+
+    def test_version_survives_eviction(self):
+        """После вытеснения ключа версия не повторяет прежние."""
+        version = caching.feed_version()
+        cache.delete(caching.FEED_VERSION_KEY)
+        caching.bump_feed_version()
+        self.assertNotEqual(caching.feed_version(), version)
+
+    def test_group_rename_refreshes_index(self):
+        """Переименование группы сразу видно на главной."""
+        url = reverse('posts:main_page')
+        self.guest_client.get(url)
+        self.group.title = 'test_index_renamed'
+        self.group.save()
+        self.assertContains(self.guest_client.get(url), 'test_index_renamed')
+
+    def test_pages_cached_separately(self):
+        """Разные страницы ленты кэшируются под разными ключами."""
+        self.assertNotEqual(
+            caching.fragment_key('main_page', ['']),
+            caching.fragment_key('main_page', ['cursor']),
+        )
+
+    def test_single_flight_computes_once(self):
+        """Значение считает только запрос, захвативший блокировку."""
+        compute = mock.Mock(return_value='fragment')
+        for _ in range(3):
+            self.assertEqual(
+                caching.get_or_set_single_flight('key', compute, 60),
+                'fragment',
+            )
+        compute.assert_called_once()
+        self.assertIsNone(cache.get('key:lock'))
+
+    def test_single_flight_waits_for_lock_holder(self):
+        """Пока блокировка занята, запрос ждет значение в кэше."""
+        cache.add('key:lock', 1, 60)
+        compute = mock.Mock(return_value='own')
+
+        def sleep(seconds):
+            cache.set('key', 'shared')
+
+        with mock.patch('posts.caching.time.sleep', side_effect=sleep):
+            value = caching.get_or_set_single_flight('key', compute, 60)
+        self.assertEqual(value, 'shared')
+        compute.assert_not_called()
+
+    def test_single_flight_gives_up_waiting(self):
+        """Зависший пересчет не блокирует запрос дольше lock_timeout."""
+        cache.add('key:lock', 1, 60)
+        compute = mock.Mock(return_value='own')
+        with mock.patch('posts.caching.time.sleep'), mock.patch(
+            'posts.caching.time.monotonic', side_effect=[0, 0, 2]
+        ):
+            value = caching.get_or_set_single_flight(
+                'key', compute, 60, lock_timeout=1
+            )
+        self.assertEqual(value, 'own')
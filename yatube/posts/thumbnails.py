@@ -0,0 +1,141 @@
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from sorl.thumbnail import default, get_thumbnail
+
+from . import blobs, caching, variants
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def prepare(post, changed_data):
+    """Отмечает пост ожидающим миниатюр, если картинка изменилась.
+
+    Вызывается до сохранения поста и возвращает True, если после
+    сохранения нужно вызвать schedule().
+    """
+    if 'image' not in changed_data:
+        return False
+    post.image_variants = ''
+    if not post.image:
+        post.thumbnail_status = Post.THUMBNAIL_READY
+        return False
+    post.thumbnail_status = Post.THUMBNAIL_PENDING
+    return True
+
+
+def generate(post_id):
+    """Создает миниатюры из settings.POST_THUMBNAILS и варианты картинки.
+
+    sorl.thumbnail не поднимает исключение, если не смог прочитать
+    картинку, поэтому наличие файла миниатюры проверяется отдельно.
+    Одинаковые картинки хранятся одним файлом, поэтому для повторной
+    загрузки берется готовое описание вариантов другого поста.
+    """
+    post = Post.objects.only('image').get(pk=post_id)
+    shared = blobs.shared_variants(post)
+    if shared:
+        # та же картинка уже обработана для другого поста: миниатюры
+        # sorl найдет по имени файла, варианты общие
+        Post.objects.filter(pk=post_id).update(image_variants=shared)
+        return
+    for geometry, options in settings.POST_THUMBNAILS:
+        thumbnail = get_thumbnail(post.image, geometry, **options)
+        if not thumbnail.exists():
+            # имя файла зависит только от содержимого, и запись sorl о
+            # миниатюре могла пережить сам файл: создаем его заново
+            default.kvstore.delete(thumbnail, delete_thumbnails=False)
+            thumbnail = get_thumbnail(post.image, geometry, **options)
+        if not thumbnail.exists():
+            raise OSError(
+                f'не удалось создать миниатюру {geometry} для {post.image}'
+            )
+    Post.objects.filter(pk=post_id).update(
+        image_variants=json.dumps(variants.generate(post.image))
+    )
+
+
+def process(post_id):
+    """Создает миниатюры поста с повторами и сохраняет статус.
+
+    После завершения увеличивается версия поста и лент, чтобы
+    закэшированные карточки с заглушкой перерисовались с картинкой.
+    """
+    retries = settings.POST_THUMBNAIL_RETRIES
+    Post.objects.filter(pk=post_id).update(
+        thumbnail_status=Post.THUMBNAIL_PROCESSING
+    )
+    status = Post.THUMBNAIL_FAILED
+    for attempt in range(retries + 1):
+        try:
+            generate(post_id)
+        except Post.DoesNotExist:
+            return
+        except Exception:
+            logger.warning(
+                'Миниатюры поста %s: попытка %s из %s не удалась',
+                post_id, attempt + 1, retries + 1, exc_info=True,
+            )
+            if attempt < retries:
+                time.sleep(settings.POST_THUMBNAIL_RETRY_DELAY * 2 ** attempt)
+        else:
+            status = Post.THUMBNAIL_READY
+            break
+    Post.objects.filter(pk=post_id).update(
+        thumbnail_status=status, version=F('version') + 1
+    )
+    caching.bump_feed_version()
+
+
+def _work(post_id):
+    """Задача пула: обработка поста в отдельном соединении с БД."""
+    try:
+        process(post_id)
+    except Exception:
+        logger.exception('Миниатюры поста %s не созданы', post_id)
+    finally:
+        connection.close()
+
+
+def _pool():
+    """Пул фоновых воркеров, создается при первой задаче."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.POST_THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+        return _executor
+
+
+def schedule(post_id):
+    """Ставит создание миниатюр поста в очередь пула.
+
+    Задача отправляется после фиксации транзакции, иначе воркер мог бы
+    не увидеть новую картинку. При POST_THUMBNAIL_ASYNC = False
+    миниатюры создаются сразу, в текущем потоке.
+    """
+    if not settings.POST_THUMBNAIL_ASYNC:
+        process(post_id)
+        return
+    transaction.on_commit(lambda: _pool().submit(_work, post_id))
+
+
+def drain():
+    """Дожидается завершения всех задач и останавливает пул."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
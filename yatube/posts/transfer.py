@@ -0,0 +1,397 @@
+import csv
+import json
+import os
+from collections import Counter
+from contextlib import contextmanager
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+
+from . import blobs, caching, counters, feed, search
+from .models import Comment, FeedEntry, Follow, Group, Post, User
+
+NDJSON = 'ndjson'
+CSV = 'csv'
+
+# поля записей в файлах выгрузки; авторы и пользователи записываются
+# по username, группы — по slug, посты и комментарии — со своими id
+FIELDS = {
+    'posts': ('id', 'author', 'group', 'text', 'pub_date', 'image'),
+    'comments': ('id', 'post', 'author', 'text', 'pub_date'),
+    'follows': ('user', 'author'),
+}
+
+EXPORT_QUERIES = {
+    'posts': lambda: Post.objects.order_by('pk').values_list(
+        'pk', 'author__username', 'group__slug', 'text', 'pub_date', 'image'
+    ),
+    'comments': lambda: Comment.objects.order_by('pk').values_list(
+        'pk', 'post_id', 'author__username', 'text', 'pub_date'
+    ),
+    'follows': lambda: Follow.objects.order_by('pk').values_list(
+        'user__username', 'author__username'
+    ),
+}
+
+
+def detect_format(path, fmt=None):
+    """Формат файла: явно заданный или по расширению."""
+    if fmt:
+        return fmt
+    return CSV if path.lower().endswith('.csv') else NDJSON
+
+
+def _value(value):
+    """Значение поля для записи в файл."""
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return '' if value is None else value
+
+
+def export(kind, stream, fmt, chunk_size=2000):
+    """Пишет все объекты вида kind в поток и возвращает их число.
+
+    Строки читаются из БД итератором по chunk_size, поэтому память не
+    зависит от размера таблицы.
+    """
+    fields = FIELDS[kind]
+    rows = EXPORT_QUERIES[kind]().iterator(chunk_size=chunk_size)
+    writer = None
+    if fmt == CSV:
+        writer = csv.writer(stream)
+        writer.writerow(fields)
+    count = 0
+    for row in rows:
+        values = [_value(value) for value in row]
+        if writer is not None:
+            writer.writerow(values)
+        else:
+            stream.write(
+                json.dumps(dict(zip(fields, values)), ensure_ascii=False)
+                + '\n'
+            )
+        count += 1
+    return count
+
+
+def _lines(stream):
+    """Строки потока через readline, чтобы работал stream.tell()."""
+    while True:
+        line = stream.readline()
+        if not line:
+            return
+        yield line
+
+
+def read(stream, fmt, offset=0):
+    """Читает записи, начиная с позиции offset.
+
+    Возвращает пары (запись, позиция после нее); по позиции чтение
+    можно продолжить после сбоя. У CSV заголовок читается всегда.
+    """
+    seekable = stream.seekable()
+    if fmt == CSV:
+        header = next(csv.reader(_lines(stream)), None)
+        if header is None:
+            return
+        if offset:
+            stream.seek(offset)
+        for row in csv.reader(_lines(stream)):
+            yield dict(zip(header, row)), stream.tell() if seekable else 0
+        return
+    if offset:
+        stream.seek(offset)
+    for number, line in enumerate(_lines(stream), 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            raise CommandError(f'Строка {number}: {error}')
+        yield record, stream.tell() if seekable else 0
+
+
+class Checkpoint:
+    """Позиция в файле после последней сохраненной пачки.
+
+    Хранится рядом с файлом в <файл>.checkpoint и удаляется после
+    успешного импорта.
+    """
+
+    def __init__(self, path):
+        """Файл позиции для импортируемого файла path."""
+        self.path = f'{path}.checkpoint'
+
+    def load(self):
+        """Возвращает (позиция, записей) или (0, 0)."""
+        try:
+            with open(self.path) as file:
+                state = json.load(file)
+        except FileNotFoundError:
+            return 0, 0
+        return state['offset'], state['records']
+
+    def save(self, offset, records):
+        """Атомарно сохраняет позицию."""
+        temporary = f'{self.path}.tmp'
+        with open(temporary, 'w') as file:
+            json.dump({'offset': offset, 'records': records}, file)
+        os.replace(temporary, self.path)
+
+    def clear(self):
+        """Удаляет файл позиции."""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class IdMap:
+    """Кэш id объектов по естественному ключу (username, slug).
+
+    Неизвестные ключи пачки запрашиваются одним запросом, а
+    отсутствующие в БД объекты создаются одним bulk_create.
+    """
+
+    def __init__(self, model, field, defaults):
+        """Отображение model.field -> id; defaults строит новый объект."""
+        self.model = model
+        self.field = field
+        self.defaults = defaults
+        self.ids = {}
+
+    def resolve(self, keys):
+        """Находит или создает объекты для ключей keys."""
+        missing = {key for key in keys if key and key not in self.ids}
+        if not missing:
+            return
+        self._load(missing)
+        new = missing - self.ids.keys()
+        if new:
+            self.model.objects.bulk_create(
+                [self.model(**self.defaults(key)) for key in sorted(new)],
+                ignore_conflicts=True,
+            )
+            self._load(new)
+
+    def _load(self, keys):
+        """Дочитывает id объектов с ключами keys."""
+        self.ids.update(
+            self.model.objects.filter(
+                **{f'{self.field}__in': keys}
+            ).values_list(self.field, 'pk')
+        )
+
+    def __getitem__(self, key):
+        """Возвращает id объекта или None для пустого ключа."""
+        return self.ids[key] if key else None
+
+
+def user_map():
+    """Авторы по username; новые создаются без пароля."""
+    return IdMap(User, 'username', lambda username: {
+        'username': username, 'password': make_password(None),
+    })
+
+
+def group_map():
+    """Группы по slug; новые создаются с названием из slug."""
+    return IdMap(Group, 'slug', lambda slug: {
+        'slug': slug, 'title': slug, 'description': '',
+    })
+
+
+@contextmanager
+def keep_pub_date(*models):
+    """Отключает auto_now_add у pub_date, чтобы сохранить даты из файла."""
+    fields = [model._meta.get_field('pub_date') for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def _date(value):
+    """Дата из файла."""
+    date = parse_datetime(value) if value else None
+    if date is None:
+        raise CommandError(f'Неверная дата: {value!r}')
+    return date
+
+
+def _new(model, rows):
+    """Строки с id, которых еще нет в таблице model."""
+    ids = [int(row['id']) for row in rows]
+    existing = set(
+        model.objects.filter(pk__in=ids).values_list('pk', flat=True)
+    )
+    return [row for row in rows if int(row['id']) not in existing]
+
+
+class Importer:
+    """Пакетная загрузка постов, комментариев и подписок.
+
+    Каждая пачка пишется bulk_create в своей транзакции, уже
+    существующие объекты пропускаются, поэтому повторная загрузка
+    пачки безопасна. Сигналы при bulk_create не срабатывают, и их
+    последствия применяются к каждой пачке: ленты подписчиков,
+    ссылки на файлы картинок, а без defer также счетчики, индекс
+    поиска и ленты подписчиков. С defer счетчики и индекс
+    пересчитываются один раз в finish(), и только после этого
+    дозаполняются ленты: популярность автора определяется по
+    счетчику подписчиков.
+    """
+
+    def __init__(self, kind, defer=False):
+        """Загрузчик объектов вида kind."""
+        self.kind = kind
+        self.defer = defer
+        self.users = user_map()
+        self.groups = group_map()
+        self.created = 0
+        # авторы, чьи ленты дозаполняются в finish() при defer
+        self.authors = set()
+
+    def load(self, rows):
+        """Сохраняет пачку записей и возвращает число новых объектов."""
+        with transaction.atomic(), keep_pub_date(Post, Comment):
+            created = getattr(self, f'_load_{self.kind}')(rows)
+        self.created += created
+        return created
+
+    def _load_posts(self, rows):
+        """Сохраняет посты пачки."""
+        rows = _new(Post, rows)
+        self.users.resolve(row['author'] for row in rows)
+        self.groups.resolve(row.get('group') for row in rows)
+        posts = [
+            Post(
+                pk=int(row['id']),
+                author_id=self.users[row['author']],
+                group_id=self.groups[row.get('group')],
+                text=row['text'],
+                pub_date=_date(row['pub_date']),
+                image=row.get('image') or '',
+            )
+            for row in rows
+        ]
+        Post.objects.bulk_create(posts)
+        for post in posts:
+            if post.image:
+                blobs.retain(post.image.name)
+        if self.defer:
+            self.authors.update(post.author_id for post in posts)
+        else:
+            self._fan_out(posts)
+            for author_id, total in Counter(
+                post.author_id for post in posts
+            ).items():
+                counters.change_user(author_id, posts_count=total)
+            for post in posts:
+                search.index(post, '')
+        return len(posts)
+
+    def _fan_out(self, posts):
+        """Раздает посты пачки по лентам подписчиков их авторов."""
+        by_author = {}
+        for post in posts:
+            by_author.setdefault(post.author_id, []).append(post)
+        entries = []
+        for author_id, author_posts in by_author.items():
+            if feed.is_popular(author_id):
+                continue
+            followers = Follow.objects.filter(
+                author_id=author_id
+            ).values_list('user_id', flat=True)
+            entries.extend(
+                FeedEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+                for user_id in followers
+                for post in author_posts
+            )
+        FeedEntry.objects.bulk_create(
+            entries, batch_size=feed.BATCH_SIZE, ignore_conflicts=True
+        )
+
+    def _load_comments(self, rows):
+        """Сохраняет комментарии пачки к существующим постам."""
+        rows = _new(Comment, rows)
+        posts = set(Post.objects.filter(
+            pk__in={int(row['post']) for row in rows}
+        ).values_list('pk', flat=True))
+        rows = [row for row in rows if int(row['post']) in posts]
+        self.users.resolve(row['author'] for row in rows)
+        comments = [
+            Comment(
+                pk=int(row['id']),
+                post_id=int(row['post']),
+                author_id=self.users[row['author']],
+                text=row['text'],
+                pub_date=_date(row['pub_date']),
+            )
+            for row in rows
+        ]
+        Comment.objects.bulk_create(comments)
+        if not self.defer:
+            for post_id, total in Counter(
+                comment.post_id for comment in comments
+            ).items():
+                counters.change_comments(post_id, total)
+                search.reindex_comments(post_id)
+        return len(comments)
+
+    def _load_follows(self, rows):
+        """Сохраняет подписки пачки, кроме уже существующих."""
+        self.users.resolve(
+            key for row in rows for key in (row['user'], row['author'])
+        )
+        pairs = {
+            (self.users[row['user']], self.users[row['author']])
+            for row in rows if row['user'] != row['author']
+        }
+        existing = set(Follow.objects.filter(
+            user_id__in={user for user, _ in pairs},
+            author_id__in={author for _, author in pairs},
+        ).values_list('user_id', 'author_id'))
+        pairs = sorted(pairs - existing)
+        Follow.objects.bulk_create(
+            Follow(user_id=user, author_id=author) for user, author in pairs
+        )
+        followers = Counter(author for _, author in pairs)
+        if self.defer:
+            self.authors.update(followers)
+            return len(pairs)
+        for author_id, total in followers.items():
+            counters.change_user(author_id, followers_count=total)
+        for user_id, total in Counter(u for u, _ in pairs).items():
+            counters.change_user(user_id, following_count=total)
+        # один INSERT ... SELECT на автора вместо запросов на подписку
+        for author_id in sorted(followers):
+            feed.backfill_all(author_id)
+        return len(pairs)
+
+    def finish(self):
+        """Завершает загрузку после последней пачки.
+
+        Последовательности id сдвигаются за загруженные id (нужно на
+        PostgreSQL), сбрасываются закэшированные ленты, а при defer
+        пересчитываются счетчики и индекс поиска и по новым счетчикам
+        дозаполняются ленты подписчиков затронутых авторов.
+        """
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), [Post, Comment]
+        )
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+        if self.defer:
+            counters.repair_users()
+            counters.repair_posts()
+            if self.kind != 'follows':
+                search.rebuild()
+            for author_id in sorted(self.authors):
+                feed.backfill_all(author_id)
+        caching.bump_feed_version()
@@ -0,0 +1,137 @@
+import math
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile, UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps
+
+# форматы, в которых нормализованная картинка сохраняется как есть;
+# остальные перекодируются в PNG
+KEEP_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+LOSSY_QUALITY = 90
+
+
+def too_large_message():
+    """Текст ошибки для слишком большого файла."""
+    return f'Файл больше {filesizeformat(settings.POST_IMAGE_MAX_BYTES)}.'
+
+
+class TooLargeUpload(UploadedFile):
+    """Файл, прием которого оборван SizeLimitUploadHandler.
+
+    Содержимого нет, size — сколько байт было получено.
+    """
+
+    too_large = True
+
+    def __init__(self, name, content_type, size, charset):
+        """Пустой файл с исходными именем и типом."""
+        super().__init__(BytesIO(), name, content_type, size, charset)
+
+
+class SizeLimitUploadHandler(FileUploadHandler):
+    """Обрывает прием файла, превысившего POST_IMAGE_MAX_BYTES.
+
+    Стоит первым в FILE_UPLOAD_HANDLERS: пока файл укладывается
+    в лимит, передает его куски следующим обработчикам, а после
+    превышения перестает передавать, поэтому в память и на диск
+    попадает не больше лимита. Вместо такого файла форма получает
+    TooLargeUpload.
+    """
+
+    def new_file(self, *args, **kwargs):
+        """Начинает подсчет байт нового файла."""
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        """Считает байты и отбрасывает все, что сверх лимита."""
+        self.received += len(raw_data)
+        if self.received > settings.POST_IMAGE_MAX_BYTES:
+            return None
+        return raw_data
+
+    def file_complete(self, file_size):
+        """Подменяет слишком большой файл на TooLargeUpload."""
+        if self.received > settings.POST_IMAGE_MAX_BYTES:
+            return TooLargeUpload(
+                self.file_name, self.content_type, self.received,
+                self.charset,
+            )
+        return None
+
+
+def _open(upload):
+    """Открывает картинку, прочитав только заголовок.
+
+    Размеры проверяются до декодирования пикселей, так что картинка
+    с огромными размерами в маленьком файле (decompression bomb)
+    отклоняется, не заняв памяти.
+    """
+    if upload.size > settings.POST_IMAGE_MAX_BYTES:
+        raise ValidationError(too_large_message(), code='too_large')
+    upload.seek(0)
+    try:
+        image = Image.open(upload)
+    except Image.DecompressionBombError:
+        image = None
+    if image is None or (
+        image.width * image.height > settings.POST_IMAGE_MAX_PIXELS
+    ):
+        raise ValidationError(
+            'Слишком большое разрешение картинки.', code='too_many_pixels'
+        )
+    return image
+
+
+def normalize(upload):
+    """Возвращает картинку, готовую к сохранению.
+
+    Картинка больше POST_IMAGE_MAX_SIDE по длинной стороне уменьшается
+    через thumbnail(): для JPEG он с помощью draft() декодирует сразу
+    уменьшенную в 2–8 раз картинку, а дальше уменьшает ее reduce().
+    Поворот из EXIF применяется к пикселям, а сами EXIF-данные (в
+    том числе геометка) при перекодировании отбрасываются.
+    Картинки без EXIF, укладывающиеся в лимит, и анимации
+    сохраняются без изменений.
+    """
+    image = _open(upload)
+    max_side = settings.POST_IMAGE_MAX_SIDE
+    oversized = max(image.size) > max_side
+    if getattr(image, 'is_animated', False) or not (
+        oversized or image.getexif()
+    ):
+        upload.seek(0)
+        return upload
+
+    source_format = image.format
+    if oversized:
+        ratio = max_side / max(image.size)
+        image.thumbnail(
+            (math.ceil(image.width * ratio), math.ceil(image.height * ratio)),
+            Image.LANCZOS,
+        )
+    image = ImageOps.exif_transpose(image)
+
+    output_format = source_format if source_format in KEEP_FORMATS else 'PNG'
+    # PNG по умолчанию дописывает EXIF из image.info
+    options = {'exif': b''}
+    if image.info.get('icc_profile'):
+        options['icc_profile'] = image.info['icc_profile']
+    if output_format in ('JPEG', 'WEBP'):
+        options['quality'] = LOSSY_QUALITY
+    if output_format == 'JPEG' and image.mode not in ('RGB', 'L', 'CMYK'):
+        image = image.convert('RGB')
+    buffer = BytesIO()
+    image.save(buffer, output_format, **options)
+
+    name = upload.name
+    if output_format != source_format:
+        name = os.path.splitext(name)[0] + '.png'
+    return SimpleUploadedFile(
+        name, buffer.getvalue(), content_type=Image.MIME[output_format]
+    )
@@ -16,6 +16,7 @@ urlpatterns = [
          name='add_comment'
          ),
     path('follow/', views.follow_index, name='follow_index'),
+    path('search/', views.search, name='search'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
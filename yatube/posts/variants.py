@@ -0,0 +1,126 @@
+import logging
+import posixpath
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# современные форматы в порядке предпочтения: (формат Pillow,
+# MIME-тип, расширение); используются только поддерживаемые Pillow
+MODERN_FORMATS = (
+    ('AVIF', 'image/avif', 'avif'),
+    ('WEBP', 'image/webp', 'webp'),
+)
+FALLBACK_FORMAT = ('JPEG', 'image/jpeg', 'jpg')
+
+VARIANTS_DIR = 'cache/variants'
+
+
+def formats():
+    """Форматы вариантов, которые умеет кодировать установленный Pillow."""
+    Image.init()
+    return [
+        fmt for fmt in MODERN_FORMATS if fmt[0] in Image.SAVE
+    ] + [FALLBACK_FORMAT]
+
+
+def variant_name(image_name, width, extension):
+    """Имя файла варианта картинки заданной ширины."""
+    stem = posixpath.splitext(posixpath.basename(image_name))[0]
+    folder = posixpath.dirname(image_name)
+    return posixpath.join(
+        VARIANTS_DIR, folder, f'{stem}_{width}w.{extension}'
+    )
+
+
+def _encode(image, pillow_format):
+    """Кодирует картинку и возвращает байты."""
+    if pillow_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    buffer = BytesIO()
+    image.save(
+        buffer, pillow_format,
+        quality=settings.POST_IMAGE_QUALITY, optimize=True,
+    )
+    return buffer.getvalue()
+
+
+def _save(storage, name, data):
+    """Сохраняет файл под точным именем, заменяя прежний."""
+    if storage.exists(name):
+        storage.delete(name)
+    return storage.save(name, ContentFile(data))
+
+
+def generate(image):
+    """Создает варианты картинки и возвращает их описание.
+
+    Для каждой ширины из POST_IMAGE_WIDTHS картинка обрезается по
+    центру до пропорций POST_IMAGE_SIZE и кодируется во все форматы
+    из formats(). Описание — словарь
+    {'original': байт, 'formats': [[MIME, [[ширина, имя, байт], ...]]]},
+    в нем форматы идут в порядке предпочтения, JPEG последним.
+    """
+    full_width, full_height = settings.POST_IMAGE_SIZE
+    # хранилище картинки дает файлам имена по хешу, а вариантам нужны
+    # предсказуемые имена рядом с ней
+    storage = default_storage
+    with image.open('rb') as file:
+        source = Image.open(file)
+        source.load()
+    if source.mode not in ('RGB', 'RGBA'):
+        transparent = 'transparency' in source.info or source.mode == 'LA'
+        source = source.convert('RGBA' if transparent else 'RGB')
+    original = image.size
+    available = formats()
+    result = {mime: [] for _, mime, _ in available}
+    for width in sorted(settings.POST_IMAGE_WIDTHS):
+        height = round(full_height * width / full_width)
+        resized = ImageOps.fit(source, (width, height), Image.LANCZOS)
+        for pillow_format, mime, extension in available:
+            data = _encode(resized, pillow_format)
+            name = _save(
+                storage, variant_name(image.name, width, extension), data
+            )
+            result[mime].append([width, name, len(data)])
+    manifest = {
+        'original': original,
+        'formats': [[mime, result[mime]] for _, mime, _ in available],
+    }
+    logger.info(
+        'Варианты %s: экономия %.0f%%', image.name,
+        100 * savings([manifest])['ratio'],
+    )
+    return manifest
+
+
+def savings(manifests):
+    """Считает, сколько байт экономят варианты.
+
+    Раньше каждый клиент получал JPEG полной ширины. Теперь клиент
+    ширины w получает самый маленький файл ширины w среди доступных
+    форматов. Возвращает суммы байт «до» и «после» по всем ширинам
+    и всем картинкам и долю сэкономленных байт.
+    """
+    before = after = 0
+    for manifest in manifests:
+        by_width = {}
+        for _, variants in manifest['formats']:
+            for width, _, size in variants:
+                by_width.setdefault(width, []).append(size)
+        jpeg = {
+            width: size for width, _, size in manifest['formats'][-1][1]
+        }
+        full = jpeg[max(jpeg)]
+        for sizes in by_width.values():
+            before += full
+            after += min(sizes)
+    return {
+        'before': before,
+        'after': after,
+        'ratio': 1 - after / before if before else 0.0,
+    }
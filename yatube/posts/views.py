@@ -1,33 +1,85 @@
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.db.models import Exists, F, OuterRef
 from django.shortcuts import get_object_or_404, redirect, render
 
+from core.decorators import sessionless
+from . import thumbnails
+from .caching import conditional_page, feed_version
+from .counters import get_counter
+from .feed import FollowFeedPaginator
 from .forms import CommentForm, PostForm
 from .models import Follow, Group, Post, User
+from .paginators import CursorPaginator
+from .search import SearchPaginator
 
 POSTS_NUM = 10
 
 
 def paginator(queryset, request):
-    """Универсальная функция-паджинатор."""
-    paginator = Paginator(queryset, POSTS_NUM)
-    page_number = request.GET.get('page')
-    return paginator.get_page(page_number)
+    """Универсальная функция-паджинатор.
 
+    Страницы адресуются непрозрачным токеном ?cursor=, см. CursorPaginator.
+    """
+    paginator = CursorPaginator(queryset, POSTS_NUM)
+    return paginator.get_page(request.GET.get('cursor'))
 
+
+def index_version(request):
+    """Версия главной: версия лент, которая меняется с любым постом."""
+    return (feed_version(),)
+
+
+def group_version(request, slug):
+    """Версия страницы группы: группа и ее посты меняют версию лент."""
+    return (slug, feed_version())
+
+
+def profile_version(request, username):
+    """Версия профиля: версия лент, счетчики автора и подписка на него.
+
+    Счетчики и подписка читаются одним запросом по username.
+    """
+    follows = Follow.objects.filter(
+        user=request.user.pk, author=OuterRef('pk')
+    )
+    row = User.objects.filter(username=username).annotate(
+        is_follower=Exists(follows)
+    ).values_list(
+        'counter__followers_count', 'counter__following_count', 'is_follower'
+    ).first()
+    return row and (username, feed_version(), *row)
+
+
+def post_detail_version(request, post_id):
+    """Версия страницы поста: пост, его комментарии и счетчик автора.
+
+    Версия поста меняется и с каждым новым, правленым или удаленным
+    комментарием (см. counters.change_comments); она, число
+    комментариев и постов автора читаются одним запросом по первичному
+    ключу.
+    """
+    return Post.objects.filter(pk=post_id).values_list(
+        'pk', 'version', 'comments_count', 'author__counter__posts_count'
+    ).first()
+
+
+@sessionless
+@conditional_page(index_version)
 def index(request):
     """Фунция вызова главной страницы."""
-    get_posts = Post.objects.select_related('group', 'author').all()
+    get_posts = Post.objects.for_feed()
     context = {
         'page_obj': paginator(get_posts, request),
     }
     return render(request, 'posts/index.html', context)
 
 
+@sessionless
+@conditional_page(group_version)
 def group_posts(request, slug):
     """Функция вызова сгруппированной по постам страницы."""
     group = get_object_or_404(Group, slug=slug)
-    get_posts = group.posts.all().order_by('-pub_date')
+    get_posts = group.posts.for_feed()
     context = {
         'group': group,
         'page_obj': paginator(get_posts, request),
@@ -35,33 +87,35 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@sessionless
+@conditional_page(profile_version)
 def profile(request, username):
     """Функция вызова персональной страницы пользователя."""
-    author = get_object_or_404(User, username=username)
-    get_posts = author.posts.all().order_by('-pub_date')
-
-    follower = (request.user.is_authenticated) and (
-        Follow.objects.filter(
-            user=request.user,
-            author=author,
-        ).exists())
-
+    author = get_object_or_404(
+        User.objects.select_related('counter'), username=username
+    )
+    get_posts = author.posts.for_feed()
     context = {
         'author': author,
+        'counter': get_counter(author),
         'page_obj': paginator(get_posts, request),
-        'follower': follower,
     }
 
     return render(request, 'posts/profile.html', context)
 
 
+@sessionless
+@conditional_page(post_detail_version)
 def post_detail(request, post_id):
     """Функция вызова страницы с подробной информации о публикации."""
-    post = get_object_or_404(Post, pk=post_id)
-    comments = post.comments.all()
+    post = get_object_or_404(
+        Post.objects.select_related('author__counter', 'group'), pk=post_id
+    )
+    comments = post.comments.select_related('author')
     form = CommentForm()
     context = {
         'post': post,
+        'counter': get_counter(post.author),
         'form': form,
         'comments': paginator(comments, request),
         'is_comment': True
@@ -69,6 +123,18 @@ def post_detail(request, post_id):
     return render(request, 'posts/post_detail.html', context)
 
 
+@sessionless
+def search(request):
+    """Функция вызова страницы поиска по постам и комментариям."""
+    query = request.GET.get('q', '').strip()
+    results = SearchPaginator(query, POSTS_NUM)
+    context = {
+        'query': query,
+        'page_obj': results.get_page(request.GET.get('cursor')),
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
 def post_create(request):
     """Функция вызова страницы для создания публикации."""
@@ -79,7 +145,10 @@ def post_create(request):
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
+        pending = thumbnails.prepare(post, form.changed_data)
         post.save()
+        if pending:
+            thumbnails.schedule(post.pk)
         return redirect('posts:profile', request.user)
     return render(request, 'posts/create_post.html', {'form': form})
 
@@ -97,7 +166,13 @@ def post_edit(request, post_id):
 
     if post.author == request.user:
         if form.is_valid():
-            form.save()
+            post = form.save(commit=False)
+            # новая версия сбрасывает закэшированную карточку поста
+            post.version = F('version') + 1
+            pending = thumbnails.prepare(post, form.changed_data)
+            post.save()
+            if pending:
+                thumbnails.schedule(post.pk)
             return redirect('posts:post_detail', post.pk)
         return render(
             request,
@@ -128,9 +203,9 @@ def add_comment(request, post_id):
 @login_required
 def follow_index(request):
     """Функция вызова вкладки follow на стр. posts:main_page."""
-    get_posts = Post.objects.filter(author__following__user=request.user)
+    feed = FollowFeedPaginator(request.user, POSTS_NUM)
     context = {
-        'page_obj': paginator(get_posts, request),
+        'page_obj': feed.get_page(request.GET.get('cursor')),
     }
     return render(
         request,
@@ -158,7 +233,7 @@ def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     redirect_address = redirect('posts:profile', username=username)
     if author == request.user:
-        return redirect(redirect_address)
+        return redirect_address
 
     following = get_object_or_404(Follow, user=request.user, author=author)
     following.delete()
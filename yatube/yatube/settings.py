@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import tempfile
 
 from dotenv import load_dotenv
 
@@ -59,12 +60,16 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'core.middleware.ReplicaMiddleware',
+    'core.middleware.PageCacheMiddleware',
+    'core.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
+    'core.middleware.AuthenticationMiddleware',
+    'core.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
@@ -104,12 +109,77 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
+# DB_BACKEND выбирает профиль БД: sqlite — файл с журналом по
+# умолчанию, для разработки; sqlite_wal — тот же файл в режиме WAL:
+# читатели не ждут пишущего, а пишущие ждут друг друга до DB_TIMEOUT
+# секунд вместо ошибки database is locked; postgres — для работы под
+# нагрузкой. PRAGMAS и HEALTH_CHECK_INTERVAL применяет core.db.
+# Профилю postgres нужен драйвер psycopg2 (psycopg2-binary из
+# requirements.txt). Пула подключений внутри процесса нет: поток
+# воркера держит одно постоянное подключение DB_CONN_MAX_AGE секунд
+# вместо нового на каждый запрос, а общий пул — это внешний
+# pgbouncer перед PostgreSQL; с ним (DB_POOLER=pgbouncer, режим
+# transaction) серверные курсоры отключаются. Сравнение профилей:
+# python manage.py dbbench
+DB_BACKEND = os.getenv('DB_BACKEND', 'sqlite')
+DB_TIMEOUT = float(os.getenv('DB_TIMEOUT', 20))
+DATABASE_PROFILES = {
+    'sqlite': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+    },
+    'sqlite_wal': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'OPTIONS': {'timeout': DB_TIMEOUT},
+        'PRAGMAS': {
+            'journal_mode': 'wal',
+            'synchronous': 'normal',
+            'mmap_size': 256 * 1024 * 1024,
+            # отрицательное значение — размер в килобайтах
+            'cache_size': -64 * 1024,
+            'temp_store': 'memory',
+        },
+    },
+    'postgres': {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.getenv('DB_NAME', 'yatube'),
+        'USER': os.getenv('DB_USER', 'yatube'),
+        'PASSWORD': os.getenv('DB_PASSWORD', ''),
+        'HOST': os.getenv('DB_HOST', '127.0.0.1'),
+        'PORT': os.getenv('DB_PORT', '5432'),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 600)),
+        'DISABLE_SERVER_SIDE_CURSORS': os.getenv('DB_POOLER') == 'pgbouncer',
+        'OPTIONS': {'connect_timeout': 5},
+        'HEALTH_CHECK_INTERVAL': 30,
+    },
 }
+DATABASES = {'default': DATABASE_PROFILES[DB_BACKEND]}
+
+# реплики только для чтения: DB_REPLICAS штук, для PostgreSQL их хосты
+# перечисляет DB_REPLICA_HOSTS через запятую, для SQLite это файлы
+# db.replicaN.sqlite3, которые обновляет из основной БД команда
+# sync_replicas (локальная замена репликации, в том числе с задержкой:
+# sync_replicas --interval 5). Запросы читают с реплик, пишут в основную
+# БД (core.routers), а пользователь, который что-то записал,
+# REPLICA_PIN_SECONDS секунд читает только основную БД. В тестах
+# реплики — та же тестовая БД
+DB_REPLICAS = int(os.getenv('DB_REPLICAS', 0))
+DB_REPLICA_HOSTS = os.getenv('DB_REPLICA_HOSTS', '').split(',')
+DATABASE_REPLICAS = []
+for number in range(1, DB_REPLICAS + 1):
+    replica = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+    if replica['ENGINE'] == 'django.db.backends.sqlite3':
+        replica['NAME'] = os.path.join(
+            BASE_DIR, f'db.replica{number}.sqlite3'
+        )
+    else:
+        replica['HOST'] = DB_REPLICA_HOSTS[number - 1]
+    DATABASES[f'replica{number}'] = replica
+    DATABASE_REPLICAS.append(f'replica{number}')
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 15))
+REPLICA_PIN_COOKIE = 'primary_pin'
 
 
 # Password validation
@@ -161,8 +231,163 @@ DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 # cache
-CACHES = {
-    'default': {
+# CACHE_BACKEND выбирает профиль кэша: locmem — свой кэш у каждого
+# процесса; file, sqlite и socket — общий кэш всех воркеров (для socket
+# нужен сервер: python manage.py runcacheserver); tiered — L1 в памяти
+# процесса поверх общего кэша профиля CACHE_SHARED_BACKEND
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+CACHE_SHARED_BACKEND = os.getenv('CACHE_SHARED_BACKEND', 'sqlite')
+CACHE_DIR = os.getenv(
+    'CACHE_DIR', os.path.join(tempfile.gettempdir(), 'yatube_cache')
+)
+CACHE_SERVER = os.getenv('CACHE_SERVER', '127.0.0.1:11311')
+CACHE_PROFILES = {
+    'locmem': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': CACHE_DIR,
+    },
+    'sqlite': {
+        'BACKEND': 'core.cache.sqlite.SQLiteCache',
+        'LOCATION': os.path.join(CACHE_DIR, 'cache.sqlite3'),
+    },
+    'socket': {
+        'BACKEND': 'core.cache.tcp.SocketCache',
+        'LOCATION': CACHE_SERVER,
+    },
 }
+if CACHE_BACKEND == 'tiered':
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache.tiered.TieredCache',
+            'LOCATION': 'default',
+            'OPTIONS': {
+                'SHARED': 'shared',
+                'SYNC_INTERVAL': float(os.getenv('CACHE_SYNC_INTERVAL', 1)),
+            },
+        },
+        'shared': CACHE_PROFILES[CACHE_SHARED_BACKEND],
+    }
+else:
+    CACHES = {'default': CACHE_PROFILES[CACHE_BACKEND]}
+
+# sessions
+# SESSION_BACKEND: db — каждый запрос вошедшего пользователя читает
+# django_session; cached_db — сессия читается из кэша, БД только при
+# промахе и записи (кэш должен быть общим для воркеров, иначе выход
+# на одном воркере не завершит сессию на других); signed_cookies —
+# сессия целиком в подписанной cookie без БД и кэша. Анонимные чтения
+# без cookie сессии обходятся без нее вовсе (core.decorators.sessionless)
+SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'db')
+SESSION_ENGINE = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}[SESSION_BACKEND]
+
+# follow feed
+# авторы с большим числом подписчиков не раздаются по лентам при
+# публикации поста, их посты подмешиваются в ленту при чтении
+FEED_FANOUT_LIMIT = 1000
+
+# страницы лент и постов отвечают 304 по ETag; анонимные страницы
+# обратный прокси может отдавать из своего кэша столько секунд
+PAGE_SHARED_MAX_AGE = int(os.getenv('PAGE_SHARED_MAX_AGE', 60))
+
+# те же страницы целиком хранятся в кэше по пути и версии данных:
+# анонимным посетителям они отдаются core.middleware.PageCacheMiddleware
+# до сессий и аутентификации, вошедшим — оболочкой, в которой при
+# каждом запросе заполняются части {% hole %} (шапка, кнопки, форма
+# комментария); включается в рабочем окружении, при разработке и в
+# тестах страницы рендерятся при каждом запросе
+PAGE_CACHE_ENABLED = os.getenv('PAGE_CACHE_ENABLED') == 'True'
+PAGE_CACHE_TIMEOUT = 60 * 60 * 24
+
+# benchmark
+# эталонные замеры команды `manage.py benchmark` и допустимое
+# превышение времени ответа и памяти относительно них
+BENCHMARK_BASELINE = os.path.join(BASE_DIR, 'benchmark_baseline.json')
+BENCHMARK_THRESHOLD = float(os.getenv('BENCHMARK_THRESHOLD', 1.5))
+
+# время жизни закэшированной карточки поста в ленте, карточка
+# сбрасывается раньше при правке поста
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# фрагменты лент живут долго: они сбрасываются сразу при изменении
+# постов и групп; пока один запрос пересчитывает фрагмент, остальные
+# ждут его не дольше FEED_CACHE_LOCK_TIMEOUT секунд
+FEED_CACHE_TIMEOUT = 60 * 60 * 24
+FEED_CACHE_LOCK_TIMEOUT = 10
+
+# thumbnails
+# миниатюры картинок постов создаются сразу после сохранения поста;
+# размеры и параметры должны совпадать с тегами {% thumbnail %} в
+# шаблонах, иначе sorl создаст новую миниатюру при просмотре.
+# POST_THUMBNAIL_ASYNC=True переносит создание в фоновый пул воркеров,
+# без нее (при разработке и в тестах) миниатюры создаются в том же
+# запросе, что и пост
+POST_THUMBNAILS = [
+    ('960x339', {'crop': 'center', 'upscale': True}),
+]
+POST_THUMBNAIL_ASYNC = os.getenv('POST_THUMBNAIL_ASYNC') == 'True'
+POST_THUMBNAIL_WORKERS = 2
+POST_THUMBNAIL_RETRIES = 2
+POST_THUMBNAIL_RETRY_DELAY = 1
+
+# адаптивные варианты картинок постов: ширины, полный размер (его
+# пропорции сохраняются у всех вариантов) и качество кодирования
+POST_IMAGE_WIDTHS = (320, 640, 960)
+POST_IMAGE_SIZE = (960, 339)
+POST_IMAGE_QUALITY = 80
+
+# загрузка картинок постов: файл больше POST_IMAGE_MAX_BYTES обрывается
+# еще при приеме, картинка больше POST_IMAGE_MAX_PIXELS отклоняется до
+# декодирования, а больше POST_IMAGE_MAX_SIDE по длинной стороне —
+# уменьшается перед сохранением
+FILE_UPLOAD_HANDLERS = [
+    'posts.uploads.SizeLimitUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+POST_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 24_000_000
+POST_IMAGE_MAX_SIDE = 2560
+
+# search
+# поиск ранжирует все совпадения и показывает не больше
+# SEARCH_CANDIDATES лучших из них; релевантность поста уменьшается
+# вдвое за каждые SEARCH_HALF_LIFE секунд его возраста
+SEARCH_CANDIDATES = 1000
+SEARCH_HALF_LIFE = 60 * 60 * 24 * 30
+
+# admin
+# списки объектов в админке точно считают строки только до этого
+# предела, дальше число оценивается (см. core.admin.LargeTableAdmin)
+ADMIN_COUNT_LIMIT = 10000
+
+# metrics
+# core.middleware.MetricsMiddleware копит в процессе гистограммы
+# стоимости запросов по именам view, /metrics отдает их в формате
+# Prometheus только адресам из METRICS_ALLOWED_IPS
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True') == 'True'
+METRICS_ALLOWED_IPS = os.getenv(
+    'METRICS_ALLOWED_IPS', ','.join(INTERNAL_IPS)
+).split(',')
+
+# profiling
+# при PROFILE_ENABLED core.middleware.ProfilingMiddleware сохраняет
+# стеки (снимаются каждые PROFILE_INTERVAL секунд) и SQL запросов
+# дольше PROFILE_THRESHOLD секунд и каждого PROFILE_SAMPLE_RATE-го
+# запроса (0 — не выбирать) в PROFILE_DIR, где остаются PROFILE_KEEP
+# последних записей; просмотр — python manage.py profiles
+PROFILE_ENABLED = os.getenv('PROFILE_ENABLED') == 'True'
+PROFILE_THRESHOLD = float(os.getenv('PROFILE_THRESHOLD', 1.0))
+PROFILE_SAMPLE_RATE = int(os.getenv('PROFILE_SAMPLE_RATE', 0))
+PROFILE_INTERVAL = 0.005
+PROFILE_DIR = os.getenv(
+    'PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'yatube_profiles')
+)
+PROFILE_KEEP = 200
+PROFILE_MAX_QUERIES = 1000